@@ -0,0 +1,191 @@
+"""
+Two-level in-memory answer cache for ``/chat``.
+
+Level one is an exact match on the normalised question text. Level two is a
+semantic match: the question's embedding is compared (cosine similarity)
+against the embeddings of every cached question in one matrix-vector product,
+and a stored answer is reused when the best match clears the threshold, so
+paraphrases of a popular question are answered without retrieval or an LLM
+call. Entries are kept per answer mode, so a question asked in one mode is
+never answered with another mode's cached answer. Entries expire after a TTL,
+and the cache evicts least recently used entries to stay within both an entry
+count and a byte budget.
+"""
+
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+DEFAULT_TTL_SECONDS = 24 * 3600
+DEFAULT_MAX_ENTRIES = 1000
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_SIMILARITY = 0.95
+
+_PUNCT_RE = re.compile(r"[^\w\s']+")
+_SPACE_RE = re.compile(r"\s+")
+
+
+def normalize_question(question: str) -> str:
+    """Case-, whitespace- and punctuation-insensitive form of a question."""
+    text = _PUNCT_RE.sub(" ", (question or "").lower().replace("’", "'"))
+    return _SPACE_RE.sub(" ", text).strip()
+
+
+def _payload_bytes(payload: Dict[str, Any]) -> int:
+    return sum(len(str(k)) + len(str(v)) for k, v in payload.items())
+
+
+_Key = Tuple[str, str]
+
+
+class _Entry:
+    __slots__ = ("payload", "slot", "expires", "nbytes")
+
+    def __init__(self, payload: Dict[str, Any], slot: Optional[int], expires: float, nbytes: int):
+        self.payload = payload
+        self.slot = slot
+        self.expires = expires
+        self.nbytes = nbytes
+
+
+class AnswerCache:
+    """Exact + semantic LRU cache of chat answers with TTL and memory cap."""
+
+    def __init__(
+        self,
+        ttl_seconds: float = DEFAULT_TTL_SECONDS,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        similarity_threshold: float = DEFAULT_SIMILARITY,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max(1, int(max_entries))
+        self.max_bytes = int(max_bytes)
+        self.similarity_threshold = similarity_threshold
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+
+        self._entries: "OrderedDict[_Key, _Entry]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        # One matrix row per cached question embedding; allocated on first put
+        self._matrix: Optional[np.ndarray] = None
+        self._slot_keys: List[Optional[_Key]] = [None] * self.max_entries
+        self._slot_modes = np.full(self.max_entries, None, dtype=object)
+        self._slot_expires = np.zeros(self.max_entries, dtype=np.float64)
+        self._free_slots = list(range(self.max_entries - 1, -1, -1))
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+        }
+
+    # ------------------------------------------------------------------
+    # Lookup
+    # ------------------------------------------------------------------
+    def get_exact(self, question: str, mode: str = "llm") -> Optional[Dict[str, Any]]:
+        key = (mode, normalize_question(question))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.expires <= time.time():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            self.exact_hits += 1
+            return dict(entry.payload)
+
+    def get_semantic(self, embedding: Sequence[float], mode: str = "llm") -> Optional[Dict[str, Any]]:
+        """Answer of the most similar live cached question in ``mode``, if similar enough."""
+        vec = self._unit(embedding)
+        with self._lock:
+            if self._matrix is None or vec is None or vec.shape[0] != self._matrix.shape[1]:
+                self.misses += 1
+                return None
+            sims = self._matrix @ vec
+            live = (self._slot_expires > time.time()) & (self._slot_modes == mode)
+            sims[~live] = -np.inf
+            best = int(np.argmax(sims))
+            key = self._slot_keys[best]
+            if key is None or sims[best] < self.similarity_threshold:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.semantic_hits += 1
+            return dict(self._entries[key].payload)
+
+    # ------------------------------------------------------------------
+    # Insert / evict
+    # ------------------------------------------------------------------
+    def put(
+        self,
+        question: str,
+        embedding: Optional[Sequence[float]],
+        payload: Dict[str, Any],
+        mode: str = "llm",
+    ) -> None:
+        normalized = normalize_question(question)
+        if not normalized:
+            return
+        key = (mode, normalized)
+        vec = self._unit(embedding)
+        nbytes = len(mode) + len(normalized) + _payload_bytes(payload) + (vec.nbytes if vec is not None else 0)
+        if nbytes > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            while self._entries and (
+                len(self._entries) >= self.max_entries or self._bytes + nbytes > self.max_bytes
+            ):
+                self._remove(next(iter(self._entries)))
+
+            expires = time.time() + self.ttl_seconds
+            slot = None
+            if vec is not None:
+                if self._matrix is None:
+                    self._matrix = np.zeros((self.max_entries, vec.shape[0]), dtype=np.float32)
+                if vec.shape[0] == self._matrix.shape[1]:
+                    slot = self._free_slots.pop()
+                    self._matrix[slot] = vec
+                    self._slot_keys[slot] = key
+                    self._slot_modes[slot] = mode
+                    self._slot_expires[slot] = expires
+            self._entries[key] = _Entry(dict(payload), slot, expires, nbytes)
+            self._bytes += nbytes
+
+    def clear(self) -> None:
+        with self._lock:
+            for key in list(self._entries):
+                self._remove(key)
+
+    def _remove(self, key: _Key) -> None:
+        entry = self._entries.pop(key)
+        self._bytes -= entry.nbytes
+        if entry.slot is not None:
+            self._slot_keys[entry.slot] = None
+            self._slot_modes[entry.slot] = None
+            self._slot_expires[entry.slot] = 0.0
+            self._free_slots.append(entry.slot)
+
+    @staticmethod
+    def _unit(embedding: Optional[Sequence[float]]) -> Optional[np.ndarray]:
+        if embedding is None:
+            return None
+        vec = np.asarray(embedding, dtype=np.float32)
+        norm = float(np.linalg.norm(vec))
+        return vec / norm if norm else None
@@ -1,52 +1,119 @@
-from flask import Flask, render_template, request, jsonify, send_from_directory
-from langchain_pinecone import PineconeVectorStore
-from langchain_openai import OpenAIEmbeddings, ChatOpenAI
-from langchain.chains import RetrievalQA
-from langchain.prompts import PromptTemplate
+from flask import Flask, Response, g, render_template, request, jsonify, send_from_directory, stream_with_context
+from langchain_core.callbacks import BaseCallbackHandler
 from dotenv import load_dotenv
+from answer_cache import (
+    DEFAULT_MAX_BYTES,
+    DEFAULT_MAX_ENTRIES,
+    DEFAULT_SIMILARITY,
+    DEFAULT_TTL_SECONDS,
+    AnswerCache,
+    normalize_question,
+)
+from extractive import best_passage, format_answer, format_seconds
+from index_generations import PointerWatcher
+from metrics import (
+    CACHE_HITS,
+    COALESCED,
+    ERRORS,
+    REQUEST_SECONDS,
+    StageTimingHandler,
+    TimedEmbeddings,
+    render_metrics,
+    server_timing,
+    stage,
+    start_request,
+)
+from embedding_cache import remember_query_vector
+from singleflight import SingleFlight
+from transcript_store import open_transcript_store
+import contextvars
+import json
+import logging
 import os
-# Try to import video processor, but handle gracefully if not available
-try:
-    from video_processor import get_video_processor
-    VIDEO_PROCESSING_AVAILABLE = True
-except ImportError:
-    VIDEO_PROCESSING_AVAILABLE = False
-    get_video_processor = lambda: None
-
-# Try to import Google Cloud Storage for video proxy
-try:
-    from google.cloud import storage
-    GCS_AVAILABLE = True
-except ImportError:
-    GCS_AVAILABLE = False
-    storage = None
+import threading
+import time
+
+# LangChain/OpenAI/Pinecone, the video processor (MoviePy) and Google Cloud
+# Storage are imported on first use rather than here: api/index.py imports this
+# module on every serverless cold start.
 
 # Load environment variables
 load_dotenv()
 
 app = Flask(__name__)
 
-# Initialize the components
-def initialize_qa_system():
-    """Initialize the QA system with Pinecone and OpenAI"""
-    try:
-        # Set up embeddings and vector store
-        embeddings = OpenAIEmbeddings(model="text-embedding-3-small")
-        vectorstore = PineconeVectorStore(
-            index_name=os.getenv("PINECONE_INDEX", "archiveassistanttest"),
-            embedding=embeddings
-        )
-        
-        # Set up the LLM
-        llm = ChatOpenAI(
-            temperature=0.2,
-            model_name="gpt-3.5-turbo",
-            frequency_penalty=0.6,
-            presence_penalty=0.1,
+@app.before_request
+def _start_request_timing():
+    g.request_started = time.perf_counter()
+    g.stage_timings = start_request()
+
+@app.after_request
+def _finish_request_timing(response):
+    """Record the request duration and report its stages in a Server-Timing header"""
+    started = g.pop('request_started', None)
+    if started is not None:
+        elapsed = time.perf_counter() - started
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        REQUEST_SECONDS.observe((route, str(response.status_code)), elapsed)
+        # Streamed responses only carry the stages finished before the first byte
+        response.headers['Server-Timing'] = server_timing(g.get('stage_timings') or {}, elapsed)
+    return response
+
+# Which vector index backs retrieval: "pinecone" (default) or "local"
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "pinecone").strip().lower()
+
+# Default answer mode: "llm" or "extractive" (quote picked without an LLM call);
+# requests can override it with {"mode": ...}
+CHAT_MODE = os.getenv("CHAT_MODE", "llm").strip().lower()
+# Answer extractively when the LLM call fails or times out
+EXTRACTIVE_FALLBACK = os.getenv("EXTRACTIVE_FALLBACK", "on").strip().lower() not in {"off", "0", "false"}
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "30"))
+# "hybrid" fuses dense results with BM25 over the lexical index when it exists;
+# "dense" uses the embedding retriever alone
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "hybrid").strip().lower()
+# Candidates each retriever contributes to rank fusion
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "10"))
+
+# Pointer to the live index generation (see index_generations.py), re-read this often
+INDEX_POINTER_POLL_SECONDS = float(os.getenv("INDEX_POINTER_POLL_SECONDS", "30"))
+
+def build_vectorstore(embeddings, generation=None):
+    """Create the vector store selected by VECTOR_BACKEND, in the given index generation"""
+    generation = generation or {}
+    if VECTOR_BACKEND == "local":
+        from local_vector_store import LocalVectorStore
+        return LocalVectorStore(
+            embedding=embeddings,
+            index_dir=generation.get("index_dir") or os.getenv("LOCAL_INDEX_DIR", "index_data"),
         )
-        
-        # Custom prompt template
-        prompt_template = """You are an assistant that helps people find direct quotes from Henry's teachings. 
+    from langchain_pinecone import PineconeVectorStore
+    return PineconeVectorStore(
+        index_name=generation.get("index") or os.getenv("PINECONE_INDEX", "archiveassistanttest"),
+        embedding=embeddings,
+        namespace=generation.get("namespace") or None,
+    )
+
+def build_generation_chain(llm, embeddings, generation=None):
+    """QA chain over one index generation: its vectors and, for hybrid retrieval, its lexical index"""
+    vectorstore = build_vectorstore(embeddings, generation)
+    lexical_index = None
+    if RETRIEVAL_MODE == "hybrid":
+        from lexical_index import open_lexical_index
+        lexical_index = open_lexical_index((generation or {}).get("lexical_index"))
+        if lexical_index is None:
+            print("No lexical index found; using dense retrieval only")
+    return build_qa_chain(llm, vectorstore, lexical_index)
+
+def build_qa_chain(llm, vectorstore, lexical_index=None):
+    """RetrievalQA chain (prompt, MMR retriever, metadata-aware document prompt) over the given components
+
+    With a lexical index, the MMR candidates are fused with its BM25 matches.
+    """
+    from langchain.chains import RetrievalQA
+    from langchain.prompts import PromptTemplate
+
+    # Custom prompt template
+    prompt_template = """You are an assistant that helps people find direct quotes from Henry's teachings. 
 
 CRITICAL INSTRUCTIONS FOR SUBSTANTIAL QUOTES:
 1. SCAN the provided context carefully to find the MOST RELEVANT section that directly addresses the question
@@ -83,42 +150,83 @@ Timestamp: [HH:MM:SS or HH:MM:SS–HH:MM:SS when computed from seconds; round se
 Henry's Quote: "[Start with the most relevant sentence that answers the question, then continue with the following sentences from that same section to provide a complete, extended passage that gives fuller context and meaning]"
 
 Answer:"""
-        
-        PROMPT = PromptTemplate(
-            template=prompt_template,
-            input_variables=["context", "question"]
+    
+    PROMPT = PromptTemplate(
+        template=prompt_template,
+        input_variables=["context", "question"]
+    )
+    
+    # Create QA chain with enhanced retrieval and a document prompt that exposes metadata
+    if lexical_index is not None:
+        from hybrid_retriever import HybridRetriever
+        retriever = HybridRetriever(
+            dense=vectorstore.as_retriever(
+                search_type="mmr",
+                search_kwargs={"k": HYBRID_CANDIDATES, "fetch_k": max(20, 2 * HYBRID_CANDIDATES), "lambda_mult": 0.3}
+            ),
+            lexical=lexical_index,
+            k=3,
+            candidates=HYBRID_CANDIDATES,
         )
-        
-        # Create QA chain with enhanced retrieval and a document prompt that exposes metadata
+    else:
         retriever = vectorstore.as_retriever(
             search_type="mmr",
             search_kwargs={"k": 3, "fetch_k": 20, "lambda_mult": 0.3}
         )
 
-        # Make each document include the teaching (CSV filename) and seconds when present
-        from langchain.prompts import PromptTemplate as _DocPrompt
-        document_prompt = _DocPrompt(
-            input_variables=["page_content", "teaching_name", "start_seconds", "end_seconds"],
-            template=(
-                "Teaching: {teaching_name}\n"
-                "StartSeconds: {start_seconds}\nEndSeconds: {end_seconds}\n"
-                "{page_content}"
-            ),
-        )
+    # Make each document include the teaching (CSV filename) and seconds when present
+    from langchain.prompts import PromptTemplate as _DocPrompt
+    document_prompt = _DocPrompt(
+        input_variables=["page_content", "teaching_name", "start_seconds", "end_seconds"],
+        template=(
+            "Teaching: {teaching_name}\n"
+            "StartSeconds: {start_seconds}\nEndSeconds: {end_seconds}\n"
+            "{page_content}"
+        ),
+    )
 
-        qa_chain = RetrievalQA.from_chain_type(
-            llm=llm,
-            chain_type="stuff",
-            retriever=retriever,
-            chain_type_kwargs={
-                "prompt": PROMPT,
-                "document_prompt": document_prompt,
-                "document_variable_name": "context",  # ensure docs render into {context}
-            },
-            return_source_documents=True,
+    qa_chain = RetrievalQA.from_chain_type(
+        llm=llm,
+        chain_type="stuff",
+        retriever=retriever,
+        chain_type_kwargs={
+            "prompt": PROMPT,
+            "document_prompt": document_prompt,
+            "document_variable_name": "context",  # ensure docs render into {context}
+        },
+        return_source_documents=True,
+    )
+    
+    return qa_chain
+
+# Initialize the components
+def initialize_qa_system():
+    """Initialize the QA system with the configured vector store and OpenAI"""
+    try:
+        from langchain_openai import OpenAIEmbeddings, ChatOpenAI
+        from embedding_cache import QueryVectorReuse, cached_embeddings_from_env
+
+        # Set up embeddings and vector store; the retriever reuses the answer cache's question vector
+        embeddings = QueryVectorReuse(
+            TimedEmbeddings(cached_embeddings_from_env(OpenAIEmbeddings(model="text-embedding-3-small")))
+        )
+        # Set up the LLM
+        llm = ChatOpenAI(
+            temperature=0.2,
+            model_name="gpt-3.5-turbo",
+            frequency_penalty=0.6,
+            presence_penalty=0.1,
+            streaming=True,  # emit per-token callbacks for /chat/stream
+            request_timeout=LLM_TIMEOUT_SECONDS,
+            stream_usage=True,  # token counts for /metrics
         )
         
-        return qa_chain
+        generation = index_watcher.load()
+        chain = build_generation_chain(llm, embeddings, generation)
+        index_watcher.commit(generation)
+        if generation:
+            print(f"Serving index generation {generation.get('generation')}")
+        return chain
         
     except Exception as e:
         print(f"Error initializing QA system: {e}")
@@ -126,181 +234,681 @@ Answer:"""
         print(f"OPENAI_API_KEY set: {'OPENAI_API_KEY' in os.environ}")
         print(f"PINECONE_API_KEY set: {'PINECONE_API_KEY' in os.environ}")
         print(f"PINECONE_INDEX set: {'PINECONE_INDEX' in os.environ}")
+        print(f"VECTOR_BACKEND: {VECTOR_BACKEND}")
+        print(f"RETRIEVAL_MODE: {RETRIEVAL_MODE}")
         import traceback
         traceback.print_exc()
         return None
 
-# Initialize the QA system
-qa_system = initialize_qa_system()
+# The QA system is built on first use (or by /warmup), not at import time
+qa_system = None
+index_watcher = PointerWatcher(poll_seconds=INDEX_POINTER_POLL_SECONDS)
+_qa_system_lock = threading.Lock()
+_qa_system_failed_at = None
+# After a failed initialization, wait this long before trying again
+QA_INIT_RETRY_SECONDS = 30
+
+def get_qa_system():
+    """The shared QA chain, initialized on first call; None if initialization failed"""
+    global qa_system, _qa_system_failed_at
+    if qa_system is None:
+        with _qa_system_lock:
+            retry_due = _qa_system_failed_at is None or time.time() - _qa_system_failed_at >= QA_INIT_RETRY_SECONDS
+            if qa_system is None and retry_due:
+                qa_system = initialize_qa_system()
+                _qa_system_failed_at = None if qa_system is not None else time.time()
+    elif index_watcher.due():
+        _follow_index_generation()
+    return qa_system
+
+def _follow_index_generation():
+    """Switch to a newly activated index generation; requests in flight finish on the old chain"""
+    global qa_system
+    generation = index_watcher.poll()
+    if generation is None:
+        return
+    try:
+        current = qa_system
+        new_chain = build_generation_chain(
+            current.combine_documents_chain.llm_chain.llm,
+            current.retriever.vectorstore.embeddings,
+            generation,
+        )
+    except Exception as e:
+        # Not committed, so the next poll tries this generation again
+        print(f"Could not switch to index generation {generation.get('generation')}: {e}")
+        return
+    # A single assignment: each request sees either the old chain or the new one
+    qa_system = new_chain
+    index_watcher.commit(generation)
+    print(f"Switched to index generation {generation.get('generation')}")
+
+def get_video_processor():
+    """The shared VideoProcessor, imported on first use; None if unavailable"""
+    try:
+        from video_processor import get_video_processor as _get_video_processor
+    except ImportError:
+        return None
+    return _get_video_processor()
+
+_clip_jobs = None
+_clip_jobs_lock = threading.Lock()
+
+def get_clip_jobs():
+    """The background clip job pool, started on first use; None if video processing is unavailable"""
+    global _clip_jobs
+    if _clip_jobs is None:
+        with _clip_jobs_lock:
+            if _clip_jobs is None:
+                processor = get_video_processor()
+                if processor is None:
+                    return None
+                from clip_jobs import ClipJobs
+                _clip_jobs = ClipJobs(processor)
+    return _clip_jobs
+
+def submit_clip_job(data):
+    """Queue a clip for a JSON request body; returns (payload, status code)
+
+    The body names the moment either as {"timestamp", "teaching"} or as an
+    answer's {"response_text"}, plus an optional "duration_minutes".
+    """
+    jobs = get_clip_jobs()
+    if jobs is None:
+        return {'error': 'Video processing is not available'}, 503
+    processor = jobs.processor
+    response_text = str(data.get('response_text') or '')
+    timestamp = str(data.get('timestamp') or '') or processor.extract_timestamp_from_response(response_text)
+    if not timestamp:
+        return {'error': 'No timestamp provided'}, 400
+    teaching = str(data.get('teaching') or '')
+    video_path = processor.choose_video(f"Teaching: {teaching}" if teaching else response_text)
+    if not video_path:
+        return {'error': 'No local video found for this teaching'}, 404
+    try:
+        duration_minutes = float(data.get('duration_minutes') or 2)
+    except (TypeError, ValueError):
+        return {'error': 'Invalid duration_minutes'}, 400
+    job = jobs.submit(video_path, timestamp, duration_minutes)
+    if job is None:
+        return {'error': 'Could not create a clip for this timestamp'}, 422
+    payload = job.to_dict()
+    payload['status_url'] = f"/clips/{job.id}"
+    return payload, 200 if payload['status'] == 'done' else 202
+
+def clip_job_status(job_id):
+    """Status payload of a clip job; returns (payload, status code)"""
+    jobs = _clip_jobs
+    job = jobs.get(job_id) if jobs is not None else None
+    if job is None:
+        return {'error': 'Unknown clip job'}, 404
+    return job.to_dict(), 200
+
+_gcs_client = None
+_gcs_client_lock = threading.Lock()
+
+def get_gcs_client():
+    """Google Cloud Storage client for the video proxy, created on first use; None if unavailable"""
+    global _gcs_client
+    if _gcs_client is None:
+        with _gcs_client_lock:
+            if _gcs_client is None:
+                try:
+                    from google.cloud import storage
+                    _gcs_client = storage.Client()
+                except Exception as e:
+                    print(f"Google Cloud Storage unavailable: {e}")
+                    return None
+    return _gcs_client
 
 @app.route('/')
 def home():
     """Render the main chat interface"""
     return render_template('index.html')
 
-@app.route('/chat', methods=['POST'])
-def chat():
-    """Handle chat requests and generate video clips"""
+# Row-level timing compiled by ingest_transcripts.py, memory-mapped once per process
+transcript_store = open_transcript_store()
+
+# Shingle index over the transcript store, built on first use
+_quote_aligner = None
+_quote_aligner_lock = threading.Lock()
+
+# Fraction of the quote's word trigrams that must land on one transcript span
+MIN_ALIGNMENT_SCORE = float(os.getenv("MIN_ALIGNMENT_SCORE", "0.3"))
+
+def get_quote_aligner():
+    global _quote_aligner
+    if _quote_aligner is None and transcript_store is not None:
+        with _quote_aligner_lock:
+            if _quote_aligner is None:
+                from quote_aligner import QuoteAligner
+                _quote_aligner = QuoteAligner(transcript_store)
+    return _quote_aligner
+
+def _align_quote(response, docs):
+    """Align the quoted passage to transcript rows of the retrieved teachings"""
     try:
-        data = request.get_json()
-        question = data.get('question', '')
-        
-        if not question:
-            return jsonify({'error': 'No question provided'}), 400
-        
-        if not qa_system:
-            return jsonify({'error': 'QA system not initialized. Please check your API keys and Pinecone setup.'}), 500
-        
-        # Get response from QA system
-        result = qa_system.invoke(question)
-        response = result['result']
-        
-        # Extract video information from source documents
-        video_url = None
-        video_timestamp = None
-        
-        try:
-            docs = result.get('source_documents') or []
-            if docs:
+        aligner = get_quote_aligner()
+        if aligner is None:
+            return None
+        from quote_aligner import extract_quote
+        teaching_ids = {
+            transcript_store.find_teaching(name=(d.metadata or {}).get('teaching_name'),
+                                           filename=(d.metadata or {}).get('filename'))
+            for d in docs
+        }
+        teaching_ids.discard(None)
+        alignment = aligner.align(extract_quote(response), teaching_ids=teaching_ids or None)
+        if alignment is None or alignment.score < MIN_ALIGNMENT_SCORE or alignment.start_seconds is None:
+            return None
+        return alignment
+    except Exception as e:
+        print(f"Quote alignment failed: {e}")
+        return None
+
+def _store_sections(md, start_s, end_s):
+    """Row-level (timestamp, text) sections for a chunk, read from the transcript store"""
+    teaching_id = transcript_store.find_teaching(name=md.get('teaching_name'), filename=md.get('filename'))
+    if teaching_id is None:
+        return None
+    sections = []
+    for row in transcript_store.rows_between(teaching_id, float(start_s), float(end_s)):
+        row_start, row_end = transcript_store.row_timing(row)
+        if row_start is None:
+            continue
+        sections.append({
+            'timestamp': (row_start, row_end if row_end is not None else row_start),
+            'text': [transcript_store.row_text(row)],
+        })
+    return sections
+
+def _parse_timestamp_sections(content):
+    """Split chunk text into sections at its 'Timestamp: start-end' lines"""
+    import re
+
+    sections = []
+    lines = content.split('\n')
+    current_section = {'timestamp': None, 'text': []}
+
+    for line in lines:
+        if 'Timestamp:' in line:
+            # Save previous section if it exists
+            if current_section['timestamp'] and current_section['text']:
+                sections.append(current_section)
+
+            # Start new section
+            ts_match = re.search(r'(\d+(?:\.\d+)?)-(\d+(?:\.\d+)?)', line)
+            if ts_match:
+                current_section = {
+                    'timestamp': (float(ts_match.group(1)), float(ts_match.group(2))),
+                    'text': []
+                }
+        else:
+            if line.strip():  # Only add non-empty lines
+                current_section['text'].append(line.strip())
+
+    # Add final section
+    if current_section['timestamp'] and current_section['text']:
+        sections.append(current_section)
+
+    return sections
+
+def _best_overlap_doc(response_words, docs):
+    """The source document sharing the most words with the response"""
+    best_doc = docs[0]
+    best_match_score = 0
+    for doc in docs:
+        doc_words = set(doc.page_content.lower().split())
+        overlap = len(response_words.intersection(doc_words))
+        if overlap > best_match_score:
+            best_match_score = overlap
+            best_doc = doc
+    return best_doc
+
+def extract_video_info(response, docs):
+    """Pick the best-matching source document and timestamp for a response.
+
+    Returns (response, video_url, video_timestamp); the response gains a
+    Teaching/Timestamp header when the LLM left one out.
+    """
+    video_url = None
+    video_timestamp = None
+
+    try:
+        if docs:
+            response_words = set(response.lower().split())
+
+            # Prefer an exact quote alignment against the transcript rows; it names
+            # the source teaching and the precise start/end seconds directly
+            alignment = _align_quote(response, docs)
+            best_doc = None
+            if alignment is not None:
+                best_doc = next(
+                    (d for d in docs if (d.metadata or {}).get('filename') == alignment.filename),
+                    None,
+                )
+            if best_doc is None:
                 # Find the document that most likely contains the quoted content
-                best_doc = docs[0]
-                best_match_score = 0
-                
-                # Check which document has the most overlap with the response
-                response_words = set(response.lower().split())
-                for doc in docs:
-                    doc_words = set(doc.page_content.lower().split())
-                    overlap = len(response_words.intersection(doc_words))
-                    if overlap > best_match_score:
-                        best_match_score = overlap
-                        best_doc = doc
-                
-                md = getattr(best_doc, 'metadata', {}) or {}
-                start_s = md.get('start_seconds')
-                end_s = md.get('end_seconds')
-                teaching = md.get('teaching_name')
-                
-                # Get video URL if available (now publicly accessible)
-                video_url = md.get('video_url')
-                
-                # Try to find the most precise timestamp by analyzing the content structure
-                content = best_doc.page_content
-                import re
-                
-                # Parse content into timestamp sections
-                sections = []
-                lines = content.split('\n')
-                current_section = {'timestamp': None, 'text': []}
-                
-                for line in lines:
-                    if 'Timestamp:' in line:
-                        # Save previous section if it exists
-                        if current_section['timestamp'] and current_section['text']:
-                            sections.append(current_section)
-                        
-                        # Start new section
-                        ts_match = re.search(r'(\d+(?:\.\d+)?)-(\d+(?:\.\d+)?)', line)
-                        if ts_match:
-                            current_section = {
-                                'timestamp': (float(ts_match.group(1)), float(ts_match.group(2))),
-                                'text': []
-                            }
-                    else:
-                        if line.strip():  # Only add non-empty lines
-                            current_section['text'].append(line.strip())
-                
-                # Add final section
-                if current_section['timestamp'] and current_section['text']:
-                    sections.append(current_section)
-                
+                best_doc = _best_overlap_doc(response_words, docs)
+
+            md = getattr(best_doc, 'metadata', {}) or {}
+            start_s = md.get('start_seconds')
+            end_s = md.get('end_seconds')
+            teaching = md.get('teaching_name')
+
+            # Get video URL if available (now publicly accessible)
+            video_url = md.get('video_url')
+
+            if alignment is not None:
+                start_s = alignment.start_seconds
+                end_s = alignment.end_seconds
+                teaching = alignment.teaching_name
+                logging.debug(
+                    "Aligned quote to rows %s-%s (%s-%s, score %.2f)",
+                    alignment.row_start, alignment.row_end, start_s, end_s, alignment.score,
+                )
+            else:
+                # Row-level timing comes from the memory-mapped transcript store when
+                # available; otherwise parse the Timestamp: lines out of the chunk
+                sections = None
+                if transcript_store is not None and start_s is not None and end_s is not None:
+                    sections = _store_sections(md, start_s, end_s)
+                if not sections:
+                    sections = _parse_timestamp_sections(best_doc.page_content)
+
                 # Find the section with the highest overlap with the response
                 if sections and response_words:
                     best_section = None
                     best_overlap = 0
-                    
+
                     for section in sections:
                         section_text = ' '.join(section['text']).lower()
                         section_words = set(section_text.split())
                         overlap = len(response_words.intersection(section_words))
-                        
+
                         if overlap > best_overlap:
                             best_overlap = overlap
                             best_section = section
-                    
+
                     # Use the timestamp from the best matching section
                     if best_section and best_overlap > 2:  # Lower threshold for better matching
                         start_s = best_section['timestamp'][0]
                         end_s = best_section['timestamp'][1]
                         print(f"DEBUG: Using precise timestamp {start_s}-{end_s} with {best_overlap} word overlap")
-                
-                # Format timestamp for display and video seeking
-                if start_s is not None or end_s is not None:
-                    def fmt(s):
-                        try:
-                            s = float(s)
-                            h = int(s // 3600)
-                            m = int((s % 3600) // 60)
-                            se = int(round(s % 60))
-                            return f"{h:02d}:{m:02d}:{se:02d}"
-                        except Exception:
-                            return None
-                    
-                    start_str = fmt(start_s) if start_s is not None else None
-                    end_str = fmt(end_s) if end_s is not None else None
-                    
-                    # For display
-                    ts_display = None
-                    if start_str and end_str:
-                        ts_display = f"{start_str}-{end_str}"
-                    elif start_str:
-                        ts_display = start_str
-                    
-                    # For video seeking (use start time in seconds)
-                    if start_s is not None and video_url:
-                        video_timestamp = int(start_s)
-                    
-                    # Add timestamp to response if not already present
-                    if ts_display and 'Timestamp:' not in response:
-                        header = []
-                        if teaching and 'Teaching:' not in response:
-                            header.append(f"Teaching: {teaching}")
-                        header.append(f"Timestamp: {ts_display}")
-                        response = "\n".join(header + [response])
-        except Exception as e:
-            print(f"Error processing video metadata: {e}")
-            pass
-        
+
+            # Format timestamp for display and video seeking
+            if start_s is not None or end_s is not None:
+                def fmt(s):
+                    try:
+                        return format_seconds(s)
+                    except Exception:
+                        return None
+
+                start_str = fmt(start_s) if start_s is not None else None
+                end_str = fmt(end_s) if end_s is not None else None
+
+                # For display
+                ts_display = None
+                if start_str and end_str:
+                    ts_display = f"{start_str}-{end_str}"
+                elif start_str:
+                    ts_display = start_str
+
+                # For video seeking (use start time in seconds)
+                if start_s is not None and video_url:
+                    video_timestamp = int(start_s)
+
+                # Add timestamp to response if not already present
+                if ts_display and 'Timestamp:' not in response:
+                    header = []
+                    if teaching and 'Teaching:' not in response:
+                        header.append(f"Teaching: {teaching}")
+                    header.append(f"Timestamp: {ts_display}")
+                    response = "\n".join(header + [response])
+    except Exception as e:
+        print(f"Error processing video metadata: {e}")
+
+    return response, video_url, video_timestamp
+
+def _build_answer_cache():
+    if os.getenv("ANSWER_CACHE", "on").strip().lower() in {"off", "0", "false"}:
+        return None
+    return AnswerCache(
+        ttl_seconds=float(os.getenv("ANSWER_CACHE_TTL_SECONDS", DEFAULT_TTL_SECONDS)),
+        max_entries=int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES)),
+        max_bytes=int(float(os.getenv("ANSWER_CACHE_MAX_MB", DEFAULT_MAX_BYTES / (1024 * 1024))) * 1024 * 1024),
+        similarity_threshold=float(os.getenv("ANSWER_CACHE_SIMILARITY", DEFAULT_SIMILARITY)),
+    )
+
+# Exact + semantic cache of finished answers, checked before the QA chain runs
+answer_cache = _build_answer_cache()
+
+def _query_embedding(question):
+    """Embed the question with the chain's (cached) embeddings; None on failure"""
+    try:
+        return qa_system.retriever.vectorstore.embeddings.embed_query(question)
+    except Exception as e:
+        print(f"Could not embed question for the answer cache: {e}")
+        return None
+
+def cached_answer(question, mode):
+    """Exact-match answer cached for this question in this mode, or None"""
+    if answer_cache is None:
+        return None
+    return answer_cache.get_exact(question, mode)
+
+def lookup_similar_answer(question, mode):
+    """Returns (payload cached for a paraphrase or None, question embedding or None)
+
+    Embeds the question, so it runs inside the question's flight: requests
+    coalesced onto the flight wait for its answer instead of embedding too.
+    """
+    if answer_cache is None:
+        return None, None
+    query_vec = _query_embedding(question)
+    if query_vec is None:
+        return None, None
+    # Retrieval on a miss embeds the same question; hand it this vector
+    remember_query_vector(question, query_vec)
+    return answer_cache.get_semantic(query_vec, mode), query_vec
+
+def remember_answer(question, mode, query_vec, payload):
+    if answer_cache is not None:
+        answer_cache.put(question, query_vec, payload, mode)
+
+def _read_question():
+    """Validate the JSON body of a chat request; returns (question, error_response)"""
+    data = request.get_json(silent=True) or {}
+    question = data.get('question', '')
+
+    if not question:
+        return None, (jsonify({'error': 'No question provided'}), 400)
+
+    if not get_qa_system():
+        return None, (jsonify({'error': 'QA system not initialized. Please check your API keys and Pinecone setup.'}), 500)
+
+    return question, None
+
+def _read_mode():
+    """Answer mode requested in the JSON body, else CHAT_MODE"""
+    data = request.get_json(silent=True) or {}
+    mode = str(data.get('mode') or CHAT_MODE).strip().lower()
+    return 'extractive' if mode == 'extractive' else 'llm'
+
+# Teaching name -> video URL, for chunks ingested without video metadata
+VIDEO_MAPPING_PATH = os.getenv("VIDEO_MAPPING_PATH", "video_mapping.json")
+
+def load_video_urls():
+    """Teaching -> video index over video_mapping.json, rebuilt when the file changes"""
+    from video_resolver import shared_teaching_index
+    return shared_teaching_index(mapping_path=VIDEO_MAPPING_PATH)
+
+def attach_video_urls(docs, video_urls):
+    """Fill in video_url for retrieved docs whose metadata lacks one"""
+    for doc in docs:
+        md = doc.metadata
+        if md is not None and not md.get('video_url'):
+            url = video_urls.video_url(md.get('teaching_name') or '', fuzzy=False)
+            if url:
+                md['video_url'] = url
+    return docs
+
+def extractive_payload(question, docs):
+    """Best verbatim passage from already retrieved docs, as a /chat payload"""
+    with stage('align'):
+        passage = best_passage(question, docs, transcript_store)
+        if passage is None:
+            return {
+                'response': "No relevant passage was found in the archive for this question.",
+                'video_url': None,
+                'video_timestamp': None,
+                'mode': 'extractive',
+            }
+        response, video_url, video_timestamp = extract_video_info(format_answer(passage), [passage.doc])
+    return {
+        'response': response,
+        'video_url': video_url,
+        'video_timestamp': video_timestamp,
+        'mode': 'extractive',
+    }
+
+def answer_extractively(question):
+    """Retrieve and return the best verbatim passage, with no LLM call"""
+    docs = qa_system.retriever.invoke(question, config={'callbacks': [StageTimingHandler()]})
+    return extractive_payload(question, attach_video_urls(docs, load_video_urls()))
+
+def llm_payload(result, video_urls=None):
+    """/chat payload for a finished QA chain result; video_urls defaults to load_video_urls()"""
+    if video_urls is None:
+        video_urls = load_video_urls()
+    docs = attach_video_urls(result.get('source_documents') or [], video_urls)
+    with stage('align'):
+        response, video_url, video_timestamp = extract_video_info(result['result'], docs)
+    return {
+        'response': response,
+        'video_url': video_url,
+        'video_timestamp': video_timestamp,
+        'mode': 'llm',
+    }
+
+def answer_question(question, mode):
+    """Answer a question that missed the exact-match cache, as the leader of its flight"""
+    cached, query_vec = lookup_similar_answer(question, mode)
+    if cached is not None:
+        CACHE_HITS.inc()
+        return cached
+
+    # Extractive answers are cheap to recompute, so they are never cached
+    if mode == 'extractive':
+        return answer_extractively(question)
+
+    try:
+        result = qa_system.invoke(question, config={'callbacks': [StageTimingHandler()]})
+    except Exception as e:
+        if not EXTRACTIVE_FALLBACK:
+            raise
+        print(f"LLM call failed ({type(e).__name__}: {e}); answering extractively")
+        return answer_extractively(question)
+
+    payload = llm_payload(result)
+    remember_answer(question, mode, query_vec, payload)
+    return payload
+
+# Identical questions asked while one is already being answered wait for that
+# answer instead of running retrieval and the LLM again
+chat_flights = SingleFlight()
+
+def _flight_key(question, mode):
+    return (mode, normalize_question(question))
+
+@app.route('/chat', methods=['POST'])
+def chat():
+    """Handle chat requests and generate video clips"""
+    try:
+        question, error = _read_question()
+        if error:
+            return error
+
+        # Repeated questions are answered from the cache; paraphrases are
+        # looked up by the flight's leader
+        mode = _read_mode()
+        cached = cached_answer(question, mode)
+        if cached is not None:
+            CACHE_HITS.inc()
+            with stage('serialize'):
+                return jsonify(cached)
+
+        payload, shared = chat_flights.do(_flight_key(question, mode), lambda: answer_question(question, mode))
+        if shared:
+            COALESCED.inc()
+
         # Return response with video information
-        return jsonify({
-            'response': response,
-            'video_url': video_url,
-            'video_timestamp': video_timestamp
-        })
+        with stage('serialize'):
+            return jsonify(payload)
         
     except Exception as e:
+        ERRORS.inc(('request',))
         return jsonify({'error': f'Error processing question: {str(e)}'}), 500
 
+class _TokenBroadcastHandler(BaseCallbackHandler):
+    """Publishes LLM tokens from the chain's worker thread to every request in the flight"""
+
+    def __init__(self, flight):
+        self.flight = flight
+        self.streamed = False
+
+    def on_llm_new_token(self, token, **kwargs):
+        if token:
+            self.streamed = True
+            self.flight.publish('token', {'token': token})
+
+def _stream_answer(question, mode, flight):
+    """Answer as a flight leader: publish tokens as they arrive, then 'done'"""
+    cached, query_vec = lookup_similar_answer(question, mode)
+    if cached is not None:
+        CACHE_HITS.inc()
+        flight.publish('done', cached)
+        return
+
+    if mode == 'extractive':
+        flight.publish('done', answer_extractively(question))
+        return
+
+    handler = _TokenBroadcastHandler(flight)
+    try:
+        result = qa_system.invoke(question, config={'callbacks': [handler, StageTimingHandler()]})
+    except Exception as e:
+        # Fall back only if nothing was streamed yet, so the client never
+        # sees half an LLM answer followed by a different one
+        if not EXTRACTIVE_FALLBACK or handler.streamed:
+            raise
+        print(f"LLM call failed ({e}); answering extractively")
+        flight.publish('done', answer_extractively(question))
+        return
+
+    payload = llm_payload(result)
+    remember_answer(question, mode, query_vec, payload)
+    flight.publish('done', payload)
+
+def _sse(event, payload):
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+@app.route('/chat/stream', methods=['POST'])
+def chat_stream():
+    """Stream LLM tokens as Server-Sent Events, then a final event with video info"""
+    question, error = _read_question()
+    if error:
+        return error
+    mode = _read_mode()
+
+    def generate():
+        cached = cached_answer(question, mode)
+        if cached is not None:
+            CACHE_HITS.inc()
+            yield _sse('done', cached)
+            return
+
+        key = _flight_key(question, mode)
+        flight, leader = chat_flights.join(key)
+        if leader:
+            def run_flight():
+                try:
+                    _stream_answer(question, mode, flight)
+                except Exception as e:
+                    ERRORS.inc(('request',))
+                    flight.publish('error', e)
+                finally:
+                    chat_flights.finish(key, flight)
+
+            # The chain runs on its own thread so it finishes for the other
+            # requests in the flight even if this client disconnects. It runs in
+            # a copy of this context so its stages count towards this request.
+            threading.Thread(target=contextvars.copy_context().run, args=(run_flight,), daemon=True).start()
+        else:
+            COALESCED.inc()
+
+        # Replays whatever the flight has produced so far, then follows it live
+        for event, data in flight:
+            if event == 'error':
+                yield _sse('error', {'error': f"Error processing question: {data}"})
+            else:
+                yield _sse(event, data)
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+
+@app.route('/warmup', methods=['GET', 'POST'])
+def warmup():
+    """Build lazily-initialized components ahead of the first real request.
+
+    Always warms the QA chain and the quote aligner; ?all=1 also loads the
+    video processor and the GCS client. Returns seconds spent per component.
+    """
+    timings = {}
+
+    def warm(name, fn):
+        started = time.perf_counter()
+        ok = fn() is not None
+        timings[name] = {'ready': ok, 'seconds': round(time.perf_counter() - started, 4)}
+
+    warm('qa_system', get_qa_system)
+    warm('quote_aligner', get_quote_aligner)
+    if request.args.get('all', '').lower() in {'1', 'true', 'yes'}:
+        warm('video_processor', get_video_processor)
+        warm('gcs_client', get_gcs_client)
+    return jsonify({'status': 'warm' if qa_system is not None else 'degraded', 'components': timings})
+
+@app.route('/metrics')
+def metrics():
+    """Stage latency histograms, token and error counters in Prometheus text format"""
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
 @app.route('/health')
 def health():
     """Health check endpoint"""
     video_available = False
-    if VIDEO_PROCESSING_AVAILABLE:
-        video_processor = get_video_processor()
-        if video_processor:
-            try:
-                video_available = os.path.exists(video_processor.video_path)
-            except:
-                video_available = False
+    clip_cache = None
+    video_processor = get_video_processor()
+    if video_processor:
+        try:
+            video_available = os.path.exists(video_processor.default_video_path)
+            clip_cache = video_processor.clip_cache.stats()
+        except:
+            video_available = False
     
     return jsonify({
         'status': 'healthy',
         'qa_system_initialized': qa_system is not None,
-        'video_processing_available': video_available
+        'index_generation': index_watcher.generation,
+        'transcript_store_rows': len(transcript_store) if transcript_store is not None else 0,
+        'answer_cache': answer_cache.stats() if answer_cache is not None else None,
+        'coalescing': chat_flights.stats(),
+        'video_processing_available': video_available,
+        'clip_cache': clip_cache,
+        'clip_jobs': _clip_jobs.stats() if _clip_jobs is not None else None,
     })
 
+@app.route('/clips', methods=['POST'])
+def create_clip():
+    """Queue a video clip; poll status_url until it is done"""
+    payload, status = submit_clip_job(request.get_json(silent=True) or {})
+    return jsonify(payload), status
+
+@app.route('/clips/<job_id>')
+def clip_status(job_id):
+    """Status of a clip job, with the clip URL once it is ready"""
+    payload, status = clip_job_status(job_id)
+    return jsonify(payload), status
+
 @app.route('/static/video_clips/<filename>')
 def serve_video_clip(filename):
     """Serve video clip files"""
+    # Only finished clips: not the cache index or clips still being written
+    if not filename.endswith('.mp4') or '.part' in filename:
+        return jsonify({'error': 'Video clip not found'}), 404
     try:
         return send_from_directory('static/video_clips', filename)
     except Exception as e:
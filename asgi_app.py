@@ -0,0 +1,272 @@
+"""
+Async (ASGI) entry point serving /, /chat, /clips, /health and /metrics.
+
+The Flask app in app.py ties up one worker thread per request for the whole
+embedding -> Pinecone -> LLM round trip, so a handful of slow LLM calls can
+exhaust the pool. Here every outbound call is awaited instead: embeddings and
+chat completions go through the OpenAI async client (one pooled HTTP
+connection set per process) and Pinecone through its async search, so a single
+worker keeps many questions in flight at once. Work that does not depend on
+retrieval, such as loading the teaching -> video mapping, runs concurrently
+with it.
+
+Answers, caching, extractive mode and error shapes are identical to app.py,
+whose helpers are reused. Run with:
+
+    uvicorn asgi_app:app --host 0.0.0.0 --port 5001
+"""
+
+import asyncio
+import os
+import time
+
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.requests import Request
+from starlette.responses import FileResponse, JSONResponse, PlainTextResponse
+from starlette.routing import Mount, Route
+from starlette.staticfiles import StaticFiles
+from starlette.templating import Jinja2Templates
+
+import app as flask_app
+from app import (
+    CHAT_MODE,
+    EXTRACTIVE_FALLBACK,
+    attach_video_urls,
+    cached_answer,
+    clip_job_status,
+    extractive_payload,
+    get_qa_system,
+    llm_payload,
+    load_video_urls,
+    remember_answer,
+    submit_clip_job,
+)
+from answer_cache import normalize_question
+from embedding_cache import remember_query_vector
+from metrics import (
+    CACHE_HITS,
+    COALESCED,
+    ERRORS,
+    REQUEST_SECONDS,
+    StageTimingHandler,
+    render_metrics,
+    server_timing,
+    stage,
+    start_request,
+)
+
+
+templates = Jinja2Templates(directory="templates")
+
+
+class AsyncSingleFlight:
+    """Coalesces concurrent coroutines on equal keys into one task."""
+
+    def __init__(self):
+        self._tasks = {}
+        self.leaders = 0
+        self.followers = 0
+
+    def stats(self) -> dict:
+        return {"in_flight": len(self._tasks), "leaders": self.leaders, "followers": self.followers}
+
+    async def do(self, key, make_coro):
+        """Await ``make_coro()`` once per concurrent ``key``; returns (result, shared)."""
+        task = self._tasks.get(key)
+        if task is not None:
+            self.followers += 1
+            # A cancelled follower must not cancel the leader's task
+            return await asyncio.shield(task), True
+        task = asyncio.ensure_future(make_coro())
+        self._tasks[key] = task
+        self.leaders += 1
+        task.add_done_callback(lambda t: self._tasks.pop(key, None) if self._tasks.get(key) is t else None)
+        return await asyncio.shield(task), False
+
+
+chat_flights = AsyncSingleFlight()
+
+
+async def get_qa_system_async():
+    """The shared QA chain, built (or switched to a new index generation) on a worker thread"""
+    if flask_app.qa_system is not None and not flask_app.index_watcher.due():
+        return flask_app.qa_system
+    return await asyncio.to_thread(get_qa_system)
+
+
+async def lookup_similar_answer(qa_system, question, mode):
+    """Returns (payload cached for a paraphrase or None, question embedding or None)
+
+    Embeds the question, so it runs inside the question's flight.
+    """
+    cache = flask_app.answer_cache
+    if cache is None:
+        return None, None
+    try:
+        query_vec = await qa_system.retriever.vectorstore.embeddings.aembed_query(question)
+    except Exception as e:
+        print(f"Could not embed question for the answer cache: {e}")
+        return None, None
+    # Retrieval on a miss embeds the same question; hand it this vector
+    remember_query_vector(question, query_vec)
+    return cache.get_semantic(query_vec, mode), query_vec
+
+
+async def answer_extractively(qa_system, question):
+    """Retrieve and return the best verbatim passage, with no LLM call"""
+    docs, video_urls = await asyncio.gather(
+        qa_system.retriever.ainvoke(question, config={'callbacks': [StageTimingHandler()]}),
+        asyncio.to_thread(load_video_urls),
+    )
+    return extractive_payload(question, attach_video_urls(docs, video_urls))
+
+
+async def answer_question(qa_system, question, mode):
+    """Answer a question that missed the exact-match cache, as the leader of its flight"""
+    cached, query_vec = await lookup_similar_answer(qa_system, question, mode)
+    if cached is not None:
+        CACHE_HITS.inc()
+        return cached
+
+    if mode == 'extractive':
+        return await answer_extractively(qa_system, question)
+
+    try:
+        result, video_urls = await asyncio.gather(
+            qa_system.ainvoke(question, config={'callbacks': [StageTimingHandler()]}),
+            asyncio.to_thread(load_video_urls),
+        )
+    except Exception as e:
+        if not EXTRACTIVE_FALLBACK:
+            raise
+        print(f"LLM call failed ({type(e).__name__}: {e}); answering extractively")
+        return await answer_extractively(qa_system, question)
+
+    payload = llm_payload(result, video_urls)
+    remember_answer(question, mode, query_vec, payload)
+    return payload
+
+
+async def home(request: Request):
+    return templates.TemplateResponse(request, "index.html")
+
+
+async def chat(request: Request):
+    """Handle chat requests"""
+    try:
+        try:
+            data = await request.json()
+        except ValueError:
+            data = {}
+        if not isinstance(data, dict):
+            data = {}
+        question = data.get('question', '')
+        if not question:
+            return JSONResponse({'error': 'No question provided'}, status_code=400)
+
+        qa_system = await get_qa_system_async()
+        if not qa_system:
+            return JSONResponse(
+                {'error': 'QA system not initialized. Please check your API keys and Pinecone setup.'},
+                status_code=500,
+            )
+
+        mode = str(data.get('mode') or CHAT_MODE).strip().lower()
+        mode = 'extractive' if mode == 'extractive' else 'llm'
+        cached = cached_answer(question, mode)
+        if cached is not None:
+            CACHE_HITS.inc()
+            with stage('serialize'):
+                return JSONResponse(cached)
+
+        payload, shared = await chat_flights.do(
+            (mode, normalize_question(question)),
+            lambda: answer_question(qa_system, question, mode),
+        )
+        if shared:
+            COALESCED.inc()
+
+        with stage('serialize'):
+            return JSONResponse(payload)
+
+    except Exception as e:
+        ERRORS.inc(('request',))
+        return JSONResponse({'error': f'Error processing question: {str(e)}'}, status_code=500)
+
+
+async def create_clip(request: Request):
+    """Queue a video clip; poll status_url until it is done"""
+    try:
+        data = await request.json()
+    except ValueError:
+        data = {}
+    payload, status = await asyncio.to_thread(submit_clip_job, data if isinstance(data, dict) else {})
+    return JSONResponse(payload, status_code=status)
+
+
+async def clip_status(request: Request):
+    """Status of a clip job, with the clip URL once it is ready"""
+    payload, status = clip_job_status(request.path_params['job_id'])
+    return JSONResponse(payload, status_code=status)
+
+
+async def metrics(request: Request):
+    """Stage latency histograms, token and error counters in Prometheus text format"""
+    return PlainTextResponse(render_metrics(), media_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+async def serve_video_clip(request: Request):
+    """Serve video clip files"""
+    filename = request.path_params['filename']
+    path = os.path.join('static', 'video_clips', filename)
+    # Only finished clips: not the cache index or clips still being written
+    if not filename.endswith('.mp4') or '.part' in filename or not os.path.isfile(path):
+        return JSONResponse({'error': 'Video clip not found'}, status_code=404)
+    return FileResponse(path, media_type='video/mp4')
+
+
+async def health(request: Request):
+    """Health check endpoint"""
+    store = flask_app.transcript_store
+    cache = flask_app.answer_cache
+    return JSONResponse({
+        'status': 'healthy',
+        'qa_system_initialized': flask_app.qa_system is not None,
+        'index_generation': flask_app.index_watcher.generation,
+        'transcript_store_rows': len(store) if store is not None else 0,
+        'answer_cache': cache.stats() if cache is not None else None,
+        'coalescing': chat_flights.stats(),
+        'clip_jobs': flask_app._clip_jobs.stats() if flask_app._clip_jobs is not None else None,
+    })
+
+
+class RequestTimingMiddleware(BaseHTTPMiddleware):
+    """Record the request duration and report its stages in a Server-Timing header"""
+
+    async def dispatch(self, request, call_next):
+        started = time.perf_counter()
+        timings = start_request()
+        response = await call_next(request)
+        elapsed = time.perf_counter() - started
+        route = request.scope.get('route')
+        REQUEST_SECONDS.observe((route.path if route is not None else 'unmatched', str(response.status_code)), elapsed)
+        response.headers['Server-Timing'] = server_timing(timings, elapsed)
+        return response
+
+
+app = Starlette(
+    routes=[
+        Route('/', home),
+        Route('/chat', chat, methods=['POST']),
+        Route('/clips', create_clip, methods=['POST']),
+        Route('/clips/{job_id}', clip_status),
+        Route('/metrics', metrics),
+        Route('/health', health),
+        # Ahead of the static mount, which would also serve the clip index and partial clips
+        Route('/static/video_clips/{filename}', serve_video_clip),
+        Mount('/static', StaticFiles(directory='static', check_dir=False), name='static'),
+    ],
+    middleware=[Middleware(RequestTimingMiddleware)],
+)
@@ -0,0 +1,171 @@
+"""
+In-process stand-ins for OpenAI and Pinecone, for benchmarks that must not
+spend API credits.
+
+* ``FakeEmbeddings`` -- deterministic hashed bag-of-words vectors, so lexically
+  similar questions and chunks still land near each other
+* ``FakeChatModel`` -- answers in the Teaching/Timestamp/Henry's Quote format by
+  quoting the first document of the rendered context
+* ``FakePineconeStore`` -- a ``LocalVectorStore`` that waits like a remote query
+
+Each one sleeps for a delay drawn from a ``LatencyModel`` (log-normal, set by
+its median and p99), so queueing and tail behaviour look like the real
+services'.
+"""
+
+import asyncio
+import hashlib
+import math
+import random
+import re
+import time
+from typing import Any, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from local_vector_store import LocalVectorStore
+
+
+_WORD_RE = re.compile(r"[a-z0-9']+")
+# z-score of the 99th percentile of a normal distribution
+_Z99 = 2.3263
+
+
+class LatencyModel:
+    """Log-normal delay with the given median and 99th percentile (milliseconds)."""
+
+    def __init__(self, median_ms: float, p99_ms: Optional[float] = None):
+        self.median_ms = max(0.0, median_ms)
+        self.p99_ms = max(self.median_ms, p99_ms if p99_ms is not None else median_ms)
+        self._mu = math.log(self.median_ms) if self.median_ms > 0 else 0.0
+        self._sigma = math.log(self.p99_ms / self.median_ms) / _Z99 if self.median_ms > 0 else 0.0
+
+    @classmethod
+    def parse(cls, spec: str) -> "LatencyModel":
+        """``"median"`` or ``"median:p99"`` in milliseconds, e.g. ``"40:150"``."""
+        parts = [float(p) for p in str(spec).split(":")]
+        return cls(parts[0], parts[1] if len(parts) > 1 else None)
+
+    def sample(self) -> float:
+        """One delay in seconds."""
+        if self.median_ms <= 0:
+            return 0.0
+        return random.lognormvariate(self._mu, self._sigma) / 1000.0
+
+    def sleep(self) -> None:
+        delay = self.sample()
+        if delay > 0:
+            time.sleep(delay)
+
+    async def asleep(self) -> None:
+        delay = self.sample()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def to_dict(self) -> dict:
+        return {"median_ms": self.median_ms, "p99_ms": self.p99_ms}
+
+
+NO_LATENCY = LatencyModel(0)
+
+
+class FakeEmbeddings(Embeddings):
+    """Hashed bag-of-words embeddings with a simulated request latency."""
+
+    def __init__(self, dimension: int = 256, latency: LatencyModel = NO_LATENCY):
+        self.dimension = dimension
+        self.latency = latency
+
+    def _vector(self, text: str) -> List[float]:
+        vec = np.zeros(self.dimension, dtype=np.float32)
+        for word in _WORD_RE.findall(text.lower()):
+            h = int.from_bytes(hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest(), "little")
+            vec[h % self.dimension] += 1.0 if (h >> 63) else -1.0
+        norm = float(np.linalg.norm(vec))
+        return (vec / norm if norm else vec).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.latency.sleep()
+        return [self._vector(t) for t in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        self.latency.sleep()
+        return self._vector(text)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        await self.latency.asleep()
+        return [self._vector(t) for t in texts]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        await self.latency.asleep()
+        return self._vector(text)
+
+
+class FakeChatModel(BaseChatModel):
+    """Quotes the first retrieved document, after a simulated generation delay."""
+
+    latency: Any = NO_LATENCY
+    quote_words: int = 60
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-archive-chat"
+
+    def _answer(self, prompt: str) -> str:
+        teaching = re.search(r"^Teaching: (.*)$", prompt, re.MULTILINE)
+        body = re.search(r"^EndSeconds: .*\n(.*?)(?:\nTeaching: |\n\nQuestion:)", prompt, re.MULTILINE | re.DOTALL)
+        text = body.group(1) if body else ""
+        text = " ".join(ln for ln in text.splitlines() if not ln.startswith("Timestamp:"))
+        quote = " ".join(text.split()[: self.quote_words])
+        return f"Teaching: {teaching.group(1) if teaching else 'Unknown'}\nHenry's Quote: \"{quote}\""
+
+    def _result(self, prompt: str) -> ChatResult:
+        answer = self._answer(prompt)
+        usage = {
+            "input_tokens": len(prompt) // 4,
+            "output_tokens": len(answer) // 4,
+            "total_tokens": (len(prompt) + len(answer)) // 4,
+        }
+        message = AIMessage(content=answer, usage_metadata=usage)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        self.latency.sleep()
+        return self._result("\n".join(str(m.content) for m in messages))
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        await self.latency.asleep()
+        return self._result("\n".join(str(m.content) for m in messages))
+
+
+class FakePineconeStore(LocalVectorStore):
+    """Local index that adds a simulated network round trip to every query."""
+
+    def __init__(self, embedding: Embeddings, index_dir: str, latency: LatencyModel = NO_LATENCY):
+        super().__init__(embedding=embedding, index_dir=index_dir)
+        self.latency = latency
+
+    def similarity_search_by_vector_with_score(self, *args, **kwargs):
+        self.latency.sleep()
+        return super().similarity_search_by_vector_with_score(*args, **kwargs)
+
+    def max_marginal_relevance_search_by_vector(self, *args, **kwargs):
+        self.latency.sleep()
+        return super().max_marginal_relevance_search_by_vector(*args, **kwargs)
+
+    # The async searches skip the sleeping by-vector methods and await the delay
+    async def asimilarity_search_with_score(self, query, k=4, filter=None, **kwargs):
+        vec = await self._aembed_query(query)
+        await self.latency.asleep()
+        return LocalVectorStore.similarity_search_by_vector_with_score(self, vec, k, filter)
+
+    async def amax_marginal_relevance_search(self, query, k=4, fetch_k=20, lambda_mult=0.5, filter=None, **kwargs):
+        vec = await self._aembed_query(query)
+        await self.latency.asleep()
+        return LocalVectorStore.max_marginal_relevance_search_by_vector(
+            self, vec, k=k, fetch_k=fetch_k, lambda_mult=lambda_mult, filter=filter
+        )
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+Offline load test for ``/chat``.
+
+Builds a throwaway index of the real transcripts with ``bench_fakes`` stand-ins
+for OpenAI embeddings, the chat model and Pinecone (each with a configurable
+latency distribution), serves the real Flask app on a local threaded server,
+and drives ``/chat`` at fixed concurrency levels. Reports throughput, latency
+percentiles and the per-stage breakdown from each response's ``Server-Timing``
+header, and writes everything to JSON so runs can be compared across changes.
+``--server asgi`` serves the async app (asgi_app.py) under uvicorn instead.
+
+    python bench_load.py --concurrency 1 4 16 --requests 200 --llm-latency 900:3000
+"""
+
+import argparse
+import http.client
+import itertools
+import json
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List
+
+from bench_fakes import FakeChatModel, FakeEmbeddings, FakePineconeStore, LatencyModel
+
+
+QUESTIONS = [
+    "What does Henry say about meditation?",
+    "How do I rest as awareness?",
+    "What is original love?",
+    "What is the difference between a flow state and awakening?",
+    "How should I work with resistance in the body?",
+    "What does Henry mean by the true person of no rank?",
+    "How do I practice with difficult emotions?",
+    "What is the role of the teacher?",
+    "How can I stop identifying with thoughts?",
+    "What happens to the self in awakening?",
+    "How do I bring practice into daily life?",
+    "What does Henry say about koans?",
+]
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(q / 100.0 * len(sorted_values) + 0.4999)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def distribution(values: List[float]) -> Dict[str, float]:
+    ordered = sorted(values)
+    return {
+        "p50": percentile(ordered, 50),
+        "p95": percentile(ordered, 95),
+        "p99": percentile(ordered, 99),
+        "mean": statistics.fmean(ordered) if ordered else 0.0,
+        "max": ordered[-1] if ordered else 0.0,
+    }
+
+
+def parse_server_timing(header: str) -> Dict[str, float]:
+    stages = {}
+    for part in (header or "").split(","):
+        name, _, params = part.strip().partition(";")
+        if params.startswith("dur="):
+            try:
+                stages[name] = float(params[4:])
+            except ValueError:
+                pass
+    return stages
+
+
+def build_index(work_dir: Path, dimension: int) -> int:
+    """Chunk every transcript, embed with FakeEmbeddings and compile the transcript store and lexical index."""
+    from ingest_transcripts import DEFAULT_CHUNKING, build_lexical_index, build_transcript_store, parse_archive
+
+    transcripts_dir = Path(__file__).resolve().parent / "Transcripts"
+    transcripts, chunks = parse_archive(transcripts_dir, DEFAULT_CHUNKING)
+    embeddings = FakeEmbeddings(dimension)
+    store = FakePineconeStore(embeddings, str(work_dir / "index"))
+    ids = [chunk_id for chunk_id, _ in chunks]
+    texts = [doc.page_content for _, doc in chunks]
+    metadatas = [doc.metadata for _, doc in chunks]
+    store.add_embeddings(texts, embeddings.embed_documents(texts), metadatas=metadatas, ids=ids)
+    build_transcript_store(transcripts, work_dir / "transcripts.bin")
+    build_lexical_index(chunks, work_dir / "lexical.bin")
+    return len(ids)
+
+
+def start_asgi_server():
+    """Serve asgi_app under uvicorn on a background thread; returns (server, port)."""
+    import socket
+
+    import uvicorn
+
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    config = uvicorn.Config("asgi_app:app", log_level="error", access_log=False)
+    server = uvicorn.Server(config)
+    threading.Thread(target=server.run, kwargs={"sockets": [sock]}, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, sock.getsockname()[1]
+
+
+def run_level(port: int, concurrency: int, n_requests: int, mode: str) -> dict:
+    counter = itertools.count()
+    lock = threading.Lock()
+    latencies: List[float] = []
+    stages: Dict[str, List[float]] = {}
+    errors: Dict[str, int] = {}
+
+    def worker():
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=120)
+        while True:
+            i = next(counter)
+            if i >= n_requests:
+                break
+            body = {"question": QUESTIONS[i % len(QUESTIONS)]}
+            if mode:
+                body["mode"] = mode
+            started = time.perf_counter()
+            try:
+                conn.request("POST", "/chat", body=json.dumps(body), headers={"Content-Type": "application/json"})
+                resp = conn.getresponse()
+                resp.read()
+                status = resp.status
+                timing = parse_server_timing(resp.getheader("Server-Timing"))
+            except Exception as e:  # noqa: BLE001
+                conn.close()
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=120)
+                status, timing = type(e).__name__, {}
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            with lock:
+                if status == 200:
+                    latencies.append(elapsed_ms)
+                    for name, ms in timing.items():
+                        stages.setdefault(name, []).append(ms)
+                else:
+                    errors[str(status)] = errors.get(str(status), 0) + 1
+        conn.close()
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    return {
+        "concurrency": concurrency,
+        "requests": n_requests,
+        "ok": len(latencies),
+        "errors": errors,
+        "seconds": elapsed,
+        "throughput_rps": len(latencies) / elapsed if elapsed else 0.0,
+        "latency_ms": distribution(latencies),
+        "stages_ms": {name: distribution(values) for name, values in sorted(stages.items())},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test /chat against local OpenAI/Pinecone stand-ins")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16], help="Concurrency levels to run")
+    parser.add_argument("--requests", type=int, default=100, help="Requests per concurrency level")
+    parser.add_argument("--mode", choices=["llm", "extractive"], default="llm")
+    parser.add_argument("--server", choices=["flask", "asgi"], default="flask", help="Serve app.py or asgi_app.py")
+    parser.add_argument("--embed-latency", default="40:150", help="Embedding latency, median[:p99] ms")
+    parser.add_argument("--retrieve-latency", default="30:120", help="Pinecone query latency, median[:p99] ms")
+    parser.add_argument("--llm-latency", default="900:3000", help="Chat completion latency, median[:p99] ms")
+    parser.add_argument("--dimension", type=int, default=256, help="Fake embedding dimension")
+    parser.add_argument("--answer-cache", action="store_true", help="Leave the answer cache on (off by default)")
+    parser.add_argument("--output", default="load_results.json", help="Where to write the JSON results")
+    args = parser.parse_args()
+
+    embed_latency = LatencyModel.parse(args.embed_latency)
+    retrieve_latency = LatencyModel.parse(args.retrieve_latency)
+    llm_latency = LatencyModel.parse(args.llm_latency)
+
+    with tempfile.TemporaryDirectory(prefix="archive-load-") as tmp:
+        work_dir = Path(tmp)
+        t0 = time.perf_counter()
+        n_chunks = build_index(work_dir, args.dimension)
+        print(f"Indexed {n_chunks} chunks with fake embeddings in {time.perf_counter() - t0:.1f}s")
+
+        # The app reads these at import time
+        os.environ["TRANSCRIPT_STORE_PATH"] = str(work_dir / "transcripts.bin")
+        if not args.answer_cache:
+            os.environ["ANSWER_CACHE"] = "off"
+        import app as app_module
+        from embedding_cache import QueryVectorReuse
+        from metrics import TimedEmbeddings
+        from werkzeug.serving import make_server
+
+        embeddings = QueryVectorReuse(TimedEmbeddings(FakeEmbeddings(args.dimension, latency=embed_latency)))
+        vectorstore = FakePineconeStore(embeddings, str(work_dir / "index"), latency=retrieve_latency)
+        lexical_index = None
+        if app_module.RETRIEVAL_MODE == "hybrid":
+            from lexical_index import LexicalIndex
+            lexical_index = LexicalIndex(str(work_dir / "lexical.bin"))
+        app_module.qa_system = app_module.build_qa_chain(FakeChatModel(latency=llm_latency), vectorstore, lexical_index)
+        app_module.get_quote_aligner()
+
+        if args.server == "asgi":
+            server, port = start_asgi_server()
+        else:
+            logging.getLogger("werkzeug").setLevel(logging.ERROR)
+            server = make_server("127.0.0.1", 0, app_module.app, threaded=True)
+            port = server.server_port
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+
+        # The app prints per-request debug lines; keep the report readable
+        real_stdout = sys.stdout
+        results = []
+        try:
+            for concurrency in args.concurrency:
+                sys.stdout = open(os.devnull, "w")
+                try:
+                    run_level(port, 1, 2, args.mode)  # warm connections and lazy state
+                    result = run_level(port, concurrency, args.requests, args.mode)
+                finally:
+                    sys.stdout.close()
+                    sys.stdout = real_stdout
+                results.append(result)
+                lat = result["latency_ms"]
+                print(
+                    f"c={concurrency:<4} {result['throughput_rps']:7.2f} req/s  "
+                    f"p50 {lat['p50']:7.1f}ms  p95 {lat['p95']:7.1f}ms  p99 {lat['p99']:7.1f}ms  "
+                    f"errors {sum(result['errors'].values())}"
+                )
+                for name, dist in result["stages_ms"].items():
+                    print(f"         {name:<10} p50 {dist['p50']:7.1f}ms  p95 {dist['p95']:7.1f}ms  p99 {dist['p99']:7.1f}ms")
+        finally:
+            if args.server == "asgi":
+                server.should_exit = True
+            else:
+                server.shutdown()
+
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": {
+            "mode": args.mode,
+            "server": args.server,
+            "requests_per_level": args.requests,
+            "chunks": n_chunks,
+            "answer_cache": args.answer_cache,
+            "embed_latency": embed_latency.to_dict(),
+            "retrieve_latency": retrieve_latency.to_dict(),
+            "llm_latency": llm_latency.to_dict(),
+        },
+        "results": results,
+    }
+    Path(args.output).write_text(json.dumps(report, indent=2))
+    print(f"Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Retrieval hit rate on a benchmark question set, dense vs. hybrid.
+
+Each question in ``bench_questions.json`` lists the passages that answer it as
+a teaching plus, optionally, the second where the passage starts. A question
+is a hit when any of the ``k`` retrieved chunks comes from a target teaching
+and, when a second is given, its time range lies within ``--tolerance``
+seconds of it. Both retrievers run through ``app.build_qa_chain``, so they are
+configured exactly as in production.
+
+By default the index is built from the real transcripts with
+``bench_fakes.FakeEmbeddings`` (no API credits). ``--index-dir`` evaluates an
+existing local index from ``ingest_transcripts.py --backend local`` with
+OpenAI embeddings instead.
+
+    python bench_retrieval.py
+    python bench_retrieval.py --index-dir index_data --lexical-index index_data/lexical.bin
+"""
+
+import argparse
+import json
+import tempfile
+import time
+from pathlib import Path
+from typing import List, Optional
+
+from bench_fakes import FakeChatModel, FakeEmbeddings, FakePineconeStore
+from bench_load import build_index, distribution
+
+
+def is_hit(docs, targets: List[dict], tolerance: float) -> bool:
+    for doc in docs:
+        md = doc.metadata or {}
+        for target in targets:
+            if (md.get("teaching_name") or "").strip() != target["teaching"]:
+                continue
+            second = target.get("seconds")
+            if second is None:
+                return True
+            start, end = md.get("start_seconds"), md.get("end_seconds")
+            if start is None:
+                continue
+            end = start if end is None else end
+            if start - tolerance <= second <= end + tolerance:
+                return True
+    return False
+
+
+def evaluate(retriever, questions: List[dict], tolerance: float) -> dict:
+    hits = 0
+    latencies = []
+    misses = []
+    for q in questions:
+        started = time.perf_counter()
+        docs = retriever.invoke(q["question"])
+        latencies.append((time.perf_counter() - started) * 1000)
+        if is_hit(docs, q["targets"], tolerance):
+            hits += 1
+        else:
+            misses.append(q["question"])
+    return {
+        "hits": hits,
+        "questions": len(questions),
+        "hit_rate": hits / len(questions) if questions else 0.0,
+        "latency_ms": distribution(latencies),
+        "misses": misses,
+    }
+
+
+def lexical_latency(lexical, questions: List[dict], repeats: int = 50) -> dict:
+    """Per-query BM25 search time over the whole archive."""
+    samples = []
+    for _ in range(repeats):
+        for q in questions:
+            started = time.perf_counter()
+            lexical.search(q["question"], 10)
+            samples.append((time.perf_counter() - started) * 1000)
+    return distribution(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare dense and hybrid retrieval hit rate")
+    parser.add_argument("--questions", default="bench_questions.json", help="Benchmark question set")
+    parser.add_argument("--tolerance", type=float, default=90.0, help="Seconds a hit may be from the target")
+    parser.add_argument("--index-dir", help="Existing local vector index (uses OpenAI embeddings)")
+    parser.add_argument("--lexical-index", help="Lexical index for --index-dir (default: <index-dir>/lexical.bin)")
+    parser.add_argument("--dimension", type=int, default=256, help="Fake embedding dimension")
+    parser.add_argument("--output", help="Also write the results as JSON")
+    args = parser.parse_args()
+
+    import app as app_module
+    from lexical_index import LexicalIndex
+
+    questions = json.loads(Path(args.questions).read_text(encoding="utf-8"))
+    llm = FakeChatModel()
+
+    with tempfile.TemporaryDirectory(prefix="archive-retrieval-") as tmp:
+        work_dir = Path(tmp)
+        lexical_path: Optional[Path]
+        if args.index_dir:
+            from langchain_openai import OpenAIEmbeddings
+            from embedding_cache import cached_embeddings_from_env
+            from local_vector_store import LocalVectorStore
+
+            embeddings = cached_embeddings_from_env(OpenAIEmbeddings(model="text-embedding-3-small"))
+            vectorstore = LocalVectorStore(embedding=embeddings, index_dir=args.index_dir)
+            lexical_path = Path(args.lexical_index or Path(args.index_dir) / "lexical.bin")
+        else:
+            n_chunks = build_index(work_dir, args.dimension)
+            print(f"Indexed {n_chunks} chunks with fake embeddings")
+            vectorstore = FakePineconeStore(FakeEmbeddings(args.dimension), str(work_dir / "index"))
+            lexical_path = work_dir / "lexical.bin"
+
+        lexical = LexicalIndex(str(lexical_path))
+        results = {
+            "dense": evaluate(app_module.build_qa_chain(llm, vectorstore).retriever, questions, args.tolerance),
+            "hybrid": evaluate(app_module.build_qa_chain(llm, vectorstore, lexical).retriever, questions, args.tolerance),
+        }
+        results["lexical_search_ms"] = lexical_latency(lexical, questions)
+
+    for name in ("dense", "hybrid"):
+        r = results[name]
+        print(
+            f"{name:<7} hit@3 {r['hits']}/{r['questions']} ({r['hit_rate']:.0%})  "
+            f"retrieval p50 {r['latency_ms']['p50']:.2f}ms  p99 {r['latency_ms']['p99']:.2f}ms"
+        )
+        for question in r["misses"]:
+            print(f"        miss: {question}")
+    lex = results["lexical_search_ms"]
+    print(f"BM25 search over the archive: p50 {lex['p50']:.3f}ms  p99 {lex['p99']:.3f}ms")
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+        print(f"Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
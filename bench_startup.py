@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Cold-start benchmark for the web app.
+
+Each run starts a fresh Python process (as a serverless cold start would) and
+measures how long ``import app`` takes, then the time to the first response
+from ``/health`` and, optionally, from ``/warmup`` and ``/chat`` through
+Flask's test client. Prints the median/min/max over all runs and can write the
+raw samples to JSON.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+
+CHILD = r"""
+import json, sys, time
+started = time.perf_counter()
+import app
+timings = {"import_app": time.perf_counter() - started}
+client = app.app.test_client()
+opts = json.loads(sys.argv[1])
+
+def timed(name, fn):
+    t = time.perf_counter()
+    resp = fn()
+    timings[name] = time.perf_counter() - t
+    timings[name + "_status"] = resp.status_code
+
+timed("first_health", lambda: client.get("/health"))
+if opts["warmup"]:
+    timed("first_warmup", lambda: client.post("/warmup"))
+if opts["question"]:
+    body = {"question": opts["question"]}
+    if opts["mode"]:
+        body["mode"] = opts["mode"]
+    timed("first_chat", lambda: client.post("/chat", json=body))
+timings["total"] = time.perf_counter() - started
+print("BENCH " + json.dumps(timings))
+"""
+
+
+def run_once(opts: dict) -> dict:
+    proc = subprocess.run(
+        [sys.executable, "-c", CHILD, json.dumps(opts)],
+        cwd=Path(__file__).resolve().parent,
+        capture_output=True,
+        text=True,
+        env=dict(os.environ),
+    )
+    for line in proc.stdout.splitlines():
+        if line.startswith("BENCH "):
+            return json.loads(line[len("BENCH "):])
+    raise RuntimeError(f"Benchmark process failed:\n{proc.stderr[-2000:]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure app import time and time-to-first-response")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh processes to measure")
+    parser.add_argument("--warmup", action="store_true", help="Also time the first POST /warmup")
+    parser.add_argument("--question", default=None, help="Also time the first POST /chat with this question")
+    parser.add_argument("--mode", choices=["llm", "extractive"], default=None, help="Answer mode for --question")
+    parser.add_argument("--json", default=None, help="Write raw samples and summary to this file")
+    args = parser.parse_args()
+
+    opts = {"warmup": args.warmup, "question": args.question, "mode": args.mode}
+    samples = []
+    for i in range(args.runs):
+        sample = run_once(opts)
+        samples.append(sample)
+        print(f"run {i + 1}/{args.runs}: " + ", ".join(
+            f"{k}={v:.3f}s" for k, v in sample.items() if not k.endswith("_status")
+        ))
+
+    summary = {}
+    for key in samples[0]:
+        if key.endswith("_status"):
+            summary[key] = sorted({s[key] for s in samples})
+            continue
+        values = [s[key] for s in samples]
+        summary[key] = {
+            "median": statistics.median(values),
+            "min": min(values),
+            "max": max(values),
+        }
+
+    print("\nSummary (seconds):")
+    for key, stats in summary.items():
+        if key.endswith("_status"):
+            print(f"  {key:<20} {stats}")
+        else:
+            print(f"  {key:<20} median {stats['median']:.3f}  min {stats['min']:.3f}  max {stats['max']:.3f}")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps({"runs": samples, "summary": summary}, indent=2))
+        print(f"Wrote {args.json}")
+
+
+if __name__ == "__main__":
+    main()
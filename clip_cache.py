@@ -0,0 +1,275 @@
+"""
+Content-addressed cache of generated video clips.
+
+A clip is identified by the source video (its resolved path, size and mtime,
+so a replaced file never serves stale clips), the start and end second, and
+the encoding profile. The key's sha256 names the file under the clips
+directory, so two teachings cut at the same timestamp can no longer collide,
+and a repeat request is served straight from disk.
+
+The cache is bounded by bytes rather than by a clip count: an index file
+(``clip_index.json`` in the clips directory) records each clip's size and
+last access, and when a new clip pushes the total over the budget the least
+recently used clips are deleted. Hit and miss counts are kept for /health.
+
+Several worker processes share one clips directory. Every index write takes
+an ``flock`` on ``clip_index.lock``, then re-reads and merges the index on
+disk before changing it. So clips added by other workers stay in the index,
+and the byte budget holds across all of them.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Union
+
+try:
+    import fcntl
+except ImportError:  # Windows: the index is then only safe within one process
+    fcntl = None
+
+
+DEFAULT_MAX_BYTES = 2 * 1024 * 1024 * 1024
+INDEX_FILE = "clip_index.json"
+LOCK_FILE = "clip_index.lock"
+CLIP_SUFFIX = ".mp4"
+
+# When the budget is exceeded, evict down to this fraction of it so that
+# eviction runs once per burst of new clips rather than on every clip
+_EVICT_TARGET = 0.9
+
+# Persist last-access updates from hits at most this often
+_FLUSH_SECONDS = 5.0
+
+
+def source_identity(video_path: str) -> str:
+    """Resolved path, size and mtime: changes whenever the source file does."""
+    st = os.stat(video_path)
+    return f"{os.path.realpath(video_path)}:{st.st_size}:{st.st_mtime_ns}"
+
+
+def clip_key(video_path: str, start: float, end: float, profile: str) -> str:
+    payload = json.dumps([source_identity(video_path), round(float(start), 3), round(float(end), 3), profile])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ClipCache:
+    """Byte-budgeted LRU of clip files, tracked in an index file next to them."""
+
+    def __init__(self, clips_dir: str, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.clips_dir = Path(clips_dir)
+        self.max_bytes = int(max_bytes)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        # Per-key locks for cutting a clip, with the number of threads holding or waiting on each
+        self._key_locks: Dict[str, List] = {}
+        self._entries: Dict[str, dict] = {}
+        self._flushed_at = 0.0
+        self._dirty = False
+        self.clips_dir.mkdir(parents=True, exist_ok=True)
+        self._load()
+
+    @property
+    def index_path(self) -> Path:
+        return self.clips_dir / INDEX_FILE
+
+    @contextmanager
+    def _index_lock(self) -> Iterator[None]:
+        """Exclusive lock on the index file across processes; taken after ``self._lock``."""
+        if fcntl is None:
+            yield
+            return
+        with open(self.clips_dir / LOCK_FILE, "a+") as f:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    def _read_index(self) -> Dict[str, dict]:
+        try:
+            if self.index_path.exists():
+                return json.loads(self.index_path.read_text(encoding="utf-8")).get("clips", {})
+        except Exception as e:  # noqa: BLE001
+            print(f"Ignoring unreadable clip index {self.index_path}: {e}")
+        return {}
+
+    def _merge_locked(self) -> None:
+        """Replace the in-memory entries with the index on disk, keeping this process's newer accesses.
+
+        Entries only this process knows were evicted or dropped by another
+        process. Caller holds both locks.
+        """
+        merged = self._read_index()
+        for key, entry in merged.items():
+            mine = self._entries.get(key)
+            if mine is not None and mine.get("last_access", 0) > entry.get("last_access", 0):
+                merged[key] = {**entry, "last_access": mine["last_access"]}
+        self._entries = merged
+
+    def _sync_locked(self) -> None:
+        with self._index_lock():
+            self._merge_locked()
+            self._save()
+
+    def _load(self) -> None:
+        with self._lock, self._index_lock():
+            self._entries = self._read_index()
+            self._adopt_locked()
+            self._save()
+
+    def _adopt_locked(self) -> None:
+        # Drop entries whose file is gone, and adopt clips the index does not
+        # know about (e.g. from before the cache existed) so they count
+        # towards the budget and are evicted like any other clip
+        known = set()
+        for key, entry in list(self._entries.items()):
+            if not (self.clips_dir / entry["filename"]).exists():
+                del self._entries[key]
+            else:
+                known.add(entry["filename"])
+        for path in self.clips_dir.glob("*" + CLIP_SUFFIX):
+            if path.name in known or ".part" in path.name:
+                continue
+            st = path.stat()
+            self._entries[path.name] = {
+                "filename": path.name,
+                "bytes": st.st_size,
+                "created": st.st_mtime,
+                "last_access": st.st_mtime,
+            }
+
+    def _save(self) -> None:
+        # Caller holds both locks and has merged the index on disk first
+        tmp = self.index_path.with_suffix(".json.tmp")
+        tmp.write_text(json.dumps({"clips": self._entries}, sort_keys=True), encoding="utf-8")
+        os.replace(tmp, self.index_path)
+        self._flushed_at = time.monotonic()
+        self._dirty = False
+
+    def path_for(self, key: str) -> Path:
+        return self.clips_dir / f"{key[:24]}{CLIP_SUFFIX}"
+
+    def temp_path_for(self, key: str) -> Path:
+        """Where to write a clip before ``put``; the extension is kept for ffmpeg's muxer choice."""
+        return self.clips_dir / f"{key[:24]}.part-{os.getpid()}-{threading.get_ident()}{CLIP_SUFFIX}"
+
+    @contextmanager
+    def locked(self, key: str) -> Iterator[None]:
+        """Hold the lock for one clip key; other keys are not blocked."""
+        with self._lock:
+            entry = self._key_locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._key_locks[key]
+
+    def _entry_locked(self, key: str) -> Optional[dict]:
+        entry = self._entries.get(key)
+        if entry is None and self.path_for(key).exists():
+            # Another worker process cut this clip since the last merge
+            with self._index_lock():
+                self._merge_locked()
+            entry = self._entries.get(key)
+        return entry
+
+    def peek(self, key: str) -> Optional[Path]:
+        """The cached clip's path without counting a lookup."""
+        with self._lock:
+            entry = self._entry_locked(key)
+            path = self.clips_dir / entry["filename"] if entry else None
+            return path if path is not None and path.exists() else None
+
+    def get(self, key: str) -> Optional[Path]:
+        """The cached clip's path, or None on a miss."""
+        with self._lock:
+            entry = self._entry_locked(key)
+            path = self.clips_dir / entry["filename"] if entry else None
+            if path is None or not path.exists():
+                if entry is not None:
+                    del self._entries[key]
+                    self._dirty = True
+                self.misses += 1
+                return None
+            self.hits += 1
+            entry["last_access"] = time.time()
+            self._dirty = True
+            if time.monotonic() - self._flushed_at >= _FLUSH_SECONDS:
+                self._sync_locked()
+            return path
+
+    def put(self, key: str, tmp_path: Union[str, Path], info: Optional[dict] = None) -> Path:
+        """Move a finished clip into the cache under ``key`` and evict to the budget."""
+        path = self.path_for(key)
+        size = os.path.getsize(tmp_path)
+        now = time.time()
+        with self._lock, self._index_lock():
+            # Published under the index lock, so no other process evicts it unindexed
+            os.replace(tmp_path, path)
+            self._merge_locked()
+            self._entries[key] = {
+                **(info or {}),
+                "filename": path.name,
+                "bytes": size,
+                "created": now,
+                "last_access": now,
+            }
+            self._evict_locked(keep=key)
+            self._save()
+        return path
+
+    def _evict_locked(self, keep: Optional[str] = None) -> None:
+        total = sum(e["bytes"] for e in self._entries.values())
+        if total <= self.max_bytes:
+            return
+        target = self.max_bytes * _EVICT_TARGET
+        for key, entry in sorted(self._entries.items(), key=lambda kv: kv[1]["last_access"]):
+            if total <= target:
+                break
+            if key == keep:
+                continue
+            try:
+                (self.clips_dir / entry["filename"]).unlink(missing_ok=True)
+            except OSError as e:
+                print(f"Could not evict clip {entry['filename']}: {e}")
+                continue
+            total -= entry["bytes"]
+            del self._entries[key]
+            self.evictions += 1
+            print(f"Evicted clip {entry['filename']} ({entry['bytes'] / 1e6:.1f} MB)")
+
+    def evict(self) -> None:
+        """Enforce the byte budget now."""
+        with self._lock, self._index_lock():
+            self._merge_locked()
+            self._evict_locked()
+            self._save()
+
+    def flush(self) -> None:
+        with self._lock:
+            if self._dirty:
+                self._sync_locked()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "clips": len(self._entries),
+                "bytes": sum(e["bytes"] for e in self._entries.values()),
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+            }
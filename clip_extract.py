@@ -0,0 +1,160 @@
+"""
+Fast clip extraction with ffmpeg stream copy.
+
+Re-encoding a two-minute clip costs seconds of CPU. Copying the compressed
+packets instead (``-c copy``) is I/O-bound, but a copied stream can only
+start on a keyframe, so cuts are planned against the source's keyframe
+positions (from ``video_index.py``):
+
+- ``copy`` starts the clip at the last keyframe at or before the requested
+  second (at most one GOP early, so nothing asked for is cut off) and copies
+  everything.
+- ``exact`` re-encodes only the short head from the requested second to the
+  next keyframe, stream-copies the rest, and joins the two with the concat
+  demuxer. A stream copy of the joined parts is only valid when both carry
+  the same stream parameters, so the head is encoded with the source's
+  probed H.264 profile, level, pixel format, frame size and track timescale,
+  and its audio with the source's AAC sample rate and channel count. Sources
+  whose parameters libx264/AAC cannot reproduce have the whole clip
+  re-encoded instead.
+
+Both fall back to a full re-encode in ``VideoProcessor`` when ffmpeg fails.
+"""
+
+import bisect
+import os
+import shutil
+import subprocess
+import tempfile
+from typing import List, Optional
+
+
+EXTRACTION_MODES = ("copy", "exact", "reencode")
+_FFMPEG = ["ffmpeg", "-hide_banner", "-loglevel", "error", "-y"]
+
+# ffprobe's H.264 profile names -> libx264 -profile:v
+_X264_PROFILES = {
+    "constrained baseline": "baseline",
+    "baseline": "baseline",
+    "main": "main",
+    "high": "high",
+    "high 10": "high10",
+    "high 4:2:2": "high422",
+    "high 4:4:4 predictive": "high444",
+}
+
+
+def ffmpeg_available() -> bool:
+    return shutil.which("ffmpeg") is not None and shutil.which("ffprobe") is not None
+
+
+def keyframe_at_or_before(keyframes: List[float], t: float) -> float:
+    i = bisect.bisect_right(keyframes, t + 1e-3)
+    return keyframes[i - 1] if i else 0.0
+
+
+def keyframe_after(keyframes: List[float], t: float) -> Optional[float]:
+    i = bisect.bisect_right(keyframes, t + 1e-3)
+    return keyframes[i] if i < len(keyframes) else None
+
+
+def matching_encode_args(info) -> Optional[List[str]]:
+    """Encoder options reproducing the source's stream parameters, or None if they cannot be matched.
+
+    ``info`` is the source's ``video_index.VideoInfo``.
+    """
+    profile = _X264_PROFILES.get(info.profile.lower())
+    if info.codec != "h264" or profile is None or not info.pix_fmt or not (info.width and info.height):
+        return None
+    if info.audio_codec not in ("", "aac"):
+        return None
+    args = [
+        "-c:v", "libx264", "-preset", "veryfast", "-crf", "18",
+        "-profile:v", profile, "-pix_fmt", info.pix_fmt, "-s", f"{info.width}x{info.height}",
+    ]
+    if info.level > 0:
+        args += ["-level", f"{info.level / 10:.1f}"]
+    if info.timescale:
+        args += ["-video_track_timescale", str(info.timescale)]
+    if info.audio_codec:
+        args += ["-c:a", "aac", "-b:a", "128k"]
+        if info.sample_rate:
+            args += ["-ar", str(info.sample_rate)]
+        if info.channels:
+            args += ["-ac", str(info.channels)]
+    return args
+
+
+def _copy_segment(video_path: str, start: float, end: float, out_path: str, timescale: int = 0) -> None:
+    # -ss before -i seeks to the keyframe; timestamps are rebased to start at zero
+    subprocess.run(
+        _FFMPEG + [
+            "-ss", f"{start:.3f}", "-i", video_path, "-t", f"{max(0.0, end - start):.3f}",
+            "-map", "0:v:0", "-map", "0:a:0?", "-c", "copy",
+            *(["-video_track_timescale", str(timescale)] if timescale else []),
+            "-avoid_negative_ts", "make_zero", "-movflags", "+faststart", out_path,
+        ],
+        check=True,
+    )
+
+
+def _reencode(video_path: str, start: float, end: float, out_path: str) -> None:
+    subprocess.run(
+        _FFMPEG + [
+            "-ss", f"{start:.3f}", "-i", video_path, "-t", f"{end - start:.3f}",
+            "-c:v", "libx264", "-preset", "veryfast", "-crf", "23",
+            "-c:a", "aac", "-b:a", "128k", "-movflags", "+faststart", out_path,
+        ],
+        check=True,
+    )
+
+
+def extract_copy(video_path: str, start: float, end: float, out_path: str, keyframes: List[float]) -> float:
+    """Stream-copy [keyframe <= start, end) into ``out_path``; returns the actual start."""
+    cut = keyframe_at_or_before(keyframes, start)
+    _copy_segment(video_path, cut, end, out_path)
+    return cut
+
+
+def extract_exact(video_path: str, start: float, end: float, out_path: str, info) -> float:
+    """Re-encode [start, next keyframe), stream-copy the rest, and concatenate; returns ``start``.
+
+    ``info`` is the source's ``video_index.VideoInfo`` (keyframes and stream parameters).
+    """
+    keyframes = info.keyframes
+    if keyframe_at_or_before(keyframes, start) >= start - 1e-3:
+        _copy_segment(video_path, start, end, out_path)
+        return start
+    boundary = keyframe_after(keyframes, start)
+    encode_args = matching_encode_args(info)
+    if boundary is None or boundary >= end or encode_args is None:
+        # The whole clip lies inside one GOP (it is short), or a re-encoded
+        # head could not match the copied tail: re-encode it all
+        _reencode(video_path, start, end, out_path)
+        return start
+
+    with tempfile.TemporaryDirectory(prefix="clip-", dir=os.path.dirname(out_path) or ".") as tmp:
+        head = os.path.join(tmp, "head.mp4")
+        tail = os.path.join(tmp, "tail.mp4")
+        # The head is a fraction of a GOP, so cheap to encode; it carries the
+        # source's stream parameters so the concat demuxer can copy both parts
+        subprocess.run(
+            _FFMPEG + [
+                "-ss", f"{start:.3f}", "-i", video_path, "-t", f"{boundary - start:.3f}",
+                "-map", "0:v:0", "-map", "0:a:0?", *encode_args, head,
+            ],
+            check=True,
+        )
+        _copy_segment(video_path, boundary, end, tail, timescale=info.timescale)
+        list_path = os.path.join(tmp, "parts.txt")
+        with open(list_path, "w", encoding="utf-8") as f:
+            # Paths in the list are relative to the list file
+            f.write("file 'head.mp4'\nfile 'tail.mp4'\n")
+        subprocess.run(
+            _FFMPEG + [
+                "-f", "concat", "-safe", "0", "-i", list_path,
+                "-c", "copy", "-movflags", "+faststart", out_path,
+            ],
+            check=True,
+        )
+    return start
@@ -0,0 +1,175 @@
+"""
+Background clip generation.
+
+Cutting a clip takes from milliseconds (stream copy) to many seconds (full
+re-encode), so requests never wait for it. ``ClipJobs.submit`` checks the
+clip cache and, on a miss, queues the cut on a bounded process pool (one
+worker per core by default, ``CLIP_WORKERS``) and returns a job at once. The
+client polls ``GET /clips/<job_id>`` until the job is ``done`` and carries
+the clip URL.
+
+A job's id is derived from its clip cache key, so submitting a clip that is
+already queued or running returns the existing job instead of cutting it
+twice. Workers only render into a temporary file; the parent process
+publishes finished clips into the cache, so the cache index has a single
+writer per process.
+"""
+
+import multiprocessing
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+
+from video_processor import render_clip
+
+
+DEFAULT_MAX_JOBS = 1000
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+def job_id_for(clip_key: str) -> str:
+    return clip_key[:20]
+
+
+class ClipJob:
+    """One clip request and its outcome."""
+
+    def __init__(self, job_id: str, clip: dict):
+        self.id = job_id
+        self.clip = clip
+        self.status = QUEUED
+        self.url: Optional[str] = None
+        self.error: Optional[str] = None
+        self.created = time.time()
+        self.finished: Optional[float] = None
+        self.future: Optional[Future] = None
+
+    def to_dict(self) -> dict:
+        status = self.status
+        if status == QUEUED and self.future is not None and self.future.running():
+            status = RUNNING
+        return {
+            "job_id": self.id,
+            "status": status,
+            "url": self.url,
+            "error": self.error,
+            "start": self.clip["start"],
+            "duration": self.clip["duration"],
+            "source": os.path.basename(self.clip["video_path"]),
+            "seconds": round((self.finished or time.time()) - self.created, 3),
+        }
+
+
+class ClipJobs:
+    """Deduplicating clip job queue over a bounded process pool."""
+
+    def __init__(self, processor, max_workers: Optional[int] = None, max_jobs: int = DEFAULT_MAX_JOBS):
+        self.processor = processor
+        self.max_workers = max_workers or int(os.getenv("CLIP_WORKERS", "0")) or os.cpu_count() or 1
+        self.max_jobs = max_jobs
+        self._pool = self._new_pool()
+        self._jobs: "OrderedDict[str, ClipJob]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.deduplicated = 0
+        self.cache_hits = 0
+
+    def _new_pool(self) -> ProcessPoolExecutor:
+        # Spawned workers: forking a threaded web server process is unsafe
+        return ProcessPoolExecutor(max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn"))
+
+    def stats(self) -> dict:
+        with self._lock:
+            active = sum(1 for job in self._jobs.values() if job.status == QUEUED)
+            return {
+                "workers": self.max_workers,
+                "active": active,
+                "submitted": self.submitted,
+                "deduplicated": self.deduplicated,
+                "cache_hits": self.cache_hits,
+            }
+
+    def get(self, job_id: str) -> Optional[ClipJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def submit(self, video_path: str, timestamp_str: str, duration_minutes: float = 2) -> Optional[ClipJob]:
+        """Queue a clip of ``video_path`` (or join the job already making it); None if no clip can be made."""
+        clip = self.processor.prepare_clip(video_path, timestamp_str, duration_minutes)
+        if clip is None:
+            return None
+        job_id = job_id_for(clip["key"])
+
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None and job.status == QUEUED:
+                self.deduplicated += 1
+                return job
+
+        cached = self.processor.clip_cache.get(clip["key"])
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None and job.status == QUEUED:
+                self.deduplicated += 1
+                return job
+            job = ClipJob(job_id, clip)
+            self._remember(job)
+            if cached is not None:
+                self.cache_hits += 1
+                self._finish(job, url=self.processor.clip_url(cached))
+                return job
+            self.submitted += 1
+            tmp_path = str(self.processor.clip_cache.temp_path_for(clip["key"]))
+            args = (render_clip, clip["video_path"], clip["start"], clip["duration"], tmp_path)
+            try:
+                job.future = self._pool.submit(*args)
+            except BrokenProcessPool:
+                # A worker died (e.g. killed for memory); start a fresh pool
+                print("Clip worker pool broken; restarting it")
+                self._pool = self._new_pool()
+                job.future = self._pool.submit(*args)
+        job.future.add_done_callback(lambda future: self._complete(job, tmp_path, future))
+        return job
+
+    def _remember(self, job: ClipJob) -> None:
+        self._jobs[job.id] = job
+        self._jobs.move_to_end(job.id)
+        # Forget the oldest finished jobs; queued ones are always kept
+        while len(self._jobs) > self.max_jobs:
+            oldest = next((j for j in self._jobs.values() if j.status != QUEUED), None)
+            if oldest is None:
+                break
+            del self._jobs[oldest.id]
+
+    def _finish(self, job: ClipJob, url: Optional[str] = None, error: Optional[str] = None) -> None:
+        job.url = url
+        job.error = error
+        job.status = DONE if url else FAILED
+        job.finished = time.time()
+
+    def _complete(self, job: ClipJob, tmp_path: str, future: Future) -> None:
+        """Runs when a worker finishes: publish the clip into the cache."""
+        try:
+            rendered = future.result()
+            if rendered is None:
+                url, error = None, "Timestamp exceeds video duration"
+            else:
+                url, error = self.processor.store_clip(job.clip, tmp_path, rendered), None
+        except Exception as e:  # noqa: BLE001
+            url, error = None, f"{type(e).__name__}: {e}"
+            print(f"Clip job {job.id} failed: {error}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        with self._lock:
+            self._finish(job, url=url, error=error)
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
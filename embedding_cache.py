@@ -0,0 +1,268 @@
+"""
+Persistent on-disk embedding cache.
+
+Vectors are stored in SQLite keyed by (model, dimensions, sha256(text)) so that
+re-chunking sweeps, re-ingests and repeated queries never send the same text to
+the embeddings API twice. The cache tracks hit/miss counts and keeps itself
+under a byte budget by evicting the least recently used entries.
+"""
+
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from langchain_core.embeddings import Embeddings
+
+
+DEFAULT_CACHE_PATH = "index_data/embedding_cache.sqlite"
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+# When the budget is exceeded, evict down to this fraction of it so that
+# eviction runs once per burst of inserts rather than on every insert
+_EVICT_TARGET = 0.9
+
+
+def text_sha256(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """SQLite-backed LRU cache of embedding vectors."""
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.path = Path(path)
+        self.max_bytes = int(max_bytes)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                dimensions INTEGER NOT NULL,
+                text_hash TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                nbytes INTEGER NOT NULL,
+                last_access REAL NOT NULL,
+                PRIMARY KEY (model, dimensions, text_hash)
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_lru ON embeddings (last_access)")
+        self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(nbytes), 0) FROM embeddings").fetchone()[0]
+
+    @property
+    def total_bytes(self) -> int:
+        return self._total_bytes
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / lookups) if lookups else 0.0,
+            "bytes": self._total_bytes,
+            "max_bytes": self.max_bytes,
+        }
+
+    def get_many(self, model: str, dimensions: int, hashes: List[str]) -> Dict[str, List[float]]:
+        """Return cached vectors for the given text hashes and refresh their recency."""
+        unique = list(dict.fromkeys(hashes))
+        found: Dict[str, List[float]] = {}
+        with self._lock:
+            # SQLite caps bound parameters; look up in slices
+            for i in range(0, len(unique), 500):
+                part = unique[i : i + 500]
+                placeholders = ",".join("?" * len(part))
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings "
+                    f"WHERE model = ? AND dimensions = ? AND text_hash IN ({placeholders})",
+                    [model, dimensions, *part],
+                ).fetchall()
+                for text_hash, blob in rows:
+                    vec = array("f")
+                    vec.frombytes(blob)
+                    found[text_hash] = vec.tolist()
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_access = ? WHERE model = ? AND dimensions = ? AND text_hash = ?",
+                    [(now, model, dimensions, h) for h in found],
+                )
+            self.hits += sum(1 for h in hashes if h in found)
+            self.misses += sum(1 for h in hashes if h not in found)
+        return found
+
+    def put_many(self, model: str, dimensions: int, items: Dict[str, List[float]]) -> None:
+        if not items:
+            return
+        now = time.time()
+        rows = []
+        for text_hash, vector in items.items():
+            blob = array("f", vector).tobytes()
+            rows.append((model, dimensions, text_hash, blob, len(blob), now))
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                # Replacing an existing row must not double count its bytes
+                for row in rows:
+                    old = self._conn.execute(
+                        "SELECT nbytes FROM embeddings WHERE model = ? AND dimensions = ? AND text_hash = ?",
+                        row[:3],
+                    ).fetchone()
+                    if old:
+                        self._total_bytes -= old[0]
+                    self._conn.execute("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?, ?, ?)", row)
+                    self._total_bytes += row[4]
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            if self._total_bytes > self.max_bytes:
+                self._evict(int(self.max_bytes * _EVICT_TARGET))
+
+    def _evict(self, target_bytes: int) -> None:
+        """Drop least recently used rows until the cache fits in target_bytes."""
+        cursor = self._conn.execute("SELECT model, dimensions, text_hash, nbytes FROM embeddings ORDER BY last_access")
+        victims = []
+        remaining = self._total_bytes
+        for model, dimensions, text_hash, nbytes in cursor:
+            if remaining <= target_bytes:
+                break
+            victims.append((model, dimensions, text_hash))
+            remaining -= nbytes
+        cursor.close()
+        self._conn.executemany(
+            "DELETE FROM embeddings WHERE model = ? AND dimensions = ? AND text_hash = ?", victims
+        )
+        self._total_bytes = remaining
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class CachedEmbeddings(Embeddings):
+    """Wraps an Embeddings model so every call consults an EmbeddingCache first."""
+
+    def __init__(self, underlying: Embeddings, cache: EmbeddingCache):
+        self.underlying = underlying
+        self.cache = cache
+        self.model = str(getattr(underlying, "model", type(underlying).__name__))
+        # 0 stands for "the model's native size" when no dimensions are requested
+        self.dimensions = int(getattr(underlying, "dimensions", None) or 0)
+
+    def _lookup(self, texts: List[str]):
+        """(hashes, cached vectors by hash, texts still to embed by hash)"""
+        hashes = [text_sha256(t) for t in texts]
+        found = self.cache.get_many(self.model, self.dimensions, hashes)
+        missing: Dict[str, str] = {}
+        for text, h in zip(texts, hashes):
+            if h not in found and h not in missing:
+                missing[h] = text
+        return hashes, found, missing
+
+    def _fill(self, hashes, found, missing, vectors) -> List[List[float]]:
+        fresh = dict(zip(missing.keys(), vectors))
+        self.cache.put_many(self.model, self.dimensions, fresh)
+        found.update(fresh)
+        return [found[h] for h in hashes]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        hashes, found, missing = self._lookup(texts)
+        vectors = self.underlying.embed_documents(list(missing.values())) if missing else []
+        return self._fill(hashes, found, missing, vectors)
+
+    def embed_query(self, text: str) -> List[float]:
+        hashes, found, missing = self._lookup([text])
+        if not missing:
+            return found[hashes[0]]
+        return self._fill(hashes, found, missing, [self.underlying.embed_query(text)])[0]
+
+    # Async variants await the underlying model's own async client (pooled
+    # HTTP connections) rather than running the sync call on a thread; the
+    # SQLite reads and writes do run on a thread, off the event loop
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        hashes, found, missing = await asyncio.to_thread(self._lookup, texts)
+        vectors = await self.underlying.aembed_documents(list(missing.values())) if missing else []
+        return await asyncio.to_thread(self._fill, hashes, found, missing, vectors)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        hashes, found, missing = await asyncio.to_thread(self._lookup, [text])
+        if not missing:
+            return found[hashes[0]]
+        vector = await self.underlying.aembed_query(text)
+        return (await asyncio.to_thread(self._fill, hashes, found, missing, [vector]))[0]
+
+
+# The current request's question and its embedding, once computed
+_query_vector: ContextVar[Optional[Tuple[str, List[float]]]] = ContextVar("query_vector", default=None)
+
+
+def remember_query_vector(text: str, vector: Optional[List[float]]) -> None:
+    """Let ``QueryVectorReuse`` answer ``embed_query(text)`` with ``vector`` for the rest of this context."""
+    _query_vector.set((text, vector) if vector is not None else None)
+
+
+class QueryVectorReuse(Embeddings):
+    """Answers ``embed_query`` for the request's question with the vector already computed for it.
+
+    The answer cache embeds each question for its semantic lookup and the
+    retriever then embeds the same text again. Without a working embedding
+    cache (disabled, or a read-only filesystem) that is two paid calls.
+    """
+
+    def __init__(self, underlying: Embeddings):
+        self.underlying = underlying
+
+    def __getattr__(self, name):
+        if name == "underlying":
+            raise AttributeError(name)
+        return getattr(self.underlying, name)
+
+    def _remembered(self, text: str) -> Optional[List[float]]:
+        pinned = _query_vector.get()
+        return pinned[1] if pinned is not None and pinned[0] == text else None
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.underlying.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        vector = self._remembered(text)
+        return vector if vector is not None else self.underlying.embed_query(text)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await self.underlying.aembed_documents(texts)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        vector = self._remembered(text)
+        return vector if vector is not None else await self.underlying.aembed_query(text)
+
+
+def cached_embeddings_from_env(underlying: Embeddings, path: Optional[str] = None) -> Embeddings:
+    """Wrap ``underlying`` with the cache configured by EMBEDDING_CACHE_* env vars.
+
+    Returns ``underlying`` unchanged when the cache is disabled or cannot be
+    opened (e.g. a read-only filesystem).
+    """
+    path = path or os.getenv("EMBEDDING_CACHE_PATH", DEFAULT_CACHE_PATH)
+    if not path or path.lower() in {"off", "none", "0"}:
+        return underlying
+    max_mb = float(os.getenv("EMBEDDING_CACHE_MAX_MB", DEFAULT_MAX_BYTES / (1024 * 1024)))
+    try:
+        return CachedEmbeddings(underlying, EmbeddingCache(path, max_bytes=int(max_mb * 1024 * 1024)))
+    except Exception as e:  # noqa: BLE001
+        print(f"Embedding cache disabled ({path}): {e}")
+        return underlying
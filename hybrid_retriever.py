@@ -0,0 +1,71 @@
+"""
+Hybrid retrieval: dense (embedding) results fused with BM25 over the
+``LexicalIndex`` by reciprocal rank fusion.
+
+RRF scores each chunk by ``sum(1 / (RRF_K + rank))`` over the rankings it
+appears in, so a chunk that both retrievers rank well wins, and an exact-phrase
+match that the embedding missed still makes the cut. Only ranks are used, so
+the two retrievers' incomparable score scales never need calibrating.
+"""
+
+from typing import Any, Dict, List, Sequence
+
+from langchain_core.callbacks import AsyncCallbackManagerForRetrieverRun, CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+from metrics import stage
+
+
+RRF_K = 60
+
+
+def _doc_key(doc: Document):
+    """Identity of a chunk across retrievers, which may not all return ids."""
+    md = doc.metadata or {}
+    if md.get("teaching_name") is not None and md.get("chunk_index") is not None:
+        return (md["teaching_name"], int(md["chunk_index"]))
+    return doc.id or doc.page_content
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[Document]], k: int = RRF_K) -> List[Document]:
+    """Merge best-first rankings into one, best first; ties keep first-seen order."""
+    scores: Dict[Any, float] = {}
+    docs: Dict[Any, Document] = {}
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking, start=1):
+            key = _doc_key(doc)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+            docs.setdefault(key, doc)
+    return [docs[key] for key in sorted(scores, key=scores.get, reverse=True)]
+
+
+class HybridRetriever(BaseRetriever):
+    """Returns the top ``k`` of the dense and lexical candidate lists after RRF."""
+
+    dense: BaseRetriever
+    lexical: Any
+    k: int = 3
+    candidates: int = 10
+    rrf_k: int = RRF_K
+
+    @property
+    def vectorstore(self):
+        """The dense retriever's vector store, so callers can reach its embeddings."""
+        return self.dense.vectorstore
+
+    def _lexical_docs(self, query: str) -> List[Document]:
+        with stage("lexical"):
+            return [doc for doc, _ in self.lexical.search(query, self.candidates)]
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        dense_docs = self.dense.invoke(query, config={"callbacks": run_manager.get_child()})
+        fused = reciprocal_rank_fusion([dense_docs, self._lexical_docs(query)], self.rrf_k)
+        return fused[: self.k]
+
+    async def _aget_relevant_documents(
+        self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        dense_docs = await self.dense.ainvoke(query, config={"callbacks": run_manager.get_child()})
+        fused = reciprocal_rank_fusion([dense_docs, self._lexical_docs(query)], self.rrf_k)
+        return fused[: self.k]
@@ -0,0 +1,185 @@
+"""
+Blue/green index generations and the pointer record that selects the live one.
+
+A full rebuild (``ingest_transcripts.py --reset-index``) writes a brand-new
+generation next to the live one: a fresh Pinecone namespace, or a fresh
+directory under the local index dir, plus its own lexical index file. Once the
+new generation's vector count matches the manifest, ingestion atomically
+replaces the pointer record, and every app instance switches on its next poll.
+Queries keep hitting the old generation until then, so a rebuild causes no
+downtime. Generations that are no longer live are garbage-collected by later
+ingests, after ``keep`` of them have been retained for rollback.
+
+The pointer is a small JSON record at ``$INDEX_POINTER`` (default
+``index_data/active_index.json``), either a local path or ``gs://bucket/key`` so
+that serverless instances can share it::
+
+    {"generation": "gen-20261017-120000-3f9a1c", "backend": "pinecone",
+     "index": "archiveassistanttest", "namespace": "gen-20261017-120000-3f9a1c",
+     "lexical_index": "index_data/lexical-gen-20261017-120000-3f9a1c.bin",
+     "vector_count": 1955, "activated_at": 1792245600.0,
+     "retired": [{...previous generations, newest first...}]}
+
+Without a pointer record everything behaves as before: the default namespace,
+the local index dir itself and ``$LEXICAL_INDEX_PATH``.
+"""
+
+import json
+import os
+import secrets
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Callable, List, Optional
+
+
+DEFAULT_POINTER_PATH = "index_data/active_index.json"
+DEFAULT_POLL_SECONDS = 30.0
+DEFAULT_KEEP_GENERATIONS = 1
+
+
+def pointer_location() -> str:
+    return os.getenv("INDEX_POINTER", DEFAULT_POINTER_PATH)
+
+
+def new_generation_id() -> str:
+    # The random suffix keeps two rebuilds started in the same second apart
+    return f"{time.strftime('gen-%Y%m%d-%H%M%S', time.gmtime())}-{secrets.token_hex(3)}"
+
+
+def _split_gcs(location: str):
+    bucket, _, key = location[len("gs://"):].partition("/")
+    return bucket, key
+
+
+def read_pointer(location: Optional[str] = None) -> Optional[dict]:
+    """The live generation record, or None when no pointer has been written."""
+    location = location or pointer_location()
+    if location.startswith("gs://"):
+        from google.cloud import storage
+
+        bucket, key = _split_gcs(location)
+        blob = storage.Client().bucket(bucket).blob(key)
+        if not blob.exists():
+            return None
+        return json.loads(blob.download_as_bytes())
+    path = Path(location)
+    if not path.exists():
+        return None
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def write_pointer(record: dict, location: Optional[str] = None) -> None:
+    """Atomically replace the pointer: readers see the old record or the new one, never a mix."""
+    location = location or pointer_location()
+    data = json.dumps(record, indent=2, sort_keys=True)
+    if location.startswith("gs://"):
+        from google.cloud import storage
+
+        bucket, key = _split_gcs(location)
+        # A GCS object upload is atomic: the new object replaces the old one whole
+        storage.Client().bucket(bucket).blob(key).upload_from_string(data, content_type="application/json")
+        return
+    path = Path(location)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    tmp.write_text(data, encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def activate(record: dict, previous: Optional[dict], location: Optional[str] = None) -> dict:
+    """Make ``record`` the live generation, remembering ``previous`` as retired."""
+    retired: List[dict] = []
+    if previous:
+        retired.append({k: v for k, v in previous.items() if k != "retired"})
+        retired.extend(previous.get("retired", []))
+    record = {**record, "activated_at": time.time(), "retired": retired}
+    write_pointer(record, location)
+    return record
+
+
+def collect_garbage(
+    record: dict,
+    keep: int = DEFAULT_KEEP_GENERATIONS,
+    delete_namespace: Optional[Callable[[str], None]] = None,
+    location: Optional[str] = None,
+) -> List[str]:
+    """Delete retired generations beyond the newest ``keep``; returns their ids.
+
+    The most recently retired generation is normally kept: app instances that
+    have not polled since the switch are still querying it.
+    """
+    retired = record.get("retired", [])
+    survivors, doomed = retired[:keep], retired[keep:]
+    collected: List[str] = []
+    for gen in doomed:
+        try:
+            if gen.get("namespace") and delete_namespace is not None:
+                delete_namespace(gen["namespace"])
+            if gen.get("index_dir"):
+                shutil.rmtree(gen["index_dir"], ignore_errors=True)
+            if gen.get("lexical_index") and not gen["lexical_index"].startswith("gs://"):
+                Path(gen["lexical_index"]).unlink(missing_ok=True)
+            collected.append(gen["generation"])
+        except Exception as e:  # noqa: BLE001
+            print(f"Could not garbage-collect generation {gen.get('generation')}: {e}")
+            survivors.append(gen)
+    if collected:
+        write_pointer({**record, "retired": survivors}, location)
+    return collected
+
+
+class PointerWatcher:
+    """Re-reads the pointer at most every ``poll_seconds`` and reports switches.
+
+    A record only becomes ``current`` once the caller ``commit``s it after
+    building a chain for it, so a failed switch is retried on the next poll
+    and ``generation`` always names the generation actually being served.
+    """
+
+    def __init__(self, location: Optional[str] = None, poll_seconds: float = DEFAULT_POLL_SECONDS):
+        self.location = location or pointer_location()
+        self.poll_seconds = poll_seconds
+        self.current: Optional[dict] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def generation(self) -> Optional[str]:
+        return self.current.get("generation") if self.current else None
+
+    def due(self) -> bool:
+        return time.monotonic() - self._checked_at >= self.poll_seconds
+
+    def load(self) -> Optional[dict]:
+        """Read the pointer now; ``commit`` the record once it is being served."""
+        with self._lock:
+            self._checked_at = time.monotonic()
+            try:
+                return read_pointer(self.location)
+            except Exception as e:  # noqa: BLE001
+                print(f"Could not read index pointer {self.location}: {e}")
+                return self.current
+
+    def commit(self, record: Optional[dict]) -> None:
+        """Record that ``record``'s generation is now being served."""
+        with self._lock:
+            self.current = record
+
+    def poll(self) -> Optional[dict]:
+        """The new record if the live generation changed since the last read, else None."""
+        if not self.due() or not self._lock.acquire(blocking=False):
+            return None
+        try:
+            self._checked_at = time.monotonic()
+            try:
+                record = read_pointer(self.location)
+            except Exception as e:  # noqa: BLE001
+                print(f"Could not read index pointer {self.location}: {e}")
+                return None
+            if record is None or record.get("generation") == self.generation:
+                return None
+            return record
+        finally:
+            self._lock.release()
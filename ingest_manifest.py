@@ -0,0 +1,97 @@
+"""
+Local manifest of what has already been ingested, used to make
+``ingest_transcripts.py`` incremental.
+
+The manifest records, per transcript file, the sha256 of its bytes, the
+chunking parameters it was split with, and the id -> content hash of every
+chunk that was upserted. Chunk ids are deterministic (teaching slug, chunk
+index and content hash), so a re-run only embeds chunks whose id is new and
+deletes ids that no longer exist.
+"""
+
+import hashlib
+import json
+import os
+import re
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from langchain.schema import Document
+
+
+MANIFEST_VERSION = 1
+DEFAULT_MANIFEST_PATH = "index_data/ingest_manifest.json"
+
+# Metadata that varies with where the ingest runs, not with chunk content
+_UNHASHED_METADATA = {"source"}
+
+
+def file_sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with path.open("rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def chunk_sha256(doc: Document) -> str:
+    md = {k: v for k, v in (doc.metadata or {}).items() if k not in _UNHASHED_METADATA}
+    payload = doc.page_content + "\0" + json.dumps(md, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def teaching_slug(teaching_name: str) -> str:
+    slug = re.sub(r"[^a-z0-9]+", "-", teaching_name.lower()).strip("-")
+    return slug or "teaching"
+
+
+def make_chunk_id(teaching_name: str, chunk_index: int, content_hash: str) -> str:
+    """Stable vector id: same teaching, position and content -> same id."""
+    return f"{teaching_slug(teaching_name)}-{chunk_index:05d}-{content_hash[:16]}"
+
+
+def empty_manifest(target: dict) -> dict:
+    return {"version": MANIFEST_VERSION, "target": target, "files": {}}
+
+
+def load_manifest(path: Path, target: dict) -> dict:
+    """Load the manifest for ``target`` (backend + index); start fresh on any mismatch."""
+    if not path.exists():
+        return empty_manifest(target)
+    try:
+        manifest = json.loads(path.read_text(encoding="utf-8"))
+    except Exception as e:  # noqa: BLE001
+        print(f"Ignoring unreadable manifest {path}: {e}")
+        return empty_manifest(target)
+    if manifest.get("version") != MANIFEST_VERSION or manifest.get("target") != target:
+        print(f"Manifest {path} was written for {manifest.get('target')}, not {target}; starting fresh.")
+        return empty_manifest(target)
+    manifest.setdefault("files", {})
+    return manifest
+
+
+def save_manifest(path: Path, manifest: dict) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    tmp.write_text(json.dumps(manifest, indent=2, sort_keys=True), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def diff_file_chunks(
+    teaching_name: str, docs: List[Document], previous: Optional[dict]
+) -> Tuple[Dict[str, str], List[Tuple[str, Document]], List[str]]:
+    """Compare freshly built chunks for one file against its manifest entry.
+
+    Returns (chunk id -> hash for the new entry, [(id, doc)] to upsert, ids to delete).
+    """
+    old_chunks: Dict[str, str] = (previous or {}).get("chunks", {})
+    chunks: Dict[str, str] = {}
+    to_upsert: List[Tuple[str, Document]] = []
+    for doc in docs:
+        content_hash = chunk_sha256(doc)
+        chunk_id = make_chunk_id(teaching_name, int(doc.metadata.get("chunk_index", 0)), content_hash)
+        chunks[chunk_id] = content_hash
+        if chunk_id not in old_chunks:
+            to_upsert.append((chunk_id, doc))
+    to_delete = [cid for cid in old_chunks if cid not in chunks]
+    return chunks, to_upsert, to_delete
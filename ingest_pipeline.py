@@ -0,0 +1,328 @@
+"""
+Pipelined embedding + upsert for ``ingest_transcripts.py``.
+
+Chunks arrive as a lazy stream (files -> rows -> chunks are generators), are
+grouped into batches by real token count (tiktoken) on a producer thread that
+runs at most a few batches ahead through a bounded queue, embedded on a bounded
+thread pool, and handed to a separate upsert pool as soon as each batch comes
+back, so the vector-store writes for batch N overlap with the embedding calls
+for batch N+1. Every stage is bounded, so memory stays flat however many
+transcripts are ingested, and the first vectors land as soon as the first
+batch is full. Rate-limit errors are retried with exponential backoff and
+jitter, and every 429 halves the number of concurrent embedding calls, which
+then creeps back up while requests succeed.
+"""
+
+import queue
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Deque, Iterable, Iterator, List, Optional, Tuple, TypeVar
+
+from langchain.schema import Document
+from langchain_core.embeddings import Embeddings
+
+try:
+    import tiktoken
+except ImportError:  # pragma: no cover
+    tiktoken = None  # type: ignore
+
+
+# OpenAI embeddings accept up to 300k tokens and 2048 inputs per request; stay
+# well inside both so batches are small enough to run several in parallel
+DEFAULT_MAX_BATCH_TOKENS = 50_000
+DEFAULT_MAX_BATCH_ITEMS = 512
+PINECONE_UPSERT_BATCH = 100
+
+_encoding = None
+_encoding_failed = False
+
+
+def count_tokens(text: str) -> int:
+    """Token count under the embedding model's tokenizer (cl100k_base).
+
+    Falls back to ~4 characters per token when tiktoken or its encoding file
+    is unavailable.
+    """
+    global _encoding, _encoding_failed
+    if _encoding is None and tiktoken is not None and not _encoding_failed:
+        try:
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception as e:  # noqa: BLE001
+            print(f"tiktoken unavailable, estimating tokens from characters: {e}")
+            _encoding_failed = True
+    if _encoding is None:
+        return max(1, len(text) // 4)
+    return len(_encoding.encode(text, disallowed_special=()))
+
+
+def token_batches(
+    items: Iterable[Tuple[str, Document]],
+    max_tokens: int = DEFAULT_MAX_BATCH_TOKENS,
+    max_items: int = DEFAULT_MAX_BATCH_ITEMS,
+) -> Iterator[List[Tuple[str, Document]]]:
+    batch: List[Tuple[str, Document]] = []
+    tokens = 0
+    for item in items:
+        n = count_tokens(item[1].page_content)
+        if batch and (tokens + n > max_tokens or len(batch) >= max_items):
+            yield batch
+            batch, tokens = [], 0
+        batch.append(item)
+        tokens += n
+    if batch:
+        yield batch
+
+
+T = TypeVar("T")
+_END = object()
+
+
+def prefetch(items: Iterable[T], maxsize: int) -> Iterator[T]:
+    """Iterate ``items`` on a background thread, at most ``maxsize`` items ahead.
+
+    Exceptions raised by ``items`` are re-raised in the consumer. If the
+    consumer stops early, the producer is released and its thread exits.
+    """
+    buffer: "queue.Queue" = queue.Queue(maxsize=max(1, maxsize))
+    stopped = threading.Event()
+
+    def put(item) -> bool:
+        while not stopped.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in items:
+                if not put((item, None)):
+                    return
+            put((_END, None))
+        except BaseException as e:  # noqa: BLE001
+            put((_END, e))
+
+    thread = threading.Thread(target=produce, name="prefetch", daemon=True)
+    thread.start()
+    try:
+        while True:
+            item, error = buffer.get()
+            if item is _END:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        stopped.set()
+
+
+def is_rate_limit_error(exc: BaseException) -> bool:
+    if type(exc).__name__ == "RateLimitError":
+        return True
+    status = getattr(exc, "status_code", None) or getattr(exc, "status", None)
+    return status == 429 or "429" in str(exc)[:200]
+
+
+def is_retryable_error(exc: BaseException) -> bool:
+    if is_rate_limit_error(exc):
+        return True
+    if type(exc).__name__ in {"APIConnectionError", "APITimeoutError", "InternalServerError", "ServiceException"}:
+        return True
+    status = getattr(exc, "status_code", None) or getattr(exc, "status", None)
+    return isinstance(status, int) and status >= 500
+
+
+class AdaptiveLimiter:
+    """Concurrency limit that halves on rate limits and grows back on success (AIMD)."""
+
+    def __init__(self, max_limit: int, min_limit: int = 1, increase_every: int = 4):
+        self.max_limit = max(1, max_limit)
+        self.min_limit = max(1, min(min_limit, self.max_limit))
+        self.limit = self.max_limit
+        self.increase_every = increase_every
+        self.rate_limited = 0
+        self._active = 0
+        self._successes = 0
+        self._cond = threading.Condition()
+
+    def __enter__(self):
+        with self._cond:
+            while self._active >= self.limit:
+                self._cond.wait()
+            self._active += 1
+        return self
+
+    def __exit__(self, *exc):
+        with self._cond:
+            self._active -= 1
+            self._cond.notify_all()
+        return False
+
+    def on_success(self) -> None:
+        with self._cond:
+            self._successes += 1
+            if self._successes >= self.increase_every and self.limit < self.max_limit:
+                self.limit += 1
+                self._successes = 0
+                self._cond.notify_all()
+
+    def on_rate_limit(self) -> None:
+        with self._cond:
+            self.rate_limited += 1
+            self._successes = 0
+            new_limit = max(self.min_limit, self.limit // 2)
+            if new_limit != self.limit:
+                print(f"Rate limited: reducing embedding concurrency {self.limit} -> {new_limit}")
+            self.limit = new_limit
+
+
+def call_with_backoff(
+    fn: Callable,
+    *args,
+    limiter: Optional[AdaptiveLimiter] = None,
+    max_retries: int = 6,
+    base_delay: float = 1.0,
+    max_delay: float = 60.0,
+):
+    """Run ``fn`` retrying transient failures with exponential backoff and full jitter."""
+    attempt = 0
+    while True:
+        try:
+            if limiter is None:
+                result = fn(*args)
+            else:
+                with limiter:
+                    result = fn(*args)
+                limiter.on_success()
+            return result
+        except Exception as e:  # noqa: BLE001
+            if attempt >= max_retries or not is_retryable_error(e):
+                raise
+            if limiter is not None and is_rate_limit_error(e):
+                limiter.on_rate_limit()
+            delay = random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
+            print(f"{type(e).__name__}: retrying in {delay:.1f}s (attempt {attempt + 1}/{max_retries})")
+            time.sleep(delay)
+            attempt += 1
+
+
+def make_upsert_fn(vectorstore, namespace: Optional[str] = None) -> Callable:
+    """Return fn(ids, texts, metadatas, vectors) writing pre-computed vectors to ``vectorstore``."""
+    if hasattr(vectorstore, "add_embeddings"):
+        # LocalVectorStore
+        def upsert_local(ids, texts, metadatas, vectors):
+            vectorstore.add_embeddings(texts, vectors, metadatas=metadatas, ids=ids)
+
+        return upsert_local
+
+    index = vectorstore.index
+    text_key = getattr(vectorstore, "_text_key", "text")
+
+    def upsert_pinecone(ids, texts, metadatas, vectors):
+        records = []
+        for id_, text, md, vec in zip(ids, texts, metadatas, vectors):
+            # Pinecone rejects null metadata values
+            metadata = {k: v for k, v in md.items() if v is not None}
+            metadata[text_key] = text
+            records.append({"id": id_, "values": list(vec), "metadata": metadata})
+        for i in range(0, len(records), PINECONE_UPSERT_BATCH):
+            index.upsert(vectors=records[i : i + PINECONE_UPSERT_BATCH], namespace=namespace)
+
+    return upsert_pinecone
+
+
+class PipelinedIngester:
+    """Embeds token-bounded batches concurrently and overlaps upserts with embedding."""
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        upsert_fn: Callable,
+        embed_workers: int = 4,
+        upsert_workers: int = 2,
+        max_batch_tokens: int = DEFAULT_MAX_BATCH_TOKENS,
+        max_batch_items: int = DEFAULT_MAX_BATCH_ITEMS,
+    ):
+        self.embeddings = embeddings
+        self.upsert_fn = upsert_fn
+        self.embed_workers = max(1, embed_workers)
+        self.upsert_workers = max(1, upsert_workers)
+        self.max_batch_tokens = max_batch_tokens
+        self.max_batch_items = max_batch_items
+        self.limiter = AdaptiveLimiter(self.embed_workers)
+
+    def run(self, items: Iterable[Tuple[str, Document]], total: Optional[int] = None) -> dict:
+        """Embed and upsert a (lazy) stream of (chunk id, Document) pairs."""
+        uploaded = 0
+        batches = 0
+        first_upsert = None
+        progress_lock = threading.Lock()
+        # Cap batches in flight so memory stays bounded however many are queued
+        in_flight = threading.BoundedSemaphore(self.embed_workers + self.upsert_workers * 2)
+        started = time.perf_counter()
+
+        embed_pool = ThreadPoolExecutor(max_workers=self.embed_workers, thread_name_prefix="embed")
+        upsert_pool = ThreadPoolExecutor(max_workers=self.upsert_workers, thread_name_prefix="upsert")
+        futures: Deque[Future] = deque()
+
+        def reap(block: bool) -> None:
+            """Drop finished batches, surfacing the first failure from either stage."""
+            while futures and (block or futures[0].done()):
+                futures.popleft().result().result()
+
+        def upsert(batch, vectors):
+            nonlocal uploaded, first_upsert
+            try:
+                call_with_backoff(
+                    self.upsert_fn,
+                    [cid for cid, _ in batch],
+                    [doc.page_content for _, doc in batch],
+                    [dict(doc.metadata) for _, doc in batch],
+                    vectors,
+                )
+                with progress_lock:
+                    if first_upsert is None:
+                        first_upsert = time.perf_counter() - started
+                    uploaded += len(batch)
+                    print(f"Uploaded {uploaded}/{total if total is not None else '?'}...")
+            finally:
+                in_flight.release()
+
+        def embed(batch):
+            try:
+                texts = [doc.page_content for _, doc in batch]
+                vectors = call_with_backoff(self.embeddings.embed_documents, texts, limiter=self.limiter)
+            except BaseException:
+                in_flight.release()
+                raise
+            return upsert_pool.submit(upsert, batch, vectors)
+
+        # Reading, chunking and token counting run ahead of the embedding calls,
+        # but never by more than one batch per embedding worker
+        stream = prefetch(token_batches(items, self.max_batch_tokens, self.max_batch_items), self.embed_workers)
+        try:
+            for batch in stream:
+                in_flight.acquire()
+                futures.append(embed_pool.submit(embed, batch))
+                batches += 1
+                reap(block=False)
+            reap(block=True)
+        finally:
+            stream.close()
+            embed_pool.shutdown(wait=True)
+            upsert_pool.shutdown(wait=True)
+
+        elapsed = time.perf_counter() - started
+        return {
+            "uploaded": uploaded,
+            "batches": batches,
+            "seconds": elapsed,
+            "first_upsert_seconds": first_upsert,
+            "rate_limited": self.limiter.rate_limited,
+            "final_concurrency": self.limiter.limit,
+        }
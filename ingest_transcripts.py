@@ -1,8 +1,8 @@
+import itertools
 import os
-import csv
-import re
+import time
 from pathlib import Path
-from typing import List, Tuple
+from typing import Iterable, Iterator, List, Optional, Tuple
 import argparse
 
 from dotenv import load_dotenv
@@ -11,126 +11,85 @@ from langchain.schema import Document
 from langchain_openai import OpenAIEmbeddings
 from langchain_pinecone import PineconeVectorStore
 
+from embedding_cache import DEFAULT_CACHE_PATH, CachedEmbeddings, cached_embeddings_from_env
+from ingest_manifest import (
+    DEFAULT_MANIFEST_PATH,
+    chunk_sha256,
+    diff_file_chunks,
+    empty_manifest,
+    file_sha256,
+    load_manifest,
+    make_chunk_id,
+    save_manifest,
+)
+from index_generations import (
+    DEFAULT_KEEP_GENERATIONS,
+    activate,
+    collect_garbage,
+    new_generation_id,
+    pointer_location,
+    read_pointer,
+    write_pointer,
+)
+from ingest_pipeline import DEFAULT_MAX_BATCH_TOKENS, PipelinedIngester, make_upsert_fn
+from lexical_index import DEFAULT_LEXICAL_INDEX_PATH, write_lexical_index
+from transcript_reader import TranscriptColumns, read_transcript, split_sentences
+from transcript_store import DEFAULT_STORE_PATH, write_transcript_store
+
 try:
     from pinecone import Pinecone
 except Exception:  # pragma: no cover
     Pinecone = None  # type: ignore
 
 
-SENT_SPLIT_RE = re.compile(r"(?<=[.!?])[\]\)\"']?\s+(?=[A-Z0-9\"'\(\[])")
+# Pinecone accepts at most 1000 ids per delete request
+DELETE_BATCH_SIZE = 1000
 
+# Time-aware CSV chunking: segments run to about TARGET_SECONDS of speech and
+# end at the first pause of at least MIN_PAUSE_SECONDS after that. A segment
+# that reaches OVERRUN x the target (or max_chars) without such a pause is cut
+# at the longest pause in its second half instead.
+DEFAULT_TARGET_SECONDS = 60.0
+DEFAULT_MIN_PAUSE_SECONDS = 1.5
+OVERRUN = 1.5
 
-def split_sentences(text: str) -> List[str]:
-    """Lightweight sentence splitter without NLTK."""
-    if not text:
-        return []
-    cleaned = re.sub(r"\s+", " ", text).strip()
-    if not cleaned:
-        return []
-    parts = SENT_SPLIT_RE.split(cleaned)
-    sentences: List[str] = []
-    for part in parts:
-        part = part.strip()
-        if not part:
-            continue
-        if sentences and len(part) < 30:
-            sentences[-1] = (sentences[-1] + " " + part).strip()
-        else:
-            sentences.append(part)
-    return sentences
+# What a default ``ingest_transcripts.py`` run uses; window/step still chunk TXT files
+DEFAULT_CHUNKING = {
+    "window_size": 5,
+    "step_size": 2,
+    "max_chars": 3500,
+    "strategy": "time",
+    "target_seconds": DEFAULT_TARGET_SECONDS,
+    "min_pause": DEFAULT_MIN_PAUSE_SECONDS,
+}
 
 
-def load_txt_file(path: Path) -> str:
-    return path.read_text(encoding="utf-8", errors="ignore")
-
-
-def load_csv_file(path: Path) -> str:
-    # Heuristic: select the text-like column by highest average token length
-    rows: List[List[str]] = []
-    with path.open("r", encoding="utf-8", errors="ignore", newline="") as f:
-        reader = csv.reader(f)
-        for row in reader:
-            if row:
-                rows.append(row)
-    if not rows:
-        return ""
+def iter_transcript_paths(transcripts_dir: Path) -> Iterator[Path]:
+    for path in sorted(transcripts_dir.glob("**/*")):
+        if path.is_file() and path.suffix.lower() in {".txt", ".csv"}:
+            yield path
 
-    num_cols = max(len(r) for r in rows)
-    if num_cols == 1:
-        return "\n".join(r[0] for r in rows if r and r[0].strip())
 
-    # Score columns: choose the one that looks like sentence text
-    def score_col(idx: int) -> float:
-        values = [r[idx] for r in rows if len(r) > idx and r[idx].strip()]
-        if not values:
-            return 0.0
-        avg_len = sum(len(v) for v in values) / len(values)
-        punct = sum(v.count(". ") + v.count("? ") + v.count("! ") for v in values) / max(len(values), 1)
-        return avg_len + 20 * punct
+def transcript_meta(path: Path) -> dict:
+    return {"source": str(path), "teaching_name": path.stem.strip(), "filename": path.name}
 
-    best_idx = max(range(num_cols), key=score_col)
-    text_lines = [r[best_idx].strip() for r in rows if len(r) > best_idx and r[best_idx].strip()]
-    return "\n".join(text_lines)
 
+def load_transcript(path: Path) -> Optional[TranscriptColumns]:
+    try:
+        return read_transcript(path)
+    except Exception as e:  # noqa: BLE001
+        print(f"Skip {path.name}: load error {e}")
+        return None
 
-def iter_transcripts(transcripts_dir: Path) -> List[Tuple[str, str, dict]]:
-    results: List[Tuple[str, str, dict]] = []
-    for path in sorted(transcripts_dir.glob("**/*")):
-        if not path.is_file():
-            continue
-        ext = path.suffix.lower()
-        if ext not in {".txt", ".csv"}:
-            continue
 
-        try:
-            if ext == ".txt":
-                content = load_txt_file(path)
-            else:
-                content = load_csv_file(path)
-        except Exception as e:  # noqa: BLE001
-            print(f"Skip {path.name}: load error {e}")
+def iter_transcripts(transcripts_dir: Path) -> Iterator[Tuple[str, TranscriptColumns, dict]]:
+    """Yield (teaching name, parsed columns, metadata), reading each file once."""
+    for path in iter_transcript_paths(transcripts_dir):
+        columns = load_transcript(path)
+        if columns is None:
             continue
-
-        teaching_name = path.stem.strip()
-        meta = {"source": str(path), "teaching_name": teaching_name, "filename": path.name}
-        results.append((teaching_name, content, meta))
-    return results
-
-
-def parse_csv_rows(csv_path: Path) -> List[dict]:
-    rows: List[dict] = []
-    with csv_path.open("r", encoding="utf-8", errors="ignore", newline="") as f:
-        reader = csv.DictReader(f)
-        # Normalize fieldnames
-        field_map = {fn: (fn or "").strip().lower().replace(" ", "") for fn in (reader.fieldnames or [])}
-        # Identify likely columns
-        start_key = next((k for k, v in field_map.items() if v in {"starttime", "start", "start_seconds", "startsec"}), None)
-        end_key = next((k for k, v in field_map.items() if v in {"endtime", "end", "end_seconds", "endsec"}), None)
-        text_key = next((k for k, v in field_map.items() if v in {"transcript", "text", "content"}), None)
-        if text_key is None:
-            # fall back to longest-looking column if not named clearly
-            sample = next(reader, None)
-            if sample is None:
-                return rows
-            cols = list(sample.keys())
-            best = max(cols, key=lambda c: len((sample.get(c) or "")))
-            text_key = best
-            # rewind by re-creating reader
-            f.seek(0)
-            reader = csv.DictReader(f)
-        for r in reader:
-            text = (r.get(text_key) or "").strip()
-            if not text:
-                continue
-            def to_float(val):
-                try:
-                    return float(val)
-                except Exception:
-                    return None
-            start = to_float(r.get(start_key)) if start_key else None
-            end = to_float(r.get(end_key)) if end_key else None
-            rows.append({"start": start, "end": end, "text": text})
-    return rows
+        meta = transcript_meta(path)
+        yield meta["teaching_name"], columns, meta
 
 
 def chunk_by_sentences(
@@ -188,6 +147,47 @@ def chunk_by_sentences(
     return chunks
 
 
+def segment_rows_by_time(
+    columns: TranscriptColumns,
+    target_seconds: float = DEFAULT_TARGET_SECONDS,
+    max_chars: int = 3500,
+    min_pause: float = DEFAULT_MIN_PAUSE_SECONDS,
+) -> List[Tuple[int, int]]:
+    """Split a timed transcript into [start, stop) row ranges at natural pauses.
+
+    A pause is the gap between a row's end time and the next row's start time.
+    Rows without times never trigger a time-based cut; their text still counts
+    towards ``max_chars``.
+    """
+    n = len(columns)
+    starts, ends = columns.starts, columns.ends
+    segments: List[Tuple[int, int]] = []
+    first = 0
+    while first < n:
+        seg_start = starts[first]
+        chars = 0
+        best_cut, best_gap = None, -1.0
+        cut = n
+        for i in range(first, n):
+            chars += len(columns.row_text(i)) + 1
+            if i + 1 == n:
+                break
+            duration = ends[i] - seg_start
+            gap = starts[i + 1] - ends[i]
+            # NaN durations and gaps compare False, so untimed rows just accumulate
+            if duration >= target_seconds * 0.5 and gap > best_gap:
+                best_cut, best_gap = i + 1, gap
+            if duration >= target_seconds and gap >= min_pause:
+                cut = i + 1
+                break
+            if duration >= target_seconds * OVERRUN or chars >= max_chars:
+                cut = best_cut or (i + 1)
+                break
+        segments.append((first, cut))
+        first = cut
+    return segments
+
+
 def ensure_index(index_name: str, dimension: int = 1536):
     if Pinecone is None:
         return
@@ -201,59 +201,321 @@ def ensure_index(index_name: str, dimension: int = 1536):
         print(f"Index check/create skipped or failed: {e}")
 
 
-def build_documents(transcripts_dir: Path, window_size: int, step_size: int, max_chars: int) -> List[Document]:
+def count_vectors(vectorstore, namespace: Optional[str] = None) -> int:
+    """Vectors stored in the local index, or in one namespace of the Pinecone index."""
+    if hasattr(vectorstore, "add_embeddings"):
+        return len(vectorstore)
+    stats = vectorstore.index.describe_index_stats()
+    namespaces = stats.get("namespaces") or {}
+    summary = namespaces.get(namespace or "")
+    return int(summary.get("vector_count", 0)) if summary else 0
+
+
+def wait_for_vector_count(vectorstore, expected: int, namespace: Optional[str] = None, timeout: float = 120.0) -> int:
+    """Poll until the index holds ``expected`` vectors (Pinecone counts lag upserts); returns the last count."""
+    deadline = time.monotonic() + timeout
+    while True:
+        count = count_vectors(vectorstore, namespace)
+        if count == expected or time.monotonic() >= deadline:
+            return count
+        time.sleep(2.0)
+
+
+def plan_generation(args, index_name: str, live: Optional[dict]) -> Optional[dict]:
+    """The generation this run writes to: a fresh one for --reset-index, else the live one.
+
+    Returns None when no pointer has been written yet and the run is
+    incremental, in which case the default namespace, the local index dir and
+    --lexical-index are updated in place as before.
+    """
+    if not args.reset_index:
+        if live and live.get("backend") == args.backend:
+            return {k: v for k, v in live.items() if k not in ("activated_at", "retired")}
+        return None
+    generation_id = new_generation_id()
+    lexical = Path(args.lexical_index)
+    record = {
+        "generation": generation_id,
+        "backend": args.backend,
+        "lexical_index": str(lexical.with_name(f"{lexical.stem}-{generation_id}{lexical.suffix}")),
+    }
+    if args.backend == "local":
+        record["index_dir"] = str(Path(args.local_index_dir) / "generations" / generation_id)
+    else:
+        record.update(index=index_name, namespace=generation_id)
+    return record
+
+
+def _segment_text(columns: TranscriptColumns, start: int, stop: int) -> str:
+    """Row texts of a segment, without the ASR's repeated consecutive rows."""
+    parts: List[str] = []
+    previous = None
+    for i in range(start, stop):
+        row = (columns.starts[i], columns.row_text(i))
+        if row != previous:
+            parts.append(row[1])
+        previous = row
+    return " ".join(parts)
+
+
+def _span_document(columns: TranscriptColumns, meta: dict, idx: int, text: str, start: int, stop: int) -> Document:
+    start_sec, end_sec = columns.span_times(start, stop)
+    header = ""
+    if start_sec is not None and end_sec is not None:
+        header = f"Timestamp: {start_sec}-{end_sec}\n"
+    elif start_sec is not None:
+        header = f"Timestamp: {start_sec}\n"
+    md = dict(meta)
+    md["chunk_index"] = idx
+    if start_sec is not None:
+        md["start_seconds"] = float(start_sec)
+    if end_sec is not None:
+        md["end_seconds"] = float(end_sec)
+    return Document(page_content=header + text, metadata=md)
+
+
+def build_file_documents(
+    columns: TranscriptColumns,
+    meta: dict,
+    window_size: int = 5,
+    step_size: int = 2,
+    max_chars: int = 3500,
+    strategy: str = "rows",
+    target_seconds: float = DEFAULT_TARGET_SECONDS,
+    min_pause: float = DEFAULT_MIN_PAUSE_SECONDS,
+) -> List[Document]:
+    """Chunk a single parsed transcript into Documents.
+
+    CSV transcripts are windowed by ``window_size`` rows (``strategy="rows"``)
+    or, with ``strategy="time"``, segmented by duration at natural pauses.
+    """
     docs: List[Document] = []
-    for teaching_name, content, meta in iter_transcripts(transcripts_dir):
-        source_path = Path(meta["source"]) 
-        if source_path.suffix.lower() == ".csv":
-            rows = parse_csv_rows(source_path)
-            if not rows:
-                continue
-            i = 0
-            idx = 0
-            while i < len(rows):
-                window = rows[i : i + window_size]
-                if not window:
-                    break
-                texts = [r["text"] for r in window]
-                start_vals = [r["start"] for r in window if r.get("start") is not None]
-                end_vals = [r["end"] for r in window if r.get("end") is not None]
-                start_sec = min(start_vals) if start_vals else None
-                end_sec = max(end_vals) if end_vals else None
-                header = ""
-                if start_sec is not None and end_sec is not None:
-                    header = f"Timestamp: {start_sec}-{end_sec}\n"
-                elif start_sec is not None:
-                    header = f"Timestamp: {start_sec}\n"
-                chunk = header + " ".join(texts)
-                md = dict(meta)
-                md["chunk_index"] = idx
-                if start_sec is not None:
-                    md["start_seconds"] = float(start_sec)
-                if end_sec is not None:
-                    md["end_seconds"] = float(end_sec)
-                docs.append(Document(page_content=chunk, metadata=md))
-                idx += 1
-                if i + window_size >= len(rows):
-                    break
-                i += step_size
-        else:
-            for idx, chunk in enumerate(chunk_by_sentences(content, window_size=window_size, step_size=step_size, max_chars=max_chars)):
-                md = dict(meta)
-                md["chunk_index"] = idx
-                # Ensure keys exist for document_prompt formatting
-                md.setdefault("start_seconds", None)
-                md.setdefault("end_seconds", None)
-                docs.append(Document(page_content=chunk, metadata=md))
+    source_path = Path(meta["source"])
+    if source_path.suffix.lower() == ".csv" and strategy == "time" and columns.has_times:
+        segments = segment_rows_by_time(columns, target_seconds, max_chars, min_pause)
+        for idx, (start, stop) in enumerate(segments):
+            docs.append(_span_document(columns, meta, idx, _segment_text(columns, start, stop), start, stop))
+    elif source_path.suffix.lower() == ".csv":
+        n = len(columns)
+        i = 0
+        idx = 0
+        while i < n:
+            stop = min(i + window_size, n)
+            docs.append(_span_document(columns, meta, idx, columns.span_text(i, stop), i, stop))
+            idx += 1
+            if i + window_size >= n:
+                break
+            i += step_size
+    else:
+        content = columns.full_text()
+        for idx, chunk in enumerate(chunk_by_sentences(content, window_size=window_size, step_size=step_size, max_chars=max_chars)):
+            md = dict(meta)
+            md["chunk_index"] = idx
+            # Ensure keys exist for document_prompt formatting
+            md.setdefault("start_seconds", None)
+            md.setdefault("end_seconds", None)
+            docs.append(Document(page_content=chunk, metadata=md))
     return docs
 
 
+def build_documents(transcripts_dir: Path, **chunking) -> List[Document]:
+    docs: List[Document] = []
+    for teaching_name, columns, meta in iter_transcripts(transcripts_dir):
+        docs.extend(build_file_documents(columns, meta, **chunking))
+    return docs
+
+
+def chunk_pairs(teaching_name: str, docs: List[Document]) -> List[Tuple[str, Document]]:
+    """(chunk id, Document) for a file's chunks, with the vector index's ids."""
+    return [(make_chunk_id(teaching_name, int(doc.metadata["chunk_index"]), chunk_sha256(doc)), doc) for doc in docs]
+
+
+def parse_archive(transcripts_dir: Path, chunking: dict):
+    """Parse and chunk every transcript once; returns (transcript store inputs, lexical index inputs)."""
+    transcripts: List[Tuple[str, str, TranscriptColumns]] = []
+    chunks: List[Tuple[str, Document]] = []
+    for teaching_name, columns, meta in iter_transcripts(transcripts_dir):
+        transcripts.append((teaching_name, meta["filename"], columns))
+        chunks.extend(chunk_pairs(teaching_name, build_file_documents(columns, meta, **chunking)))
+    return transcripts, chunks
+
+
+def build_transcript_store(transcripts: Iterable[Tuple[str, str, TranscriptColumns]], store_path: Path) -> None:
+    """Compile row-level timing of (teaching name, filename, columns) into the app's memory-mapped store."""
+    counts = write_transcript_store(store_path, transcripts)
+    print(
+        f"Wrote transcript store {store_path}: {counts['teachings']} teachings, "
+        f"{counts['rows']} rows, {counts['bytes'] / 1e6:.1f} MB"
+    )
+
+
+def build_lexical_index(chunks: Iterable[Tuple[str, Document]], index_path: Path) -> None:
+    """Compile the BM25 inverted index over (chunk id, Document) pairs."""
+    counts = write_lexical_index(index_path, chunks)
+    print(
+        f"Wrote lexical index {index_path}: {counts['chunks']} chunks, {counts['terms']} terms, "
+        f"{counts['postings']} postings, {counts['bytes'] / 1e6:.1f} MB"
+    )
+
+
+class IngestPlan:
+    """Streams the chunks that must be embedded, one transcript at a time.
+
+    Files whose bytes and chunking parameters match the manifest are skipped
+    without being re-chunked. Iterating yields (id, Document) pairs to upsert
+    as each file is chunked; once the iteration is exhausted, ``files`` holds
+    the new manifest files section and ``to_delete`` the ids to delete. Only
+    ids and hashes are kept, never the chunks themselves.
+
+    With ``collect``, unchanged files are parsed too, and every file's
+    columns and (id, chunk) pairs are kept in ``transcripts`` and ``chunks``
+    for the transcript store and lexical index, so no transcript is read
+    more than once per ingest.
+    """
+
+    def __init__(self, transcripts_dir: Path, manifest: dict, chunking: dict, collect: bool = False):
+        self.transcripts_dir = transcripts_dir
+        self.old_files: dict = manifest.get("files", {})
+        self.chunking = chunking
+        self.collect = collect
+        self.files: dict = {}
+        self.to_delete: List[str] = []
+        self.to_upsert = 0
+        self.transcripts: List[Tuple[str, str, TranscriptColumns]] = []
+        self.chunks: List[Tuple[str, Document]] = []
+
+    @property
+    def total_chunks(self) -> int:
+        return sum(len(f["chunks"]) for f in self.files.values())
+
+    def __iter__(self) -> Iterator[Tuple[str, Document]]:
+        for source_path in iter_transcript_paths(self.transcripts_dir):
+            key = source_path.relative_to(self.transcripts_dir).as_posix()
+            digest = file_sha256(source_path)
+            previous = self.old_files.get(key)
+            unchanged = previous and previous.get("sha256") == digest and previous.get("chunking") == self.chunking
+            if unchanged and not self.collect:
+                self.files[key] = previous
+                continue
+
+            columns = load_transcript(source_path)
+            if columns is None:
+                continue
+            meta = transcript_meta(source_path)
+            teaching_name = meta["teaching_name"]
+            docs = build_file_documents(columns, meta, **self.chunking)
+            if self.collect:
+                self.transcripts.append((teaching_name, meta["filename"], columns))
+                self.chunks.extend(chunk_pairs(teaching_name, docs))
+            # Generator locals live until the next file; without collect keep only the chunks
+            del columns
+            if unchanged:
+                self.files[key] = previous
+                continue
+            chunks, upserts, deletes = diff_file_chunks(teaching_name, docs, previous)
+            self.to_delete.extend(deletes)
+            self.files[key] = {
+                "sha256": digest,
+                "teaching_name": teaching_name,
+                "chunking": self.chunking,
+                "chunks": chunks,
+            }
+            state = "changed" if previous else "new"
+            print(f"{key}: {state}, {len(upserts)} chunks to embed, {len(deletes)} to delete")
+            self.to_upsert += len(upserts)
+            yield from upserts
+
+        for key, previous in self.old_files.items():
+            if key not in self.files:
+                removed = list(previous.get("chunks", {}))
+                self.to_delete.extend(removed)
+                print(f"{key}: removed, {len(removed)} chunks to delete")
+
+
 def main():
     parser = argparse.ArgumentParser(description="Ingest transcripts into Pinecone with adjustable chunking")
-    parser.add_argument("--window-size", type=int, default=5, help="Number of sentences per chunk (default: 5)")
-    parser.add_argument("--step-size", type=int, default=2, help="Sentence stride between chunks (default: 2)")
+    parser.add_argument(
+        "--chunking",
+        choices=["time", "rows"],
+        default=DEFAULT_CHUNKING["strategy"],
+        help="CSV chunking: segments by duration at pauses, or fixed row windows (default: time)",
+    )
+    parser.add_argument(
+        "--target-seconds",
+        type=float,
+        default=DEFAULT_TARGET_SECONDS,
+        help=f"Target segment duration for --chunking time (default: {DEFAULT_TARGET_SECONDS:g})",
+    )
+    parser.add_argument(
+        "--min-pause",
+        type=float,
+        default=DEFAULT_MIN_PAUSE_SECONDS,
+        help=f"Silence in seconds that may end a segment for --chunking time (default: {DEFAULT_MIN_PAUSE_SECONDS:g})",
+    )
+    parser.add_argument("--window-size", type=int, default=5, help="Rows (CSV, --chunking rows) or sentences (TXT) per chunk (default: 5)")
+    parser.add_argument("--step-size", type=int, default=2, help="Row/sentence stride between chunks (default: 2)")
     parser.add_argument("--max-chars", type=int, default=3500, help="Max characters per chunk (default: 3500)")
-    parser.add_argument("--reset-index", action="store_true", help="Delete all existing vectors in the index before ingesting")
+    parser.add_argument(
+        "--reset-index",
+        action="store_true",
+        help="Rebuild everything into a new index generation and switch the app to it once verified",
+    )
+    parser.add_argument(
+        "--backend",
+        choices=["pinecone", "local"],
+        default=os.getenv("VECTOR_BACKEND", "pinecone").strip().lower(),
+        help="Vector index to write: Pinecone, or the local memory-mapped index (default: $VECTOR_BACKEND or pinecone)",
+    )
+    parser.add_argument(
+        "--local-index-dir",
+        default=os.getenv("LOCAL_INDEX_DIR", "index_data"),
+        help="Directory for the local index files when --backend local (default: index_data)",
+    )
+    parser.add_argument(
+        "--manifest",
+        default=DEFAULT_MANIFEST_PATH,
+        help=f"Manifest of ingested file/chunk hashes used for incremental runs (default: {DEFAULT_MANIFEST_PATH})",
+    )
+    parser.add_argument(
+        "--embedding-cache",
+        default=os.getenv("EMBEDDING_CACHE_PATH", DEFAULT_CACHE_PATH),
+        help=f"SQLite embedding cache shared with the app; 'off' disables it (default: {DEFAULT_CACHE_PATH})",
+    )
+    parser.add_argument("--embed-workers", type=int, default=4, help="Concurrent embedding requests (default: 4)")
+    parser.add_argument("--upsert-workers", type=int, default=2, help="Concurrent vector upserts (default: 2)")
+    parser.add_argument(
+        "--max-batch-tokens",
+        type=int,
+        default=DEFAULT_MAX_BATCH_TOKENS,
+        help=f"Tokens per embedding request, counted with tiktoken (default: {DEFAULT_MAX_BATCH_TOKENS})",
+    )
+    parser.add_argument(
+        "--transcript-store",
+        default=os.getenv("TRANSCRIPT_STORE_PATH", DEFAULT_STORE_PATH),
+        help=f"Compiled row-timing store read by the app (default: {DEFAULT_STORE_PATH})",
+    )
+    parser.add_argument(
+        "--lexical-index",
+        default=os.getenv("LEXICAL_INDEX_PATH", DEFAULT_LEXICAL_INDEX_PATH),
+        help=f"Compiled BM25 index for hybrid retrieval (default: {DEFAULT_LEXICAL_INDEX_PATH})",
+    )
+    parser.add_argument(
+        "--index-pointer",
+        default=pointer_location(),
+        help="Pointer record naming the live index generation, a path or gs:// URL (default: $INDEX_POINTER)",
+    )
+    parser.add_argument(
+        "--keep-generations",
+        type=int,
+        default=DEFAULT_KEEP_GENERATIONS,
+        help=f"Retired generations kept for rollback before they are deleted (default: {DEFAULT_KEEP_GENERATIONS})",
+    )
+    parser.add_argument(
+        "--verify-timeout",
+        type=float,
+        default=120.0,
+        help="Seconds to wait for the index's vector count to match the manifest (default: 120)",
+    )
     args = parser.parse_args()
     load_dotenv()
     os.environ["OPENAI_API_KEY"] = os.getenv("OPENAI_API_KEY", "")
@@ -261,57 +523,129 @@ def main():
 
     transcripts_dir = Path.cwd() / "Transcripts"
     index_name = os.getenv("PINECONE_INDEX", "archiveassistanttest")
-
-    ensure_index(index_name)
+    manifest_path = Path(args.manifest)
+    chunking = {"window_size": args.window_size, "step_size": args.step_size, "max_chars": args.max_chars}
+    if args.chunking == "time":
+        chunking.update(strategy="time", target_seconds=args.target_seconds, min_pause=args.min_pause)
+
+    live = read_pointer(args.index_pointer)
+    generation = plan_generation(args, index_name, live)
+    namespace = generation.get("namespace") if generation else None
+    local_index_dir = generation["index_dir"] if generation and args.backend == "local" else args.local_index_dir
+    lexical_path = Path(generation["lexical_index"] if generation else args.lexical_index)
+    if args.backend == "local":
+        target = {"backend": "local", "index": str(Path(local_index_dir).resolve())}
+    else:
+        target = {"backend": "pinecone", "index": index_name}
+        if namespace:
+            target["namespace"] = namespace
+    if generation and args.reset_index:
+        print(f"Building new index generation {generation['generation']}; "
+              f"{live['generation'] if live else 'the current index'} stays live until it is verified.")
+
+    if args.backend == "pinecone":
+        ensure_index(index_name)
+
+    manifest = empty_manifest(target) if args.reset_index else load_manifest(manifest_path, target)
 
     print(f"Loading transcripts from: {transcripts_dir}")
-    documents = build_documents(transcripts_dir, window_size=args.window_size, step_size=args.step_size, max_chars=args.max_chars)
-    if not documents:
+    # Collecting every file's columns and chunks lets the transcript store and
+    # lexical index be built without reading the transcripts again
+    plan = IngestPlan(transcripts_dir, manifest, chunking, collect=True)
+    stream = iter(plan)
+    # Peek one chunk: an exhausted plan means nothing needs embedding, and the
+    # vector store need not be touched unless there is something to delete
+    first = next(stream, None)
+    if first is None and not plan.files:
         print("No documents prepared. Aborting.")
         return
-    print(f"Prepared {len(documents)} chunks. Uploading to Pinecone index '{index_name}'...")
-
-    embeddings = OpenAIEmbeddings(model="text-embedding-3-small")
-    vectorstore = PineconeVectorStore(index_name=index_name, embedding=embeddings)
-
-    if args.reset_index and Pinecone is not None:
-        try:
-            pc = Pinecone(api_key=os.getenv("PINECONE_API_KEY"))
-            index = pc.Index(index_name)
-            # Try both parameter names for compatibility
-            try:
-                index.delete(delete_all=True)
-            except TypeError:
-                index.delete(deleteAll=True)
-            print("Cleared existing vectors from index.")
-        except Exception as e:
-            print(f"Warning: could not clear index: {e}")
-
-    # Batch by approximate token count to avoid 300k token/request limit
-    MAX_TOKENS_PER_BATCH = 200_000
-    MAX_CHARS_PER_BATCH = MAX_TOKENS_PER_BATCH * 4
-
-    batch: List[Document] = []
-    char_sum = 0
-    uploaded = 0
-    for doc in documents:
-        text_len = len(doc.page_content)
-        if batch and char_sum + text_len > MAX_CHARS_PER_BATCH:
-            vectorstore.add_documents(batch)
-            uploaded += len(batch)
-            print(f"Uploaded {uploaded}/{len(documents)}...")
-            batch, char_sum = [], 0
-        batch.append(doc)
-        char_sum += text_len
-
-    if batch:
-        vectorstore.add_documents(batch)
-        uploaded += len(batch)
-        print(f"Uploaded {uploaded}/{len(documents)}...")
+    if first is None and not plan.to_delete and not args.reset_index:
+        save_manifest(manifest_path, {**manifest, "files": plan.files})
+        if not Path(args.transcript_store).exists():
+            build_transcript_store(plan.transcripts, Path(args.transcript_store))
+        if not lexical_path.exists():
+            build_lexical_index(plan.chunks, lexical_path)
+        print(f"{plan.total_chunks} chunks in archive. Index is up to date.")
+        return
+
+    embeddings = cached_embeddings_from_env(
+        OpenAIEmbeddings(model="text-embedding-3-small"), path=args.embedding_cache
+    )
+    if args.backend == "local":
+        from local_vector_store import LocalVectorStore
+
+        print(f"Writing local index to '{local_index_dir}'...")
+        vectorstore = LocalVectorStore(embedding=embeddings, index_dir=local_index_dir)
+    else:
+        print(f"Uploading to Pinecone index '{index_name}'" + (f", namespace '{namespace}'..." if namespace else "..."))
+        vectorstore = PineconeVectorStore(index_name=index_name, embedding=embeddings, namespace=namespace)
+
+    # Files are read and chunked lazily while earlier batches are being embedded;
+    # upserts overlap with the next embeddings
+    ingester = PipelinedIngester(
+        embeddings,
+        make_upsert_fn(vectorstore, namespace),
+        embed_workers=args.embed_workers,
+        # The local index rewrites its files on every write, so keep writes serial
+        upsert_workers=1 if args.backend == "local" else args.upsert_workers,
+        max_batch_tokens=args.max_batch_tokens,
+    )
+    stats = ingester.run(itertools.chain([first] if first is not None else [], stream))
+    first_upsert = stats["first_upsert_seconds"]
+    print(
+        f"Embedded and upserted {stats['uploaded']} chunks in {stats['batches']} batches "
+        f"({stats['seconds']:.1f}s, first upsert after "
+        f"{'-' if first_upsert is None else f'{first_upsert:.1f}s'}, {stats['rate_limited']} rate-limit retries)."
+    )
+    print(f"{plan.total_chunks} chunks in archive: {plan.to_upsert} embedded, {len(plan.to_delete)} to delete.")
+
+    # Remove chunks that no longer exist, after their replacements are live
+    to_delete = plan.to_delete
+    for i in range(0, len(to_delete), DELETE_BATCH_SIZE):
+        vectorstore.delete(ids=to_delete[i : i + DELETE_BATCH_SIZE])
+    if to_delete:
+        print(f"Deleted {len(to_delete)} stale chunks.")
+
+    # Row timing and the lexical index come from the columns and chunks the plan kept
+    build_transcript_store(plan.transcripts, Path(args.transcript_store))
+    build_lexical_index(plan.chunks, lexical_path)
+
+    count = wait_for_vector_count(vectorstore, plan.total_chunks, namespace, timeout=args.verify_timeout)
+    if count != plan.total_chunks:
+        if args.reset_index and generation:
+            # The app keeps serving the live generation; the manifest still describes it
+            raise SystemExit(
+                f"Generation {generation['generation']} holds {count} vectors, expected {plan.total_chunks}; "
+                f"not activating it."
+            )
+        print(f"Warning: index holds {count} vectors, expected {plan.total_chunks}.")
+    else:
+        print(f"Verified {count} vectors in the index.")
+
+    if generation:
+        generation["vector_count"] = count
+        if args.reset_index:
+            record = activate(generation, live, args.index_pointer)
+            print(f"Activated index generation {generation['generation']}; app instances switch on their next poll.")
+            def delete_namespace(ns):
+                vectorstore.index.delete(delete_all=True, namespace=ns)
+
+            # Local generations are directories, which collect_garbage removes itself
+            delete_ns = delete_namespace if args.backend == "pinecone" else None
+            for retired_id in collect_garbage(record, args.keep_generations, delete_ns, args.index_pointer):
+                print(f"Deleted retired index generation {retired_id}.")
+        else:
+            # Same generation updated in place: refresh its count, the app need not switch
+            write_pointer({**live, "vector_count": count}, args.index_pointer)
+    save_manifest(manifest_path, {**manifest, "files": plan.files})
+    if isinstance(embeddings, CachedEmbeddings):
+        stats = embeddings.cache.stats()
+        print(
+            f"Embedding cache: {stats['hits']} hits, {stats['misses']} misses "
+            f"({stats['hit_rate']:.0%} hit rate), {stats['bytes'] / 1e6:.1f} MB"
+        )
     print("Upload complete.")
 
 
 if __name__ == "__main__":
     main()
-
-
@@ -0,0 +1,212 @@
+"""
+Compiled, memory-mapped BM25 inverted index over the ingested chunks.
+
+Embedding similarity is weakest on Henry's own vocabulary ("koan", "true
+person of no rank", "original love"): a question quoting an exact phrase
+often lands on a session that merely talks about something similar. This
+index scores chunks by the words they actually contain, and
+``hybrid_retriever.py`` fuses its ranking with the dense one.
+
+``ingest_transcripts.py`` compiles every chunk into one binary file
+(``index_data/lexical.bin`` by default), using the same chunk ids as the vector
+index, and the app memory-maps it. A query touches only the posting lists of
+its own terms, so scoring the whole archive takes well under a millisecond.
+
+Layout (little-endian, sections 8-byte aligned)::
+
+    header      magic "ALEX", version, chunk/term/posting counts, average
+                chunk length, section offsets and sizes
+    vocab       UTF-8 JSON {term: [first posting, end posting]}
+    postings    uint32[n_postings]   chunk ordinals, grouped by term
+    tfs         uint16[n_postings]   term frequency of each posting
+    lengths     uint32[n_chunks]     terms per chunk
+    offsets     int64[n_chunks + 1]  byte offsets of each chunk record
+    chunks      one UTF-8 JSON record {id, text, metadata} per chunk
+"""
+
+import json
+import math
+import mmap
+import os
+import struct
+import sys
+from array import array
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+from transcript_reader import content_terms
+
+
+MAGIC = b"ALEX"
+VERSION = 1
+DEFAULT_LEXICAL_INDEX_PATH = "index_data/lexical.bin"
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# magic, version, n_chunks, n_terms, n_postings, avg_len, then (offset, size) for the 6 sections
+_HEADER = struct.Struct("<4sIIIQd12Q")
+_MAX_TF = 0xFFFF
+
+
+def _align(n: int) -> int:
+    return (n + 7) & ~7
+
+
+def _le_bytes(arr: array) -> bytes:
+    if sys.byteorder != "little":
+        arr = array(arr.typecode, arr)
+        arr.byteswap()
+    return arr.tobytes()
+
+
+def chunk_terms(text: str) -> List[str]:
+    """Index terms of a chunk; the ``Timestamp:`` header line is not content."""
+    if text.startswith("Timestamp:"):
+        text = text.partition("\n")[2]
+    return content_terms(text)
+
+
+def write_lexical_index(path: Path, chunks: Iterable[Tuple[str, Document]]) -> dict:
+    """Compile (chunk id, Document) pairs into ``path``; returns counts."""
+    postings: Dict[str, List[Tuple[int, int]]] = {}
+    lengths = array("I")
+    offsets = array("q", [0])
+    records: List[bytes] = []
+    pos = 0
+
+    for ordinal, (chunk_id, doc) in enumerate(chunks):
+        terms = chunk_terms(doc.page_content)
+        lengths.append(len(terms))
+        for term, tf in Counter(terms).items():
+            postings.setdefault(term, []).append((ordinal, min(tf, _MAX_TF)))
+        data = (
+            json.dumps({"id": chunk_id, "text": doc.page_content, "metadata": doc.metadata}, ensure_ascii=False)
+            + "\n"
+        ).encode("utf-8")
+        records.append(data)
+        pos += len(data)
+        offsets.append(pos)
+
+    vocab: Dict[str, List[int]] = {}
+    ordinals = array("I")
+    tfs = array("H")
+    for term in sorted(postings):
+        start = len(ordinals)
+        for ordinal, tf in postings[term]:
+            ordinals.append(ordinal)
+            tfs.append(tf)
+        vocab[term] = [start, len(ordinals)]
+
+    n_chunks = len(lengths)
+    avg_len = (sum(lengths) / n_chunks) if n_chunks else 0.0
+    sections = [
+        json.dumps(vocab, ensure_ascii=False, separators=(",", ":")).encode("utf-8"),
+        _le_bytes(ordinals),
+        _le_bytes(tfs),
+        _le_bytes(lengths),
+        _le_bytes(offsets),
+        b"".join(records),
+    ]
+
+    layout = []
+    cursor = _align(_HEADER.size)
+    for data in sections:
+        layout.extend([cursor, len(data)])
+        cursor = _align(cursor + len(data))
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    with tmp.open("wb") as f:
+        f.write(_HEADER.pack(MAGIC, VERSION, n_chunks, len(vocab), len(ordinals), avg_len, *layout))
+        for (offset, _), data in zip(zip(layout[::2], layout[1::2]), sections):
+            f.seek(offset)
+            f.write(data)
+        f.truncate(cursor)
+    os.replace(tmp, path)
+    return {"chunks": n_chunks, "terms": len(vocab), "postings": len(ordinals), "bytes": cursor}
+
+
+class LexicalIndex:
+    """Read-only BM25 search over a compiled lexical index file."""
+
+    def __init__(self, path: str = DEFAULT_LEXICAL_INDEX_PATH):
+        self.path = Path(path)
+        with self.path.open("rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, n_chunks, n_terms, n_postings, avg_len, *layout = _HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{self.path} is not a version {VERSION} lexical index")
+        if sys.byteorder != "little":
+            raise ValueError("Lexical index can only be memory-mapped on little-endian hosts")
+
+        def section(i: int, dtype, count: int) -> np.ndarray:
+            return np.frombuffer(self._mmap, dtype=dtype, count=count, offset=layout[2 * i])
+
+        vocab_offset, vocab_size = layout[0], layout[1]
+        self._vocab: Dict[str, List[int]] = json.loads(self._mmap[vocab_offset : vocab_offset + vocab_size])
+        self._postings = section(1, np.uint32, n_postings)
+        self._tfs = section(2, np.uint16, n_postings)
+        lengths = section(3, np.uint32, n_chunks)
+        self._offsets = section(4, np.int64, n_chunks + 1)
+        self._chunks_offset = layout[10]
+        self.n_chunks = n_chunks
+        self.n_terms = n_terms
+
+        # The length part of the BM25 denominator depends only on the chunk
+        if avg_len:
+            self._norm = (BM25_K1 * (1 - BM25_B + BM25_B * lengths / avg_len)).astype(np.float32)
+        else:
+            self._norm = np.full(n_chunks, BM25_K1, dtype=np.float32)
+
+    def __len__(self) -> int:
+        return self.n_chunks
+
+    def document(self, ordinal: int) -> Document:
+        start = self._chunks_offset + int(self._offsets[ordinal])
+        end = self._chunks_offset + int(self._offsets[ordinal + 1])
+        rec = json.loads(self._mmap[start:end])
+        return Document(id=rec["id"], page_content=rec["text"], metadata=rec.get("metadata") or {})
+
+    def scores(self, query: str) -> np.ndarray:
+        """BM25 score of every chunk for ``query`` (zero where no term matches)."""
+        scores = np.zeros(self.n_chunks, dtype=np.float32)
+        for term in set(content_terms(query)):
+            span = self._vocab.get(term)
+            if span is None:
+                continue
+            start, end = span
+            ordinals = self._postings[start:end]
+            tf = self._tfs[start:end].astype(np.float32)
+            df = end - start
+            idf = math.log(1 + (self.n_chunks - df + 0.5) / (df + 0.5))
+            # Each chunk appears at most once per posting list, so fancy-index += is exact
+            scores[ordinals] += idf * tf * (BM25_K1 + 1) / (tf + self._norm[ordinals])
+        return scores
+
+    def search(self, query: str, k: int = 10) -> List[Tuple[Document, float]]:
+        """Top ``k`` chunks by BM25 score, best first."""
+        if not self.n_chunks or k <= 0:
+            return []
+        scores = self.scores(query)
+        k = min(k, self.n_chunks)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(self.document(int(i)), float(scores[i])) for i in top if scores[i] > 0]
+
+
+def open_lexical_index(path: Optional[str] = None) -> Optional[LexicalIndex]:
+    """Memory-map the index at ``path`` (or $LEXICAL_INDEX_PATH); None if unavailable."""
+    path = path or os.getenv("LEXICAL_INDEX_PATH", DEFAULT_LEXICAL_INDEX_PATH)
+    if not os.path.exists(path):
+        return None
+    try:
+        return LexicalIndex(path)
+    except Exception as e:  # noqa: BLE001
+        print(f"Could not open lexical index {path}: {e}")
+        return None
@@ -0,0 +1,341 @@
+"""
+In-process vector index used as a drop-in alternative to PineconeVectorStore.
+
+All chunk embeddings live in one contiguous, L2-normalised float32 matrix on
+disk (``embeddings.f32``) that is memory-mapped at startup, with the chunk text
+and metadata alongside it in ``chunks.jsonl``. Similarity search and MMR are a
+handful of vectorised matrix products, so at archive scale (a few thousand
+chunks) retrieval needs no network round trip at all.
+
+The files are written by ``ingest_transcripts.py --backend local`` and read by
+``app.py`` when ``VECTOR_BACKEND=local``.
+"""
+
+import json
+import os
+import uuid
+from pathlib import Path
+from typing import Any, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from langchain.schema import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+
+DEFAULT_INDEX_DIR = "index_data"
+EMBEDDINGS_FILE = "embeddings.f32"
+CHUNKS_FILE = "chunks.jsonl"
+META_FILE = "index_meta.json"
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).astype(np.float32, copy=False)
+
+
+def _matches_filter(metadata: dict, flt: Optional[dict]) -> bool:
+    if not flt:
+        return True
+    for key, expected in flt.items():
+        if isinstance(expected, dict) and "$eq" in expected:
+            expected = expected["$eq"]
+        if metadata.get(key) != expected:
+            return False
+    return True
+
+
+class LocalVectorStore(VectorStore):
+    """Cosine-similarity vector store over a memory-mapped float32 matrix."""
+
+    def __init__(self, embedding: Embeddings, index_dir: str = DEFAULT_INDEX_DIR):
+        self._embedding = embedding
+        self.index_dir = Path(index_dir)
+        self._ids: List[str] = []
+        self._texts: List[str] = []
+        self._metadatas: List[dict] = []
+        self._matrix = np.zeros((0, 0), dtype=np.float32)
+        self._load()
+
+    # ------------------------------------------------------------------
+    # Storage
+    # ------------------------------------------------------------------
+    @property
+    def embeddings(self) -> Embeddings:
+        return self._embedding
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def _load(self) -> None:
+        meta_path = self.index_dir / META_FILE
+        if not meta_path.exists():
+            return
+        meta = json.loads(meta_path.read_text(encoding="utf-8"))
+        count = int(meta.get("count", 0))
+        dim = int(meta.get("dimension", 0))
+
+        ids: List[str] = []
+        texts: List[str] = []
+        metadatas: List[dict] = []
+        with (self.index_dir / CHUNKS_FILE).open("r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                rec = json.loads(line)
+                ids.append(rec["id"])
+                texts.append(rec["text"])
+                metadatas.append(rec.get("metadata") or {})
+        if len(ids) != count:
+            raise ValueError(
+                f"Local index at {self.index_dir} is inconsistent: {count} vectors but {len(ids)} chunks"
+            )
+
+        self._ids, self._texts, self._metadatas = ids, texts, metadatas
+        if count and dim:
+            self._matrix = np.memmap(
+                self.index_dir / EMBEDDINGS_FILE, dtype=np.float32, mode="r", shape=(count, dim)
+            )
+        else:
+            self._matrix = np.zeros((0, dim), dtype=np.float32)
+
+    def _write(self, ids: List[str], texts: List[str], metadatas: List[dict], matrix: np.ndarray) -> None:
+        """Atomically replace the on-disk index and re-map it."""
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        emb_tmp = self.index_dir / (EMBEDDINGS_FILE + ".tmp")
+        chunks_tmp = self.index_dir / (CHUNKS_FILE + ".tmp")
+        meta_tmp = self.index_dir / (META_FILE + ".tmp")
+
+        np.ascontiguousarray(matrix, dtype=np.float32).tofile(emb_tmp)
+        with chunks_tmp.open("w", encoding="utf-8") as f:
+            for id_, text, md in zip(ids, texts, metadatas):
+                f.write(json.dumps({"id": id_, "text": text, "metadata": md}, ensure_ascii=False) + "\n")
+        meta = {
+            "count": len(ids),
+            "dimension": int(matrix.shape[1]) if matrix.ndim == 2 else 0,
+            "model": getattr(self._embedding, "model", None),
+        }
+        meta_tmp.write_text(json.dumps(meta), encoding="utf-8")
+
+        # Drop our own mapping before the files underneath it are replaced
+        self._matrix = np.zeros((0, 0), dtype=np.float32)
+        os.replace(emb_tmp, self.index_dir / EMBEDDINGS_FILE)
+        os.replace(chunks_tmp, self.index_dir / CHUNKS_FILE)
+        os.replace(meta_tmp, self.index_dir / META_FILE)
+        self._load()
+
+    def add_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: Optional[List[dict]] = None,
+        ids: Optional[List[str]] = None,
+        **kwargs: Any,
+    ) -> List[str]:
+        texts = list(texts)
+        if not texts:
+            return []
+        metadatas = list(metadatas) if metadatas is not None else [{} for _ in texts]
+        ids = list(ids) if ids is not None else [str(uuid.uuid4()) for _ in texts]
+        vectors = _normalize_rows(np.asarray(self._embedding.embed_documents(texts), dtype=np.float32))
+        return self.add_embeddings(texts, vectors, metadatas=metadatas, ids=ids)
+
+    def add_embeddings(
+        self,
+        texts: List[str],
+        vectors: np.ndarray,
+        metadatas: Optional[List[dict]] = None,
+        ids: Optional[List[str]] = None,
+    ) -> List[str]:
+        """Add pre-computed vectors. Existing ids are overwritten in place."""
+        metadatas = list(metadatas) if metadatas is not None else [{} for _ in texts]
+        ids = list(ids) if ids is not None else [str(uuid.uuid4()) for _ in texts]
+        vectors = _normalize_rows(np.asarray(vectors, dtype=np.float32))
+
+        replaced = set(ids)
+        keep = [i for i, id_ in enumerate(self._ids) if id_ not in replaced]
+        old = np.asarray(self._matrix[keep]) if len(self._ids) else np.zeros((0, vectors.shape[1]), dtype=np.float32)
+        matrix = np.vstack([old, vectors]) if len(old) else vectors
+        self._write(
+            [self._ids[i] for i in keep] + ids,
+            [self._texts[i] for i in keep] + list(texts),
+            [self._metadatas[i] for i in keep] + metadatas,
+            matrix,
+        )
+        return ids
+
+    def delete(self, ids: Optional[List[str]] = None, delete_all: bool = False, **kwargs: Any) -> Optional[bool]:
+        if delete_all:
+            dim = self._matrix.shape[1] if self._matrix.ndim == 2 else 0
+            self._write([], [], [], np.zeros((0, dim), dtype=np.float32))
+            return True
+        if not ids:
+            return False
+        drop = set(ids)
+        keep = [i for i, id_ in enumerate(self._ids) if id_ not in drop]
+        if len(keep) == len(self._ids):
+            return False
+        self._write(
+            [self._ids[i] for i in keep],
+            [self._texts[i] for i in keep],
+            [self._metadatas[i] for i in keep],
+            np.asarray(self._matrix[keep]),
+        )
+        return True
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: List[str],
+        embedding: Embeddings,
+        metadatas: Optional[List[dict]] = None,
+        ids: Optional[List[str]] = None,
+        index_dir: str = DEFAULT_INDEX_DIR,
+        **kwargs: Any,
+    ) -> "LocalVectorStore":
+        store = cls(embedding=embedding, index_dir=index_dir)
+        store.add_texts(texts, metadatas=metadatas, ids=ids)
+        return store
+
+    # ------------------------------------------------------------------
+    # Search
+    # ------------------------------------------------------------------
+    def _embed_query(self, query: str) -> np.ndarray:
+        vec = np.asarray(self._embedding.embed_query(query), dtype=np.float32)
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm else vec
+
+    def _candidate_rows(self, flt: Optional[dict]) -> Optional[np.ndarray]:
+        if not flt:
+            return None
+        return np.fromiter(
+            (i for i, md in enumerate(self._metadatas) if _matches_filter(md, flt)), dtype=np.int64
+        )
+
+    def _top_k(self, query_vec: np.ndarray, k: int, flt: Optional[dict] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (row indices, cosine scores) of the k best rows, best first."""
+        if not len(self._ids) or k <= 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        rows = self._candidate_rows(flt)
+        scores = self._matrix @ query_vec if rows is None else self._matrix[rows] @ query_vec
+        k = min(k, scores.shape[0])
+        if k < scores.shape[0]:
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(scores.shape[0])
+        top = top[np.argsort(-scores[top], kind="stable")]
+        picked = top if rows is None else rows[top]
+        return picked, scores[top]
+
+    def _doc(self, row: int) -> Document:
+        md = dict(self._metadatas[row])
+        md.setdefault("id", self._ids[row])
+        return Document(page_content=self._texts[row], metadata=md)
+
+    def similarity_search_by_vector_with_score(
+        self, embedding: List[float], k: int = 4, filter: Optional[dict] = None, **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        vec = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vec)
+        if norm:
+            vec = vec / norm
+        rows, scores = self._top_k(vec, k, filter)
+        return [(self._doc(int(r)), float(s)) for r, s in zip(rows, scores)]
+
+    def similarity_search_by_vector(
+        self, embedding: List[float], k: int = 4, filter: Optional[dict] = None, **kwargs: Any
+    ) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_by_vector_with_score(embedding, k, filter)]
+
+    def similarity_search_with_score(
+        self, query: str, k: int = 4, filter: Optional[dict] = None, **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        rows, scores = self._top_k(self._embed_query(query), k, filter)
+        return [(self._doc(int(r)), float(s)) for r, s in zip(rows, scores)]
+
+    def similarity_search(
+        self, query: str, k: int = 4, filter: Optional[dict] = None, **kwargs: Any
+    ) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, filter)]
+
+    def _select_relevance_score_fn(self):
+        # Scores are already cosine similarities; map [-1, 1] onto [0, 1]
+        return lambda score: (score + 1.0) / 2.0
+
+    def max_marginal_relevance_search_by_vector(
+        self,
+        embedding: List[float],
+        k: int = 4,
+        fetch_k: int = 20,
+        lambda_mult: float = 0.5,
+        filter: Optional[dict] = None,
+        **kwargs: Any,
+    ) -> List[Document]:
+        vec = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vec)
+        if norm:
+            vec = vec / norm
+        rows, query_sims = self._top_k(vec, fetch_k, filter)
+        if not len(rows):
+            return []
+
+        candidates = np.asarray(self._matrix[rows])
+        pairwise = candidates @ candidates.T
+        k = min(k, len(rows))
+
+        selected = [0]  # the best match always goes first
+        max_sim = pairwise[:, 0].copy()
+        chosen = np.zeros(len(rows), dtype=bool)
+        chosen[0] = True
+        while len(selected) < k:
+            mmr = lambda_mult * query_sims - (1.0 - lambda_mult) * max_sim
+            mmr[chosen] = -np.inf
+            nxt = int(np.argmax(mmr))
+            selected.append(nxt)
+            chosen[nxt] = True
+            np.maximum(max_sim, pairwise[:, nxt], out=max_sim)
+        return [self._doc(int(rows[i])) for i in selected]
+
+    def max_marginal_relevance_search(
+        self,
+        query: str,
+        k: int = 4,
+        fetch_k: int = 20,
+        lambda_mult: float = 0.5,
+        filter: Optional[dict] = None,
+        **kwargs: Any,
+    ) -> List[Document]:
+        return self.max_marginal_relevance_search_by_vector(
+            self._embed_query(query), k=k, fetch_k=fetch_k, lambda_mult=lambda_mult, filter=filter
+        )
+
+    # Async search: only the query embedding does I/O; the matrix work takes
+    # microseconds and runs inline instead of on an executor thread
+    async def _aembed_query(self, query: str) -> np.ndarray:
+        vec = np.asarray(await self._embedding.aembed_query(query), dtype=np.float32)
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm else vec
+
+    async def asimilarity_search_with_score(
+        self, query: str, k: int = 4, filter: Optional[dict] = None, **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        return self.similarity_search_by_vector_with_score(await self._aembed_query(query), k, filter)
+
+    async def asimilarity_search(
+        self, query: str, k: int = 4, filter: Optional[dict] = None, **kwargs: Any
+    ) -> List[Document]:
+        return [doc for doc, _ in await self.asimilarity_search_with_score(query, k, filter)]
+
+    async def amax_marginal_relevance_search(
+        self,
+        query: str,
+        k: int = 4,
+        fetch_k: int = 20,
+        lambda_mult: float = 0.5,
+        filter: Optional[dict] = None,
+        **kwargs: Any,
+    ) -> List[Document]:
+        return self.max_marginal_relevance_search_by_vector(
+            await self._aembed_query(query), k=k, fetch_k=fetch_k, lambda_mult=lambda_mult, filter=filter
+        )
@@ -0,0 +1,277 @@
+"""
+Per-stage latency, token and error metrics for the chat routes.
+
+Stages (``embed``, ``retrieve``, ``llm``, ``align``, ``serialize``) are timed
+into fixed-bucket histograms and rendered at ``/metrics`` in the Prometheus
+text exposition format. The stages of the current request are also kept in a
+``ContextVar`` so the app can report them in a ``Server-Timing`` header.
+
+Stages do not overlap. The retriever embeds the query (``embed``) and, in
+hybrid mode, searches BM25 (``lexical``) inside its own run; that nested
+time is subtracted from ``retrieve``, which is left with the vector search
+and fusion. Summing a request's stages therefore never counts a span twice.
+
+Recording a sample is one ``perf_counter`` pair, a bisect and a short locked
+update, so instrumentation stays off the hot path's budget. Metrics are per
+process; scrape every worker (or sum across them) under multi-worker servers.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.embeddings import Embeddings
+
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{str(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels: Sequence[str] = (), amount: float = 1) -> None:
+        key = tuple(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, labels: Sequence[str] = ()) -> float:
+        return self._values.get(tuple(labels), 0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_labels(self.label_names, key)} {value:g}")
+        return lines
+
+
+class Histogram:
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        label_names: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [bucket counts..., +Inf count], sum
+        self._series: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels: Sequence[str], value: float) -> None:
+        key = tuple(labels)
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = ([0] * (len(self.buckets) + 1), [0.0])
+            series[0][i] += 1
+            series[1][0] += value
+
+    def count(self, labels: Sequence[str] = ()) -> int:
+        series = self._series.get(tuple(labels))
+        return sum(series[0]) if series else 0
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((k, (list(c), s[0])) for k, (c, s) in self._series.items())
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                le = 'le="%g"' % bound
+                lines.append(f"{self.name}_bucket{_labels(self.label_names, key, le)} {cumulative}")
+            cumulative += counts[-1]
+            le = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{_labels(self.label_names, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, key)} {total:.6f}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, key)} {cumulative}")
+        return lines
+
+
+STAGE_SECONDS = Histogram("archive_stage_seconds", "Seconds spent per chat request stage", ("stage",))
+REQUEST_SECONDS = Histogram("archive_request_seconds", "End-to-end seconds per request", ("route", "status"))
+LLM_TOKENS = Counter("archive_llm_tokens_total", "LLM tokens used by chat answers", ("kind",))
+ERRORS = Counter("archive_errors_total", "Errors by chat request stage", ("stage",))
+CACHE_HITS = Counter("archive_answer_cache_hits_total", "Chat requests answered from the answer cache")
+COALESCED = Counter("archive_coalesced_requests_total", "Chat requests that joined an identical in-flight question")
+
+REGISTRY = (STAGE_SECONDS, REQUEST_SECONDS, LLM_TOKENS, ERRORS, CACHE_HITS, COALESCED)
+
+
+def render_metrics() -> str:
+    lines: List[str] = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# ----------------------------------------------------------------------
+# Per-request stage timings
+# ----------------------------------------------------------------------
+_request_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("request_timings", default=None)
+
+
+def start_request() -> Dict[str, float]:
+    """Begin collecting stage timings for the request running in this context."""
+    timings: Dict[str, float] = {}
+    _request_timings.set(timings)
+    return timings
+
+
+# Stages timed inside a retriever run, and so excluded from ``retrieve``
+NESTED_IN_RETRIEVE = ("embed", "lexical")
+
+
+def _nested_retrieve_seconds() -> Optional[float]:
+    """Time the current request has spent in ``NESTED_IN_RETRIEVE`` stages so far."""
+    timings = _request_timings.get()
+    if timings is None:
+        return None
+    return sum(timings.get(name, 0.0) for name in NESTED_IN_RETRIEVE)
+
+
+def record_stage(name: str, seconds: float) -> None:
+    STAGE_SECONDS.observe((name,), seconds)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings[name] = timings.get(name, 0.0) + seconds
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Time the enclosed block as one ``name`` stage; exceptions count as errors."""
+    started = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        ERRORS.inc((name,))
+        raise
+    finally:
+        record_stage(name, time.perf_counter() - started)
+
+
+def server_timing(timings: Dict[str, float], total: Optional[float] = None) -> str:
+    """``Server-Timing`` header value (milliseconds) for a request's stages."""
+    parts = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in timings.items()]
+    if total is not None:
+        parts.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(parts)
+
+
+# ----------------------------------------------------------------------
+# LangChain hooks
+# ----------------------------------------------------------------------
+class StageTimingHandler(BaseCallbackHandler):
+    """Times the chain's retriever and LLM runs and counts LLM tokens."""
+
+    def __init__(self):
+        self._started: Dict[object, float] = {}
+        self._nested_at_start: Dict[object, Optional[float]] = {}
+        self._streamed: Dict[object, int] = {}
+
+    def _start(self, run_id) -> None:
+        self._started[run_id] = time.perf_counter()
+
+    def _finish(self, run_id, name: str, failed: bool = False, nested: float = 0.0) -> None:
+        started = self._started.pop(run_id, None)
+        if started is not None:
+            record_stage(name, max(0.0, time.perf_counter() - started - nested))
+        if failed:
+            ERRORS.inc((name,))
+
+    def _retriever_nested(self, run_id) -> float:
+        """Seconds of embed/lexical stages recorded since this retriever run started."""
+        before = self._nested_at_start.pop(run_id, None)
+        after = _nested_retrieve_seconds()
+        return after - before if before is not None and after is not None else 0.0
+
+    def on_retriever_start(self, serialized, query, *, run_id, parent_run_id=None, **kwargs):
+        # A retriever wrapped by another (hybrid retrieval) is part of the outer run's time
+        if parent_run_id not in self._started:
+            self._start(run_id)
+            self._nested_at_start[run_id] = _nested_retrieve_seconds()
+
+    def on_retriever_end(self, documents, *, run_id, **kwargs):
+        self._finish(run_id, "retrieve", nested=self._retriever_nested(run_id))
+
+    def on_retriever_error(self, error, *, run_id, **kwargs):
+        self._finish(run_id, "retrieve", failed=True, nested=self._retriever_nested(run_id))
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self._start(run_id)
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        self._start(run_id)
+
+    def on_llm_new_token(self, token, *, run_id, **kwargs):
+        self._streamed[run_id] = self._streamed.get(run_id, 0) + 1
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        self._finish(run_id, "llm")
+        streamed = self._streamed.pop(run_id, 0)
+        usage = None
+        try:
+            usage = response.generations[0][0].message.usage_metadata
+        except (AttributeError, IndexError):
+            pass
+        if not usage:
+            usage = (response.llm_output or {}).get("token_usage") or {}
+        prompt = usage.get("input_tokens", usage.get("prompt_tokens", 0))
+        completion = usage.get("output_tokens", usage.get("completion_tokens", 0)) or streamed
+        LLM_TOKENS.inc(("prompt",), prompt)
+        LLM_TOKENS.inc(("completion",), completion)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._streamed.pop(run_id, None)
+        self._finish(run_id, "llm", failed=True)
+
+
+class TimedEmbeddings(Embeddings):
+    """Records every embedding call as an ``embed`` stage."""
+
+    def __init__(self, underlying: Embeddings):
+        self.underlying = underlying
+
+    def __getattr__(self, name):
+        # model / dimensions / cache of the wrapped embeddings
+        if name == "underlying":
+            raise AttributeError(name)
+        return getattr(self.underlying, name)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        with stage("embed"):
+            return self.underlying.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        with stage("embed"):
+            return self.underlying.embed_query(text)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        with stage("embed"):
+            return await self.underlying.aembed_documents(texts)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        with stage("embed"):
+            return await self.underlying.aembed_query(text)
@@ -0,0 +1,175 @@
+"""
+Quote-to-transcript alignment over a word-shingle index.
+
+Every transcript row in the compiled ``TranscriptStore`` is tokenised into one
+word stream per teaching, and every run of ``SHINGLE`` consecutive words is
+encoded as a single int64 key. The keys are sorted once, so looking up all the
+shingles of a quote is one vectorised ``searchsorted``.
+
+Each shingle hit votes for a diagonal (corpus position minus quote position).
+Hits from the real source line up on (nearly) the same diagonal even when the
+quote skips or repeats a few words, so the densest diagonal band gives the
+contiguous span of rows the quote came from, and with it exact start/end
+seconds. The work per quote depends on the quote length, not on how many
+chunks were retrieved.
+"""
+
+import re
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+import numpy as np
+
+from transcript_store import TranscriptStore
+
+
+SHINGLE = 3
+# Shingles occurring more often than this are phrases like "you know what",
+# which say nothing about where a quote came from
+MAX_POSTINGS = 64
+# Hits whose diagonal is within this many words of the best one belong to the
+# same alignment (tolerates words the LLM dropped or inserted)
+MAX_DRIFT = 24
+MIN_HITS = 2
+
+_WORD_RE = re.compile(r"[a-z0-9]+(?:'[a-z0-9]+)?")
+_QUOTE_RE = re.compile(r"Henry's Quote:\s*[\"“]?(.+?)(?:[\"”]\s*$|\Z)", re.DOTALL)
+_BITS = 21  # 3 x 21-bit vocabulary ids fit in one int64 key
+
+
+def tokenize(text: str) -> List[str]:
+    return _WORD_RE.findall(text.lower().replace("’", "'"))
+
+
+def extract_quote(response: str) -> str:
+    """The quoted passage from a Teaching/Timestamp/Henry's Quote response."""
+    m = _QUOTE_RE.search(response)
+    if m:
+        return m.group(1).strip()
+    lines = [ln for ln in response.splitlines() if not re.match(r"\s*(Teaching|Timestamp):", ln)]
+    return "\n".join(lines).strip()
+
+
+class Alignment(NamedTuple):
+    teaching_id: int
+    teaching_name: str
+    filename: str
+    row_start: int
+    row_end: int  # inclusive
+    start_seconds: Optional[float]
+    end_seconds: Optional[float]
+    score: float  # fraction of the quote's shingles found on the winning diagonal
+
+
+class QuoteAligner:
+    """Shingle index over all rows of a TranscriptStore."""
+
+    def __init__(self, store: TranscriptStore):
+        self.store = store
+        self.vocab: Dict[str, int] = {}
+
+        token_ids: List[int] = []
+        token_rows: List[int] = []
+        token_teachings: List[int] = []
+        for teaching_id, teaching in enumerate(store.teachings):
+            for row in range(teaching["row_start"], teaching["row_end"]):
+                for word in tokenize(store.row_text(row)):
+                    token_ids.append(self.vocab.setdefault(word, len(self.vocab) + 1))
+                    token_rows.append(row)
+                    token_teachings.append(teaching_id)
+
+        if len(self.vocab) >= 1 << _BITS:
+            raise ValueError(f"Vocabulary of {len(self.vocab)} words is too large for {_BITS}-bit shingle keys")
+
+        ids = np.asarray(token_ids, dtype=np.int64)
+        self.token_rows = np.asarray(token_rows, dtype=np.int32)
+        self.token_teachings = np.asarray(token_teachings, dtype=np.int32)
+
+        keys = self._shingle_keys(ids)
+        if len(keys):
+            # A shingle must not straddle two teachings
+            crosses = self.token_teachings[: len(keys)] != self.token_teachings[SHINGLE - 1 :]
+            keys[crosses] = -1
+        order = np.argsort(keys, kind="stable")
+        self._keys = keys[order]
+        self._positions = order.astype(np.int64)
+
+    @staticmethod
+    def _shingle_keys(ids: np.ndarray) -> np.ndarray:
+        if len(ids) < SHINGLE:
+            return np.zeros(0, dtype=np.int64)
+        n = len(ids) - SHINGLE + 1
+        keys = np.zeros(n, dtype=np.int64)
+        for k in range(SHINGLE):
+            keys = (keys << _BITS) | ids[k : k + n]
+        return keys
+
+    def align(self, quote: str, teaching_ids: Optional[Iterable[int]] = None) -> Optional[Alignment]:
+        """Locate the contiguous row span that best matches ``quote``.
+
+        ``teaching_ids`` optionally restricts the search, e.g. to the teachings
+        of the retrieved source documents.
+        """
+        words = tokenize(quote)
+        # Words never seen in any transcript get id 0 and can't match
+        ids = np.asarray([self.vocab.get(w, 0) for w in words], dtype=np.int64)
+        keys = self._shingle_keys(ids)
+        if not len(keys):
+            return None
+        usable = np.ones(len(keys), dtype=bool)
+        for k in range(SHINGLE):
+            usable &= ids[k : k + len(keys)] > 0
+
+        lo = np.searchsorted(self._keys, keys, side="left")
+        hi = np.searchsorted(self._keys, keys, side="right")
+        counts = hi - lo
+        usable &= (counts > 0) & (counts <= MAX_POSTINGS)
+        if not usable.any():
+            return None
+
+        quote_pos = np.nonzero(usable)[0]
+        positions = np.concatenate([self._positions[lo[j] : hi[j]] for j in quote_pos])
+        offsets = np.repeat(quote_pos, counts[quote_pos])
+
+        if teaching_ids is not None:
+            allowed = np.isin(self.token_teachings[positions], np.fromiter(teaching_ids, dtype=np.int32))
+            positions, offsets = positions[allowed], offsets[allowed]
+            if not len(positions):
+                return None
+
+        # Vote for diagonals, bucketed so small drift still lands together
+        diagonals = positions - offsets
+        buckets, inverse, votes = np.unique(diagonals // MAX_DRIFT, return_inverse=True, return_counts=True)
+        # Credit neighbouring buckets too, since a drifting quote spans two
+        smoothed = votes.copy()
+        adjacent = np.diff(buckets) == 1
+        smoothed[:-1] += np.where(adjacent, votes[1:], 0)
+        smoothed[1:] += np.where(adjacent, votes[:-1], 0)
+        best = int(np.argmax(smoothed))
+        centre = np.median(diagonals[inverse == best])
+
+        on_diagonal = np.abs(diagonals - centre) <= MAX_DRIFT
+        hits, hit_offsets = positions[on_diagonal], offsets[on_diagonal]
+
+        # Only the teaching holding most of the hits
+        teachings = self.token_teachings[hits]
+        teaching_id = int(np.bincount(teachings).argmax())
+        same = teachings == teaching_id
+        hits, hit_offsets = hits[same], hit_offsets[same]
+        if len(hits) < MIN_HITS:
+            return None
+
+        first_row = int(self.token_rows[hits.min()])
+        last_row = int(self.token_rows[hits.max() + SHINGLE - 1])
+        start_seconds, _ = self.store.row_timing(first_row)
+        _, end_seconds = self.store.row_timing(last_row)
+        teaching = self.store.teachings[teaching_id]
+        return Alignment(
+            teaching_id=teaching_id,
+            teaching_name=teaching["name"],
+            filename=teaching["filename"],
+            row_start=first_row,
+            row_end=last_row,
+            start_seconds=start_seconds,
+            end_seconds=end_seconds,
+            score=len(np.unique(hit_offsets)) / len(keys),
+        )
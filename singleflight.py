@@ -0,0 +1,106 @@
+"""
+Request coalescing ("singleflight") for identical in-flight questions.
+
+When many people ask the same question at once, only the first request (the
+leader) runs retrieval and the LLM. Requests arriving while it is in flight
+join it and receive the same result, without a persistent cache.
+
+Each flight is a ``Broadcast``: an append-only list of ``(event, data)`` pairs
+that every joined request replays from the start and then follows live. That
+way a streaming follower gets the leader's tokens as they are generated, and a
+plain ``/chat`` follower simply waits for the final ``done`` event. The flight
+is forgotten as soon as it finishes; later requests start a new one.
+"""
+
+import threading
+from typing import Any, Callable, Dict, Hashable, Iterator, List, Tuple
+
+
+class Broadcast:
+    """Append-only event log that any number of readers follow from the start."""
+
+    def __init__(self):
+        self._events: List[Tuple[str, Any]] = []
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def publish(self, event: str, data: Any = None) -> None:
+        with self._cond:
+            self._events.append((event, data))
+            self._cond.notify_all()
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def __iter__(self) -> Iterator[Tuple[str, Any]]:
+        seen = 0
+        while True:
+            with self._cond:
+                while seen >= len(self._events) and not self._closed:
+                    self._cond.wait()
+                batch = self._events[seen:]
+                seen = len(self._events)
+                if not batch:
+                    return
+            yield from batch
+
+    def result(self) -> Any:
+        """Block until the flight ends; the ``done`` payload, or raise its ``error``."""
+        for event, data in self:
+            if event == "done":
+                return data
+            if event == "error":
+                raise data if isinstance(data, BaseException) else RuntimeError(str(data))
+        raise RuntimeError("Flight ended without a result")
+
+
+class SingleFlight:
+    """Coalesces concurrent work on equal keys into one in-flight computation."""
+
+    def __init__(self):
+        self._flights: Dict[Hashable, Broadcast] = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.followers = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"in_flight": len(self._flights), "leaders": self.leaders, "followers": self.followers}
+
+    def join(self, key: Hashable) -> Tuple[Broadcast, bool]:
+        """The flight for ``key`` and whether the caller leads it.
+
+        A leader must publish the flight's events and then call ``finish``.
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                self.followers += 1
+                return flight, False
+            flight = self._flights[key] = Broadcast()
+            self.leaders += 1
+            return flight, True
+
+    def finish(self, key: Hashable, flight: Broadcast) -> None:
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+        flight.close()
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """Run ``fn`` once per concurrent ``key``; returns (result, shared)."""
+        flight, leader = self.join(key)
+        if not leader:
+            return flight.result(), True
+        try:
+            result = fn()
+        except BaseException as e:
+            flight.publish("error", e)
+            raise
+        else:
+            flight.publish("done", result)
+            return result, False
+        finally:
+            self.finish(key, flight)
@@ -14,36 +14,41 @@ function addMessage(content, isUser = false, videoUrl = null, videoTimestamp = n
     
     // Add video player if video URL is provided
     if (videoUrl && !isUser) {
-        const videoContainer = document.createElement('div');
-        videoContainer.className = 'video-container';
-        
-        const videoElement = document.createElement('video');
-        videoElement.src = videoUrl;
-        videoElement.controls = true;
-        videoElement.className = 'video-clip';
-        videoElement.preload = 'metadata';
-        
-        // If timestamp is provided, seek to that position when video loads
-        if (videoTimestamp !== null && videoTimestamp > 0) {
-            videoElement.addEventListener('loadedmetadata', () => {
-                videoElement.currentTime = videoTimestamp;
-            });
-        }
-        
-        const videoLabel = document.createElement('div');
-        videoLabel.className = 'video-label';
-        const timestampText = videoTimestamp ? ` (starts at ${formatTime(videoTimestamp)})` : '';
-        videoLabel.textContent = `🎬 Video teaching from Henry Shukman${timestampText}`;
-        
-        videoContainer.appendChild(videoLabel);
-        videoContainer.appendChild(videoElement);
-        messageDiv.appendChild(videoContainer);
+        attachVideo(messageDiv, videoUrl, videoTimestamp);
     }
     
     chatMessages.appendChild(messageDiv);
     
     // Scroll to bottom
     chatMessages.scrollTop = chatMessages.scrollHeight;
+    return messageDiv;
+}
+
+function attachVideo(messageDiv, videoUrl, videoTimestamp = null) {
+    const videoContainer = document.createElement('div');
+    videoContainer.className = 'video-container';
+    
+    const videoElement = document.createElement('video');
+    videoElement.src = videoUrl;
+    videoElement.controls = true;
+    videoElement.className = 'video-clip';
+    videoElement.preload = 'metadata';
+    
+    // If timestamp is provided, seek to that position when video loads
+    if (videoTimestamp !== null && videoTimestamp > 0) {
+        videoElement.addEventListener('loadedmetadata', () => {
+            videoElement.currentTime = videoTimestamp;
+        });
+    }
+    
+    const videoLabel = document.createElement('div');
+    videoLabel.className = 'video-label';
+    const timestampText = videoTimestamp ? ` (starts at ${formatTime(videoTimestamp)})` : '';
+    videoLabel.textContent = `🎬 Video teaching from Henry Shukman${timestampText}`;
+    
+    videoContainer.appendChild(videoLabel);
+    videoContainer.appendChild(videoElement);
+    messageDiv.appendChild(videoContainer);
 }
 
 function formatTime(seconds) {
@@ -85,20 +90,10 @@ async function sendMessage() {
     showLoading(true);
     
     try {
-        const response = await fetch('/chat', {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json',
-            },
-            body: JSON.stringify({ question: question })
-        });
-        
-        const data = await response.json();
-        
-        if (response.ok) {
-            addMessage(data.response, false, data.video_url, data.video_timestamp);
+        if (window.ReadableStream && window.TextDecoder) {
+            await streamAnswer(question);
         } else {
-            addMessage(`Error: ${data.error || 'Something went wrong'}`);
+            await fetchAnswer(question);
         }
     } catch (error) {
         addMessage(`Error: Unable to connect to server. ${error.message}`);
@@ -107,6 +102,106 @@ async function sendMessage() {
     }
 }
 
+async function fetchAnswer(question) {
+    const response = await fetch('/chat', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({ question: question })
+    });
+    
+    const data = await response.json();
+    
+    if (response.ok) {
+        addMessage(data.response, false, data.video_url, data.video_timestamp);
+    } else {
+        addMessage(`Error: ${data.error || 'Something went wrong'}`);
+    }
+}
+
+// Read the /chat/stream Server-Sent Events and render tokens as they arrive
+async function streamAnswer(question) {
+    const response = await fetch('/chat/stream', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+            'Accept': 'text/event-stream',
+        },
+        body: JSON.stringify({ question: question })
+    });
+    
+    if (!response.ok || !response.body) {
+        const data = await response.json().catch(() => ({}));
+        addMessage(`Error: ${data.error || 'Something went wrong'}`);
+        return;
+    }
+    
+    const chatMessages = document.getElementById('chatMessages');
+    let messageDiv = null;
+    let messageContent = null;
+    let finished = false;
+    
+    const handleEvent = (event, data) => {
+        if (event === 'token') {
+            if (!messageDiv) {
+                // First token: swap the spinner for the growing answer
+                messageDiv = addMessage('');
+                messageContent = messageDiv.querySelector('.message-content');
+                document.getElementById('loading').style.display = 'none';
+            }
+            messageContent.textContent += data.token;
+        } else if (event === 'done') {
+            finished = true;
+            if (!messageDiv) {
+                messageDiv = addMessage('');
+                messageContent = messageDiv.querySelector('.message-content');
+            }
+            messageContent.textContent = data.response;
+            if (data.video_url) {
+                attachVideo(messageDiv, data.video_url, data.video_timestamp);
+            }
+        } else if (event === 'error') {
+            finished = true;
+            addMessage(`Error: ${data.error || 'Something went wrong'}`);
+        }
+        chatMessages.scrollTop = chatMessages.scrollHeight;
+    };
+    
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const frame = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+            
+            let event = 'message';
+            const dataLines = [];
+            for (const line of frame.split('\n')) {
+                if (line.startsWith('event:')) {
+                    event = line.slice(6).trim();
+                } else if (line.startsWith('data:')) {
+                    dataLines.push(line.slice(5).trim());
+                }
+            }
+            if (dataLines.length) {
+                handleEvent(event, JSON.parse(dataLines.join('\n')));
+            }
+        }
+    }
+    
+    if (!finished) {
+        addMessage('Error: The response was interrupted. Please try again.');
+    }
+}
+
 // Event listeners
 document.addEventListener('DOMContentLoaded', function() {
     const questionInput = document.getElementById('questionInput');
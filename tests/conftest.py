@@ -0,0 +1,23 @@
+import csv
+import os
+import sys
+
+import pytest
+
+# The modules under test live at the top level of the repository
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def write_transcript(tmp_path):
+    """Write (start, end, text) rows as a transcript CSV; returns its path."""
+
+    def write(name, rows):
+        path = tmp_path / name
+        with path.open("w", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["Start time", "End time", "Transcript"])
+            writer.writerows(rows)
+        return path
+
+    return write
@@ -0,0 +1,83 @@
+import pytest
+
+import answer_cache
+from answer_cache import AnswerCache, normalize_question
+
+
+def test_normalize_question():
+    assert normalize_question("  What is   Awareness?! ") == "what is awareness"
+    assert normalize_question("What’s love?") == "what's love"
+
+
+def test_exact_hit_ignores_case_and_punctuation():
+    cache = AnswerCache()
+    cache.put("What is awareness?", None, {"response": "r"})
+    assert cache.get_exact("what is AWARENESS") == {"response": "r"}
+    assert cache.get_exact("what is presence") is None
+
+
+def test_semantic_hit_needs_threshold():
+    cache = AnswerCache(similarity_threshold=0.95)
+    cache.put("What is awareness?", [1.0, 0.0], {"response": "r"})
+    assert cache.get_semantic([0.99, 0.05]) == {"response": "r"}
+    assert cache.get_semantic([0.5, 0.5]) is None
+    assert cache.get_semantic([1.0, 0.0, 0.0]) is None
+    assert cache.stats()["semantic_hits"] == 1
+    assert cache.stats()["misses"] == 2
+
+
+def test_modes_are_separate():
+    cache = AnswerCache()
+    cache.put("What is awareness?", [1.0, 0.0], {"mode": "llm"}, "llm")
+    assert cache.get_exact("What is awareness?", "extractive") is None
+    assert cache.get_semantic([1.0, 0.0], "extractive") is None
+    assert cache.get_exact("What is awareness?", "llm") == {"mode": "llm"}
+    assert cache.get_semantic([1.0, 0.0], "llm") == {"mode": "llm"}
+
+
+def test_entries_expire(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(answer_cache.time, "time", lambda: now[0])
+    cache = AnswerCache(ttl_seconds=10)
+    cache.put("q", [1.0, 0.0], {"response": "r"})
+    now[0] += 11
+    assert cache.get_exact("q") is None
+    assert cache.get_semantic([1.0, 0.0]) is None
+    assert len(cache) == 0
+
+
+def test_evicts_least_recently_used():
+    cache = AnswerCache(max_entries=2)
+    cache.put("first", [1.0, 0.0], {"response": "1"})
+    cache.put("second", [0.0, 1.0], {"response": "2"})
+    assert cache.get_exact("first") is not None
+    cache.put("third", [0.7, 0.7], {"response": "3"})
+    assert cache.get_exact("second") is None
+    assert cache.get_semantic([0.0, 1.0]) is None
+    assert cache.get_exact("first") == {"response": "1"}
+    assert cache.get_semantic([0.7, 0.7]) == {"response": "3"}
+
+
+def test_byte_budget():
+    cache = AnswerCache(max_bytes=100)
+    cache.put("huge", None, {"response": "x" * 200})
+    assert len(cache) == 0
+    cache.put("a", None, {"response": "x" * 40})
+    cache.put("b", None, {"response": "x" * 40})
+    assert cache.get_exact("a") is None
+    assert cache.get_exact("b") is not None
+    assert cache.stats()["bytes"] <= 100
+
+
+def test_returned_payload_is_a_copy():
+    cache = AnswerCache()
+    cache.put("q", None, {"response": "r"})
+    cache.get_exact("q")["response"] = "changed"
+    assert cache.get_exact("q") == {"response": "r"}
+
+
+@pytest.mark.parametrize("question", ["", "?!"])
+def test_blank_question_is_not_cached(question):
+    cache = AnswerCache()
+    cache.put(question, [1.0], {"response": "r"})
+    assert len(cache) == 0
@@ -0,0 +1,64 @@
+import hashlib
+
+from clip_cache import ClipCache
+
+
+def key(name):
+    return hashlib.sha256(name.encode("utf-8")).hexdigest()
+
+
+def add(cache, name, size):
+    tmp = cache.temp_path_for(key(name))
+    tmp.write_bytes(b"\0" * size)
+    return cache.put(key(name), tmp)
+
+
+def test_put_then_get(tmp_path):
+    cache = ClipCache(str(tmp_path), max_bytes=1000)
+    path = add(cache, "a", 100)
+    assert path.exists()
+    assert not list(tmp_path.glob("*.part-*"))
+    assert cache.get(key("a")) == path
+    assert cache.get(key("missing")) is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_evicts_least_recently_used_to_budget(tmp_path):
+    cache = ClipCache(str(tmp_path), max_bytes=1000)
+    a = add(cache, "a", 400)
+    b = add(cache, "b", 400)
+    cache.get(key("a"))
+    c = add(cache, "c", 400)
+    assert a.exists() and c.exists()
+    assert not b.exists()
+    assert cache.get(key("b")) is None
+    stats = cache.stats()
+    assert stats["evictions"] == 1
+    assert stats["bytes"] == 800
+
+
+def test_new_clip_is_kept_even_over_budget(tmp_path):
+    cache = ClipCache(str(tmp_path), max_bytes=1000)
+    add(cache, "a", 400)
+    big = add(cache, "big", 1500)
+    assert big.exists()
+    assert cache.get(key("a")) is None
+
+
+def test_index_survives_restart(tmp_path):
+    cache = ClipCache(str(tmp_path), max_bytes=1000)
+    path = add(cache, "a", 100)
+    cache.flush()
+    reopened = ClipCache(str(tmp_path), max_bytes=1000)
+    assert reopened.get(key("a")) == path
+    assert reopened.stats()["bytes"] == 100
+
+
+def test_sees_clips_from_another_process(tmp_path):
+    mine = ClipCache(str(tmp_path), max_bytes=1000)
+    theirs = ClipCache(str(tmp_path), max_bytes=1000)
+    path = add(theirs, "a", 100)
+    assert mine.get(key("a")) == path
+    add(mine, "b", 100)
+    assert ClipCache(str(tmp_path), max_bytes=1000).stats()["clips"] == 2
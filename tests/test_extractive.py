@@ -0,0 +1,25 @@
+from langchain.schema import Document
+
+from extractive import Passage, format_answer, format_seconds
+
+
+def test_format_seconds():
+    assert format_seconds(0) == "00:00:00"
+    assert format_seconds(75.2) == "00:01:15"
+    assert format_seconds(3725) == "01:02:05"
+
+
+def test_format_seconds_carries_rounded_seconds():
+    assert format_seconds(59.6) == "00:01:00"
+    assert format_seconds(119.6) == "00:02:00"
+    assert format_seconds(3599.7) == "01:00:00"
+
+
+def test_format_answer():
+    doc = Document(page_content="", metadata={"teaching_name": "DC Retreat Day 1"})
+    passage = Passage(doc=doc, text="Be here now.", start_seconds=59.6, end_seconds=125.0, score=1.0)
+    assert format_answer(passage) == (
+        "Teaching: DC Retreat Day 1\n"
+        "Timestamp: 00:01:00-00:02:05\n"
+        'Henry\'s Quote: "Be here now."'
+    )
@@ -0,0 +1,27 @@
+from langchain.schema import Document
+
+from hybrid_retriever import reciprocal_rank_fusion
+
+
+def chunk(teaching, index):
+    return Document(page_content=f"{teaching} {index}", metadata={"teaching_name": teaching, "chunk_index": index})
+
+
+def test_rrf_rewards_agreement():
+    a, b, c = chunk("Day 1", 0), chunk("Day 1", 1), chunk("Day 2", 0)
+    dense = [a, b, c]
+    lexical = [b, c]
+    assert reciprocal_rank_fusion([dense, lexical]) == [b, c, a]
+
+
+def test_rrf_matches_chunks_by_teaching_and_index():
+    dense = [chunk("Day 1", 3)]
+    lexical = [Document(page_content="lexical copy", metadata={"teaching_name": "Day 1", "chunk_index": "3"})]
+    fused = reciprocal_rank_fusion([dense, lexical])
+    assert fused == dense
+
+
+def test_rrf_ties_keep_first_seen_order():
+    a, b = chunk("Day 1", 0), chunk("Day 2", 0)
+    assert reciprocal_rank_fusion([[a], [b]]) == [a, b]
+    assert reciprocal_rank_fusion([]) == []
@@ -0,0 +1,62 @@
+import threading
+
+from ingest_pipeline import AdaptiveLimiter
+
+
+def test_limiter_halves_on_rate_limit():
+    limiter = AdaptiveLimiter(8)
+    limiter.on_rate_limit()
+    assert limiter.limit == 4
+    limiter.on_rate_limit()
+    limiter.on_rate_limit()
+    limiter.on_rate_limit()
+    assert limiter.limit == 1
+    assert limiter.rate_limited == 4
+
+
+def test_limiter_grows_back_on_success():
+    limiter = AdaptiveLimiter(4, increase_every=2)
+    limiter.on_rate_limit()
+    assert limiter.limit == 2
+    limiter.on_success()
+    assert limiter.limit == 2
+    limiter.on_success()
+    assert limiter.limit == 3
+    for _ in range(10):
+        limiter.on_success()
+    assert limiter.limit == 4
+
+
+def test_limiter_rate_limit_resets_success_streak():
+    limiter = AdaptiveLimiter(4, increase_every=2)
+    limiter.on_rate_limit()
+    limiter.on_success()
+    limiter.on_rate_limit()
+    limiter.on_success()
+    assert limiter.limit == 1
+
+
+def test_limiter_bounds_concurrency():
+    limiter = AdaptiveLimiter(2)
+    lock = threading.Lock()
+    active = []
+    peak = []
+    release = threading.Event()
+
+    def work():
+        with limiter:
+            with lock:
+                active.append(1)
+                peak.append(len(active))
+            release.wait(5)
+            with lock:
+                active.pop()
+
+    threads = [threading.Thread(target=work) for _ in range(5)]
+    for t in threads:
+        t.start()
+    threading.Event().wait(0.1)
+    release.set()
+    for t in threads:
+        t.join(timeout=5)
+    assert max(peak) == 2
@@ -0,0 +1,41 @@
+from langchain.schema import Document
+
+from lexical_index import LexicalIndex, chunk_terms, open_lexical_index, write_lexical_index
+
+
+def chunk(teaching, index, text):
+    return (
+        f"{teaching}-{index}",
+        Document(page_content=text, metadata={"teaching_name": teaching, "chunk_index": index}),
+    )
+
+
+def test_round_trip_and_search(tmp_path):
+    chunks = [
+        chunk("Day 1", 0, "Timestamp: 00:00:10-00:00:18\nWhen you rest as awareness the seeking falls away."),
+        chunk("Day 1", 1, "Timestamp: 00:00:18-00:00:30\nWhat remains is peace, only peace."),
+        chunk("Day 2", 0, "Timestamp: 00:00:05-00:00:13\nNotice the one who is noticing. Café talk."),
+    ]
+    path = tmp_path / "lexical.bin"
+    counts = write_lexical_index(path, chunks)
+    assert counts["chunks"] == 3
+
+    index = LexicalIndex(str(path))
+    assert len(index) == 3
+    doc = index.document(2)
+    assert doc.id == "Day 2-0"
+    assert doc.page_content == chunks[2][1].page_content
+    assert doc.metadata == {"teaching_name": "Day 2", "chunk_index": 0}
+
+    results = index.search("peace")
+    assert [d.id for d, _ in results] == ["Day 1-1"]
+    results = index.search("seeking awareness noticing")
+    assert [d.id for d, _ in results] == ["Day 1-0", "Day 2-0"]
+    assert results[0][1] > results[1][1] > 0
+    assert index.search("timestamp") == []
+    assert index.search("unknownword") == []
+
+
+def test_chunk_terms_skip_timestamp_header():
+    assert "timestamp" not in chunk_terms("Timestamp: 00:00:10-00:00:18\nresting")
+    assert open_lexical_index("/nonexistent/lexical.bin") is None
@@ -0,0 +1,47 @@
+import pytest
+
+from quote_aligner import QuoteAligner, extract_quote
+from transcript_reader import read_transcript
+from transcript_store import TranscriptStore, write_transcript_store
+
+
+@pytest.fixture
+def aligner(tmp_path, write_transcript):
+    day1 = read_transcript(write_transcript("Day 1.csv", [
+        (10.0, 14.0, "when you rest as awareness"),
+        (14.0, 18.0, "the seeking simply falls away"),
+        (18.0, 22.0, "and what remains is peace"),
+    ]))
+    day2 = read_transcript(write_transcript("Day 2.csv", [
+        (5.0, 9.0, "notice the one who is noticing"),
+        (9.0, 13.0, "the seeking simply falls away on its own"),
+    ]))
+    path = tmp_path / "transcripts.bin"
+    write_transcript_store(path, [("Day 1", "Day 1.csv", day1), ("Day 2", "Day 2.csv", day2)])
+    store = TranscriptStore(str(path))
+    yield QuoteAligner(store)
+    store.close()
+
+
+def test_aligns_quote_spanning_rows(aligner):
+    found = aligner.align("You rest as awareness, the seeking simply falls away.")
+    assert found.teaching_name == "Day 1"
+    assert (found.row_start, found.row_end) == (0, 1)
+    assert (found.start_seconds, found.end_seconds) == (10.0, 18.0)
+    assert found.score > 0.9
+
+
+def test_restricts_to_teachings(aligner):
+    found = aligner.align("the seeking simply falls away", teaching_ids=[1])
+    assert found.teaching_name == "Day 2"
+    assert found.start_seconds == 9.0
+
+
+def test_unknown_or_short_quote(aligner):
+    assert aligner.align("completely unrelated words here") is None
+    assert aligner.align("peace") is None
+
+
+def test_extract_quote():
+    response = 'Teaching: Day 1\nTimestamp: 00:00:10-00:00:18\nHenry\'s Quote: "the seeking simply falls away"'
+    assert extract_quote(response) == "the seeking simply falls away"
@@ -0,0 +1,88 @@
+import threading
+
+import pytest
+
+from singleflight import Broadcast, SingleFlight
+
+
+def test_broadcast_replays_then_follows():
+    flight = Broadcast()
+    flight.publish("token", "a")
+    seen = []
+    reader = threading.Thread(target=lambda: seen.extend(flight))
+    reader.start()
+    flight.publish("token", "b")
+    flight.publish("done", "ab")
+    flight.close()
+    reader.join(timeout=5)
+    assert seen == [("token", "a"), ("token", "b"), ("done", "ab")]
+
+
+def test_broadcast_result():
+    flight = Broadcast()
+    flight.publish("token", "a")
+    flight.publish("done", {"response": "ab"})
+    flight.close()
+    assert flight.result() == {"response": "ab"}
+
+
+def test_broadcast_result_raises_error():
+    flight = Broadcast()
+    flight.publish("error", ValueError("boom"))
+    flight.close()
+    with pytest.raises(ValueError, match="boom"):
+        flight.result()
+
+
+def test_broadcast_result_without_done():
+    flight = Broadcast()
+    flight.close()
+    with pytest.raises(RuntimeError):
+        flight.result()
+
+
+def test_singleflight_coalesces_concurrent_calls():
+    flights = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def work():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return "answer"
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(flights.do("q", work)))
+    leader.start()
+    started.wait(5)
+    followers = [threading.Thread(target=lambda: results.append(flights.do("q", work))) for _ in range(3)]
+    for t in followers:
+        t.start()
+    while flights.stats()["followers"] < 3:
+        threading.Event().wait(0.01)
+    release.set()
+    for t in [leader, *followers]:
+        t.join(timeout=5)
+
+    assert len(calls) == 1
+    assert sorted(results) == [("answer", False)] + [("answer", True)] * 3
+    assert flights.stats() == {"in_flight": 0, "leaders": 1, "followers": 3}
+
+
+def test_singleflight_runs_again_after_finishing():
+    flights = SingleFlight()
+    assert flights.do("q", lambda: 1) == (1, False)
+    assert flights.do("q", lambda: 2) == (2, False)
+
+
+def test_singleflight_error_reaches_leader():
+    flights = SingleFlight()
+
+    def fail():
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        flights.do("q", fail)
+    assert flights.stats()["in_flight"] == 0
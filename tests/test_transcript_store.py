@@ -0,0 +1,42 @@
+import math
+
+from transcript_reader import read_transcript
+from transcript_store import TranscriptStore, open_transcript_store, write_transcript_store
+
+
+def test_round_trip(tmp_path, write_transcript):
+    day1 = read_transcript(write_transcript("Day 1.csv", [
+        (6.1, 6.6, "wow"),
+        (7.8, 9.0, "well great that"),
+        (9.3, 10.4, "everybody could make it — café"),
+    ]))
+    day2 = read_transcript(write_transcript("Day 2.csv", [(0.0, 2.5, "welcome back"), ("", "", "untimed row")]))
+    path = tmp_path / "transcripts.bin"
+    counts = write_transcript_store(path, [("Day 1", "Day 1.csv", day1), ("Day 2", "Day 2.csv", day2)])
+    assert counts["teachings"] == 2
+    assert counts["rows"] == 5
+
+    store = TranscriptStore(str(path))
+    try:
+        assert len(store) == 5
+        assert store.find_teaching(name="Day 2") == 1
+        assert store.find_teaching(filename="Day 1.csv") == 0
+        assert store.teaching_rows(0) == (0, 3)
+        assert store.row_text(2) == "everybody could make it — café"
+        assert store.row_timing(1) == (7.8, 9.0)
+        assert store.row_timing(4) == (None, None)
+        assert store.teaching_text(1).split("\n")[:2] == ["welcome back", "untimed row"]
+        assert store.row_at_time(0, 8.0) == 1
+        assert list(store.rows_between(0, 7.0, 9.5)) == [1, 2]
+    finally:
+        store.close()
+
+
+def test_open_missing_store(tmp_path):
+    assert open_transcript_store(str(tmp_path / "missing.bin")) is None
+
+
+def test_reader_keeps_unknown_times_as_nan(write_transcript):
+    columns = read_transcript(write_transcript("t.csv", [("", "", "no timing")]))
+    assert math.isnan(columns.starts[0])
+    assert not columns.has_times
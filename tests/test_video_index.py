@@ -0,0 +1,81 @@
+import pytest
+
+import video_index
+from video_index import VideoInfo, read_video_info, write_video_info
+
+
+def sample_info(path="talk.mp4"):
+    return VideoInfo(
+        path=path,
+        duration=3723.5,
+        bit_rate=1_250_000,
+        width=1280,
+        height=720,
+        fps=29.97,
+        codec="h264",
+        size=123_456_789,
+        mtime_ns=1_700_000_000_123_456_789,
+        keyframes=[0.0, 2.002, 4.004, 3721.5],
+        profile="Main",
+        level=31,
+        pix_fmt="yuv420p",
+        timescale=90000,
+        audio_codec="aac",
+        sample_rate=48000,
+        channels=2,
+    )
+
+
+def test_round_trip(tmp_path):
+    info = sample_info()
+    path = tmp_path / "sidecars" / "talk.vidx"
+    size = write_video_info(path, info)
+    assert path.stat().st_size == size
+
+    loaded = read_video_info(path, "talk.mp4")
+    assert loaded.to_dict() == info.to_dict()
+    for name in ("path", "timescale", "sample_rate", "channels", "size", "mtime_ns", "keyframes"):
+        assert getattr(loaded, name) == getattr(info, name), name
+
+
+def test_rejects_other_versions(tmp_path, monkeypatch):
+    path = tmp_path / "talk.vidx"
+    write_video_info(path, sample_info())
+    monkeypatch.setattr(video_index, "VERSION", video_index.VERSION + 1)
+    with pytest.raises(ValueError):
+        read_video_info(path, "talk.mp4")
+
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / "talk.vidx"
+    path.write_bytes(b"ATRS" + b"\0" * 200)
+    with pytest.raises(ValueError):
+        read_video_info(path, "talk.mp4")
+
+
+def test_index_reprobes_changed_source(tmp_path, monkeypatch):
+    source = tmp_path / "talk.mp4"
+    source.write_bytes(b"v1")
+    probes = []
+
+    def probe(video_path):
+        probes.append(video_path)
+        st = source.stat()
+        info = sample_info(video_path)
+        info.size, info.mtime_ns = st.st_size, st.st_mtime_ns
+        return info
+
+    monkeypatch.setattr(video_index, "probe_video", probe)
+    index = video_index.VideoIndex(str(tmp_path / "sidecars"))
+    assert index.get_or_probe(str(source)).keyframes[-1] == 3721.5
+    assert index.get_or_probe(str(source)) is not None
+    assert len(probes) == 1
+
+    # A new process reads the sidecar instead of probing
+    fresh = video_index.VideoIndex(str(tmp_path / "sidecars"))
+    assert fresh.get(str(source)).keyframes == [0.0, 2.002, 4.004, 3721.5]
+    assert len(probes) == 1
+
+    source.write_bytes(b"version two")
+    index.get_or_probe(str(source))
+    assert len(probes) == 2
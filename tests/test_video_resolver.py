@@ -0,0 +1,70 @@
+import json
+
+import pytest
+
+import video_processor
+from video_resolver import TeachingVideoIndex
+
+
+@pytest.fixture
+def videos(tmp_path):
+    mapping = {
+        "DC Retreat Day 1": {"video_filename": "DC Retreat Day 1.mp4", "video_url": "https://example.com/day1.mp4"},
+        "DC Retreat Day 1 Transcription": {"video_filename": "DC Retreat Day 1.mp4"},
+        "DC Retreat Day 2": {"video_filename": "DC Retreat Day 2.mp4", "video_url": "https://example.com/day2.mp4"},
+        "Silent Retreat 2019": {"video_filename": "Silent Retreat 2019.mp4"},
+        "Evening Talk": {"video_filename": "Evening Talk.mp4", "video_url": "https://example.com/evening.mp4"},
+    }
+    mapping_path = tmp_path / "video_mapping.json"
+    mapping_path.write_text(json.dumps(mapping), encoding="utf-8")
+    video_dir = tmp_path / "Video"
+    video_dir.mkdir()
+    for name in ("DC Retreat Day 1.mp4", "DC Retreat Day 2.mp4", "Silent Retreat 2019.mp4"):
+        (video_dir / name).write_bytes(b"")
+    return TeachingVideoIndex(mapping_path=str(mapping_path), video_dir=str(video_dir))
+
+
+def test_resolve_exact(videos):
+    assert videos.resolve("DC Retreat Day 2")["video_filename"] == "DC Retreat Day 2.mp4"
+    assert videos.resolve("dc retreat day 1 transcription.csv")["video_filename"] == "DC Retreat Day 1.mp4"
+    assert videos.video_url("Evening Talk") == "https://example.com/evening.mp4"
+
+
+def test_resolve_fuzzy(videos):
+    assert videos.resolve("The Silent Retreat")["video_filename"] == "Silent Retreat 2019.mp4"
+    assert videos.resolve("The Silent Retreat", fuzzy=False) is None
+
+
+def test_resolve_does_not_guess_a_numbered_part(videos):
+    # Day 1 and Day 2 fit "DC Retreat" equally well, and Day 3 does not exist
+    assert videos.resolve("DC Retreat") is None
+    assert videos.resolve("DC Retreat Day 3") is None
+
+
+def test_default_video(videos):
+    assert videos.default_video().endswith(".mp4")
+
+
+@pytest.fixture
+def processor(videos, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(video_processor, "shared_teaching_index", lambda: videos)
+    return video_processor.VideoProcessor()
+
+
+def test_choose_video_named_teaching(processor):
+    path = processor.choose_video("Teaching: DC Retreat Day 2\nTimestamp: 00:01:00-00:02:00")
+    assert path.endswith("DC Retreat Day 2.mp4")
+
+
+def test_choose_video_without_teaching_uses_default(processor):
+    assert processor.choose_video("Timestamp: 00:01:00-00:02:00") == processor.default_video_path
+
+
+def test_choose_video_unresolved_teaching_is_none(processor):
+    assert processor.choose_video("Teaching: A Teaching Nobody Recorded") is None
+    assert processor.choose_video("Teaching: DC Retreat") is None
+
+
+def test_choose_video_teaching_without_local_video_is_none(processor):
+    assert processor.choose_video("Teaching: Evening Talk") is None
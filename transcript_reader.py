@@ -0,0 +1,214 @@
+"""
+Single-pass, columnar transcript reader.
+
+Each transcript (CSV with Start time/End time/Transcript columns, or plain TXT)
+is parsed exactly once into three compact columns instead of one dict per row:
+
+* ``starts`` / ``ends`` -- ``array('d')`` of seconds, NaN where unknown
+* ``text`` + ``offsets`` -- every row's text concatenated into one string, with
+  ``array('q')`` offsets so row ``i`` is ``text[offsets[i]:offsets[i + 1]]``
+
+Memory therefore grows with the size of the transcript, not with the number of
+(often sub-second, few-character) ASR fragment rows.
+"""
+
+import csv
+import io
+import math
+import re
+from array import array
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+
+
+START_COLUMNS = {"starttime", "start", "start_seconds", "startsec"}
+END_COLUMNS = {"endtime", "end", "end_seconds", "endsec"}
+TEXT_COLUMNS = {"transcript", "text", "content"}
+
+NAN = float("nan")
+
+SENT_SPLIT_RE = re.compile(r"(?<=[.!?])[\]\)\"']?\s+(?=[A-Z0-9\"'\(\[])")
+
+WORD_RE = re.compile(r"[a-z0-9]+(?:'[a-z0-9]+)?")
+STOPWORDS = frozenset(
+    """a about an and are as at be but by can did do does for from had has have he henry
+    henry's his how i if in is it its me my of on or say says said so than that the their
+    them then there these they this to was we what when where which who why will with would
+    you your""".split()
+)
+
+
+def content_terms(text: str) -> List[str]:
+    """Lower-cased word tokens without stopwords, as scored by BM25."""
+    return [w for w in WORD_RE.findall(text.lower().replace("\u2019", "'")) if w not in STOPWORDS]
+
+
+def split_sentences(text: str) -> List[str]:
+    """Lightweight sentence splitter without NLTK."""
+    if not text:
+        return []
+    cleaned = re.sub(r"\s+", " ", text).strip()
+    if not cleaned:
+        return []
+    parts = SENT_SPLIT_RE.split(cleaned)
+    sentences: List[str] = []
+    for part in parts:
+        part = part.strip()
+        if not part:
+            continue
+        if sentences and len(part) < 30:
+            sentences[-1] = (sentences[-1] + " " + part).strip()
+        else:
+            sentences.append(part)
+    return sentences
+
+
+def _normalize_header(name: str) -> str:
+    return (name or "").strip().lower().replace(" ", "")
+
+
+def _to_float(value: str) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return NAN
+
+
+class TranscriptColumns:
+    """Row-aligned start/end/text columns for one transcript."""
+
+    __slots__ = ("starts", "ends", "offsets", "text")
+
+    def __init__(self, starts: array, ends: array, offsets: array, text: str):
+        self.starts = starts
+        self.ends = ends
+        self.offsets = offsets
+        self.text = text
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    @property
+    def has_times(self) -> bool:
+        return any(not math.isnan(s) for s in self.starts)
+
+    def row_text(self, i: int) -> str:
+        return self.text[self.offsets[i] : self.offsets[i + 1]]
+
+    def iter_rows(self, start: int = 0, stop: Optional[int] = None) -> Iterator[Tuple[Optional[float], Optional[float], str]]:
+        """Yield (start, end, text) with None for unknown times."""
+        stop = len(self) if stop is None else min(stop, len(self))
+        for i in range(start, stop):
+            s, e = self.starts[i], self.ends[i]
+            yield (None if math.isnan(s) else s, None if math.isnan(e) else e, self.row_text(i))
+
+    def span_text(self, start: int, stop: int, sep: str = " ") -> str:
+        stop = min(stop, len(self))
+        return sep.join(self.row_text(i) for i in range(start, stop))
+
+    def span_times(self, start: int, stop: int) -> Tuple[Optional[float], Optional[float]]:
+        """Earliest known start and latest known end over rows [start, stop)."""
+        stop = min(stop, len(self))
+        starts = [s for s in self.starts[start:stop] if not math.isnan(s)]
+        ends = [e for e in self.ends[start:stop] if not math.isnan(e)]
+        return (min(starts) if starts else None, max(ends) if ends else None)
+
+    def full_text(self, sep: str = "\n") -> str:
+        return self.span_text(0, len(self), sep=sep)
+
+
+class _ColumnBuilder:
+    def __init__(self):
+        self.starts = array("d")
+        self.ends = array("d")
+        self.offsets = array("q", [0])
+        self._buf = io.StringIO()
+        self._pos = 0
+
+    def add(self, start: float, end: float, text: str) -> None:
+        self.starts.append(start)
+        self.ends.append(end)
+        self._buf.write(text)
+        self._pos += len(text)
+        self.offsets.append(self._pos)
+
+    def build(self) -> TranscriptColumns:
+        return TranscriptColumns(self.starts, self.ends, self.offsets, self._buf.getvalue())
+
+
+def _best_text_column(columns: List[List[str]]) -> int:
+    """Pick the column that looks most like sentence text (long values, punctuation)."""
+
+    def score(values: List[str]) -> float:
+        values = [v for v in values if v.strip()]
+        if not values:
+            return 0.0
+        avg_len = sum(len(v) for v in values) / len(values)
+        punct = sum(v.count(". ") + v.count("? ") + v.count("! ") for v in values) / len(values)
+        return avg_len + 20 * punct
+
+    return max(range(len(columns)), key=lambda i: score(columns[i]))
+
+
+def read_csv_transcript(path: Path) -> TranscriptColumns:
+    builder = _ColumnBuilder()
+    with path.open("r", encoding="utf-8", errors="ignore", newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return builder.build()
+        names = [_normalize_header(h) for h in header]
+        start_idx = next((i for i, n in enumerate(names) if n in START_COLUMNS), None)
+        end_idx = next((i for i, n in enumerate(names) if n in END_COLUMNS), None)
+        text_idx = next((i for i, n in enumerate(names) if n in TEXT_COLUMNS), None)
+
+        if text_idx is not None:
+            # Fast path: known layout, stream rows straight into the columns
+            for row in reader:
+                text = row[text_idx].strip() if len(row) > text_idx else ""
+                if not text:
+                    continue
+                start = _to_float(row[start_idx]) if start_idx is not None and len(row) > start_idx else NAN
+                end = _to_float(row[end_idx]) if end_idx is not None and len(row) > end_idx else NAN
+                builder.add(start, end, text)
+            return builder.build()
+
+        # Unknown layout: gather columns, then choose the text-like one
+        width = len(header)
+        columns: List[List[str]] = [[] for _ in range(width)]
+        for row in reader:
+            if not row:
+                continue
+            if len(row) > width:
+                columns.extend([""] * len(columns[0]) for _ in range(len(row) - width))
+                width = len(row)
+            for i in range(width):
+                columns[i].append(row[i] if i < len(row) else "")
+        if not columns or not columns[0]:
+            return builder.build()
+        text_idx = _best_text_column(columns)
+        for i, raw in enumerate(columns[text_idx]):
+            text = raw.strip()
+            if not text:
+                continue
+            start = _to_float(columns[start_idx][i]) if start_idx is not None else NAN
+            end = _to_float(columns[end_idx][i]) if end_idx is not None else NAN
+            builder.add(start, end, text)
+    return builder.build()
+
+
+def read_txt_transcript(path: Path) -> TranscriptColumns:
+    """Plain text: one row per non-empty line, with no timing."""
+    builder = _ColumnBuilder()
+    with path.open("r", encoding="utf-8", errors="ignore") as f:
+        for line in f:
+            text = line.strip()
+            if text:
+                builder.add(NAN, NAN, text)
+    return builder.build()
+
+
+def read_transcript(path: Path) -> TranscriptColumns:
+    if path.suffix.lower() == ".csv":
+        return read_csv_transcript(path)
+    return read_txt_transcript(path)
@@ -0,0 +1,210 @@
+"""
+Compiled, memory-mapped store of row-level transcript timing.
+
+``ingest_transcripts.py`` compiles every transcript into one binary file
+(``index_data/transcripts.bin`` by default) and the web app memory-maps it at
+startup. All arrays are read in place through ``memoryview`` casts, so lookups
+copy nothing and every worker process shares the same page-cache pages.
+
+Layout (little-endian, sections 8-byte aligned)::
+
+    header      magic "ATRS", version, section offsets and sizes
+    teachings   UTF-8 JSON list of {name, filename, row_start, row_end}
+    starts      float64[n_rows]   row start seconds (NaN when unknown)
+    ends        float64[n_rows]   row end seconds (NaN when unknown)
+    offsets     int64[n_rows + 1] byte offsets of each row in the text blob
+    text        UTF-8 row texts, each followed by a newline
+
+Rows of one teaching are contiguous, so a teaching's text is the blob slice
+between its first and last row offsets and row lookup by byte offset or by
+time is a binary search.
+"""
+
+import json
+import math
+import mmap
+import os
+import struct
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple
+
+from transcript_reader import TranscriptColumns
+
+
+MAGIC = b"ATRS"
+VERSION = 1
+DEFAULT_STORE_PATH = "index_data/transcripts.bin"
+
+# magic, version, n_teachings, n_rows, then (offset, size) for the 5 sections
+_HEADER = struct.Struct("<4sIIQ10Q")
+
+
+def _align(n: int) -> int:
+    return (n + 7) & ~7
+
+
+def _le_bytes(arr: array) -> bytes:
+    if sys.byteorder != "little":
+        arr = array(arr.typecode, arr)
+        arr.byteswap()
+    return arr.tobytes()
+
+
+def write_transcript_store(path: Path, teachings: Iterable[Tuple[str, str, TranscriptColumns]]) -> dict:
+    """Compile (teaching name, filename, columns) triples into ``path``; returns counts."""
+    table: List[dict] = []
+    starts = array("d")
+    ends = array("d")
+    offsets = array("q", [0])
+    text_parts: List[bytes] = []
+    pos = 0
+
+    for name, filename, columns in teachings:
+        row_start = len(starts)
+        for i in range(len(columns)):
+            data = (columns.row_text(i) + "\n").encode("utf-8")
+            text_parts.append(data)
+            pos += len(data)
+            offsets.append(pos)
+        starts.extend(columns.starts)
+        ends.extend(columns.ends)
+        table.append({"name": name, "filename": filename, "row_start": row_start, "row_end": len(starts)})
+
+    sections = [
+        json.dumps(table, ensure_ascii=False).encode("utf-8"),
+        _le_bytes(starts),
+        _le_bytes(ends),
+        _le_bytes(offsets),
+        b"".join(text_parts),
+    ]
+
+    layout = []
+    cursor = _align(_HEADER.size)
+    for data in sections:
+        layout.extend([cursor, len(data)])
+        cursor = _align(cursor + len(data))
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    with tmp.open("wb") as f:
+        f.write(_HEADER.pack(MAGIC, VERSION, len(table), len(starts), *layout))
+        for (offset, _), data in zip(zip(layout[::2], layout[1::2]), sections):
+            f.seek(offset)
+            f.write(data)
+        f.truncate(cursor)
+    os.replace(tmp, path)
+    return {"teachings": len(table), "rows": len(starts), "bytes": cursor}
+
+
+class TranscriptStore:
+    """Read-only, zero-copy view over a compiled transcript store file."""
+
+    def __init__(self, path: str = DEFAULT_STORE_PATH):
+        self.path = Path(path)
+        with self.path.open("rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        buf = memoryview(self._mmap)
+        magic, version, n_teachings, n_rows, *layout = _HEADER.unpack_from(buf, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{self.path} is not a version {VERSION} transcript store")
+        if sys.byteorder != "little":
+            raise ValueError("Transcript store can only be memory-mapped on little-endian hosts")
+
+        def section(i: int) -> memoryview:
+            offset, size = layout[2 * i], layout[2 * i + 1]
+            return buf[offset : offset + size]
+
+        self.teachings: List[dict] = json.loads(bytes(section(0)).decode("utf-8"))
+        self.starts = section(1).cast("d")
+        self.ends = section(2).cast("d")
+        self.offsets = section(3).cast("q")
+        self.text = section(4)
+        self.n_rows = n_rows
+
+        self._by_filename = {t["filename"]: i for i, t in enumerate(self.teachings)}
+        self._by_name: dict = {}
+        for i, t in enumerate(self.teachings):
+            self._by_name.setdefault(t["name"], []).append(i)
+
+    def __len__(self) -> int:
+        return self.n_rows
+
+    # ------------------------------------------------------------------
+    # Teachings
+    # ------------------------------------------------------------------
+    def find_teaching(self, name: Optional[str] = None, filename: Optional[str] = None) -> Optional[int]:
+        """Teaching id by filename (exact) or teaching name (first match)."""
+        if filename and filename in self._by_filename:
+            return self._by_filename[filename]
+        if name:
+            ids = self._by_name.get(name) or self._by_name.get(name.strip())
+            if ids:
+                return ids[0]
+        return None
+
+    def teaching_rows(self, teaching_id: int) -> Tuple[int, int]:
+        t = self.teachings[teaching_id]
+        return t["row_start"], t["row_end"]
+
+    def teaching_text(self, teaching_id: int) -> str:
+        row_start, row_end = self.teaching_rows(teaching_id)
+        return bytes(self.text[self.offsets[row_start] : self.offsets[row_end]]).decode("utf-8")
+
+    # ------------------------------------------------------------------
+    # Rows
+    # ------------------------------------------------------------------
+    def row_text(self, row: int) -> str:
+        return bytes(self.text[self.offsets[row] : self.offsets[row + 1]]).decode("utf-8").rstrip("\n")
+
+    def row_timing(self, row: int) -> Tuple[Optional[float], Optional[float]]:
+        s, e = self.starts[row], self.ends[row]
+        return (None if math.isnan(s) else s, None if math.isnan(e) else e)
+
+    def row_at_offset(self, teaching_id: int, byte_offset: int) -> Optional[int]:
+        """Row containing ``byte_offset`` of the teaching's text. O(log n)."""
+        row_start, row_end = self.teaching_rows(teaching_id)
+        if row_start == row_end:
+            return None
+        absolute = self.offsets[row_start] + byte_offset
+        row = bisect_right(self.offsets, absolute, row_start, row_end + 1) - 1
+        return row if row_start <= row < row_end else None
+
+    def row_at_time(self, teaching_id: int, seconds: float) -> Optional[int]:
+        """Last row of the teaching starting at or before ``seconds``. O(log n)."""
+        row_start, row_end = self.teaching_rows(teaching_id)
+        if row_start == row_end:
+            return None
+        row = bisect_right(self.starts, seconds, row_start, row_end) - 1
+        return max(row, row_start)
+
+    def rows_between(self, teaching_id: int, start_seconds: float, end_seconds: float) -> range:
+        """Rows of the teaching whose start time lies in [start_seconds, end_seconds]."""
+        row_start, row_end = self.teaching_rows(teaching_id)
+        lo = bisect_left(self.starts, start_seconds, row_start, row_end)
+        hi = bisect_right(self.starts, end_seconds, row_start, row_end)
+        return range(lo, hi)
+
+    def close(self) -> None:
+        for view in (self.starts, self.ends, self.offsets, self.text):
+            view.release()
+        try:
+            self._mmap.close()
+        except BufferError:
+            # A caller still holds a view; the mapping goes away with it
+            pass
+
+
+def open_transcript_store(path: Optional[str] = None) -> Optional[TranscriptStore]:
+    """Memory-map the store at ``path`` (or $TRANSCRIPT_STORE_PATH); None if unavailable."""
+    path = path or os.getenv("TRANSCRIPT_STORE_PATH", DEFAULT_STORE_PATH)
+    if not os.path.exists(path):
+        return None
+    try:
+        return TranscriptStore(path)
+    except Exception as e:  # noqa: BLE001
+        print(f"Could not open transcript store {path}: {e}")
+        return None
@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+"""
+Per-video metadata and keyframe index, probed once and reused.
+
+Planning a clip needs the source's duration (bounds checks), its encoding
+parameters (so a frame-exact head can be re-encoded to match the copied
+rest) and keyframe times (where a stream copy may start). Probing them means opening the container and
+scanning its packets, so each video is probed once and the result is kept in
+a compact sidecar file under ``$VIDEO_INDEX_DIR`` (default
+``index_data/video_index``):
+
+    header      magic "AVKF", version, duration, bit rate, width, height,
+                frame rate, video codec, profile, level, pixel format, time
+                scale, audio codec, sample rate, channels, source size and
+                mtime, keyframe count
+    keyframes   uint32[n] keyframe times in milliseconds, ascending
+
+A three-hour talk with a 2 s GOP needs about 21 KB. A sidecar is stale when
+the source's size or mtime changes and is then re-probed. Sidecars are built
+offline for every video with
+
+    python video_index.py --video-dir Video/Video
+
+and otherwise lazily, the first time ``VideoProcessor`` cuts from a video.
+Lookups after that only ``stat`` the source.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import struct
+import subprocess
+import sys
+import threading
+from array import array
+from pathlib import Path
+from typing import Dict, List, Optional
+
+
+MAGIC = b"AVKF"
+# Sidecars of an older version are re-probed
+VERSION = 2
+DEFAULT_VIDEO_INDEX_DIR = "index_data/video_index"
+DEFAULT_VIDEO_DIR = "Video/Video"
+
+# magic, version, duration, bit rate, width, height, fps, codec, profile, level, pix_fmt, timescale,
+# audio codec, sample rate, channels, source size, source mtime_ns, n_keyframes
+_HEADER = struct.Struct("<4sIdQIId16s24si16sI16sIIQqI")
+
+
+class VideoInfo:
+    """Probed metadata of one source video."""
+
+    __slots__ = (
+        "path", "duration", "bit_rate", "width", "height", "fps", "codec", "profile", "level", "pix_fmt",
+        "timescale", "audio_codec", "sample_rate", "channels", "size", "mtime_ns", "keyframes",
+    )
+
+    def __init__(
+        self,
+        path: str,
+        duration: float,
+        bit_rate: int,
+        width: int,
+        height: int,
+        fps: float,
+        codec: str,
+        size: int,
+        mtime_ns: int,
+        keyframes: List[float],
+        profile: str = "",
+        level: int = 0,
+        pix_fmt: str = "",
+        timescale: int = 0,
+        audio_codec: str = "",
+        sample_rate: int = 0,
+        channels: int = 0,
+    ):
+        self.path = path
+        self.duration = duration
+        self.bit_rate = bit_rate
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.codec = codec
+        self.profile = profile
+        self.level = level
+        self.pix_fmt = pix_fmt
+        self.timescale = timescale
+        self.audio_codec = audio_codec
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.keyframes = keyframes
+
+    def is_fresh(self, st: os.stat_result) -> bool:
+        return st.st_size == self.size and st.st_mtime_ns == self.mtime_ns
+
+    def to_dict(self) -> dict:
+        return {
+            "duration": self.duration,
+            "bit_rate": self.bit_rate,
+            "width": self.width,
+            "height": self.height,
+            "fps": self.fps,
+            "codec": self.codec,
+            "profile": self.profile,
+            "level": self.level,
+            "pix_fmt": self.pix_fmt,
+            "audio_codec": self.audio_codec,
+            "keyframes": len(self.keyframes),
+        }
+
+
+def _timescale(time_base: Optional[str]) -> int:
+    """Ticks per second of a stream time base such as "1/12800"."""
+    try:
+        num, _, den = (time_base or "").partition("/")
+        return int(den) // max(1, int(num)) if den else 0
+    except ValueError:
+        return 0
+
+
+def _text(value: str, size: int) -> bytes:
+    return value.encode("ascii", "replace")[:size]
+
+
+def _untext(value: bytes) -> str:
+    return value.rstrip(b"\0").decode("ascii")
+
+
+def _fps(rate: Optional[str]) -> float:
+    try:
+        num, _, den = (rate or "0/1").partition("/")
+        return float(num) / float(den or 1)
+    except (ValueError, ZeroDivisionError):
+        return 0.0
+
+
+def probe_video(video_path: str) -> VideoInfo:
+    """Read metadata and every keyframe time with ffprobe.
+
+    Keyframes come from packet flags, so nothing is decoded; the scan is one
+    sequential read of the file.
+    """
+    st = os.stat(video_path)
+    meta = json.loads(
+        subprocess.run(
+            [
+                "ffprobe", "-v", "error",
+                "-show_entries",
+                "format=duration,bit_rate:stream=codec_type,codec_name,width,height,avg_frame_rate,"
+                "profile,level,pix_fmt,time_base,sample_rate,channels",
+                "-of", "json", video_path,
+            ],
+            check=True, capture_output=True, text=True,
+        ).stdout
+    )
+    streams = meta.get("streams") or []
+    stream = next((s for s in streams if s.get("codec_type") == "video"), {})
+    audio = next((s for s in streams if s.get("codec_type") == "audio"), {})
+    fmt = meta.get("format") or {}
+
+    packets = subprocess.run(
+        [
+            "ffprobe", "-v", "error", "-select_streams", "v:0",
+            "-show_entries", "packet=pts_time,flags", "-of", "csv=p=0", video_path,
+        ],
+        check=True, capture_output=True, text=True,
+    ).stdout
+    keyframes = set()
+    for line in packets.splitlines():
+        pts, _, flags = line.partition(",")
+        if "K" in flags:
+            try:
+                keyframes.add(round(float(pts), 3))
+            except ValueError:
+                continue
+
+    return VideoInfo(
+        path=video_path,
+        duration=float(fmt.get("duration") or 0.0),
+        bit_rate=int(fmt.get("bit_rate") or 0),
+        width=int(stream.get("width") or 0),
+        height=int(stream.get("height") or 0),
+        fps=_fps(stream.get("avg_frame_rate")),
+        codec=str(stream.get("codec_name") or ""),
+        size=st.st_size,
+        mtime_ns=st.st_mtime_ns,
+        keyframes=sorted(keyframes),
+        profile=str(stream.get("profile") or ""),
+        level=int(stream.get("level") or 0),
+        pix_fmt=str(stream.get("pix_fmt") or ""),
+        timescale=_timescale(stream.get("time_base")),
+        audio_codec=str(audio.get("codec_name") or ""),
+        sample_rate=int(audio.get("sample_rate") or 0),
+        channels=int(audio.get("channels") or 0),
+    )
+
+
+def write_video_info(path: Path, info: VideoInfo) -> int:
+    """Write ``info`` as a sidecar at ``path``; returns its size in bytes."""
+    millis = array("I", (int(round(t * 1000)) for t in info.keyframes))
+    if sys.byteorder != "little":
+        millis.byteswap()
+    data = _HEADER.pack(
+        MAGIC, VERSION, info.duration, info.bit_rate, info.width, info.height, info.fps,
+        _text(info.codec, 16), _text(info.profile, 24), info.level, _text(info.pix_fmt, 16), info.timescale,
+        _text(info.audio_codec, 16), info.sample_rate, info.channels, info.size, info.mtime_ns, len(millis),
+    ) + millis.tobytes()
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+    return len(data)
+
+
+def read_video_info(path: Path, video_path: str) -> VideoInfo:
+    data = Path(path).read_bytes()
+    magic, version = struct.unpack_from("<4sI", data, 0)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"{path} is not a version {VERSION} video index")
+    (
+        _, _, duration, bit_rate, width, height, fps, codec, profile, level, pix_fmt, timescale,
+        audio_codec, sample_rate, channels, size, mtime_ns, n,
+    ) = _HEADER.unpack_from(data, 0)
+    millis = array("I")
+    millis.frombytes(data[_HEADER.size : _HEADER.size + 4 * n])
+    if sys.byteorder != "little":
+        millis.byteswap()
+    return VideoInfo(
+        path=video_path,
+        duration=duration,
+        bit_rate=bit_rate,
+        width=width,
+        height=height,
+        fps=fps,
+        codec=_untext(codec),
+        size=size,
+        mtime_ns=mtime_ns,
+        keyframes=[m / 1000.0 for m in millis],
+        profile=_untext(profile),
+        level=level,
+        pix_fmt=_untext(pix_fmt),
+        timescale=timescale,
+        audio_codec=_untext(audio_codec),
+        sample_rate=sample_rate,
+        channels=channels,
+    )
+
+
+class VideoIndex:
+    """Sidecar index of source videos, cached in memory and filled on first use."""
+
+    def __init__(self, index_dir: Optional[str] = None):
+        self.index_dir = Path(index_dir or os.getenv("VIDEO_INDEX_DIR", DEFAULT_VIDEO_INDEX_DIR))
+        self._cache: Dict[str, VideoInfo] = {}
+        self._lock = threading.Lock()
+
+    def sidecar_path(self, video_path: str) -> Path:
+        real = os.path.realpath(video_path)
+        stem = re.sub(r"[^A-Za-z0-9]+", "-", Path(real).stem).strip("-")[:60] or "video"
+        return self.index_dir / f"{stem}-{hashlib.sha256(real.encode('utf-8')).hexdigest()[:12]}.vidx"
+
+    def get(self, video_path: str) -> Optional[VideoInfo]:
+        """Fresh metadata from memory or the sidecar, or None if the video must be probed."""
+        st = os.stat(video_path)
+        real = os.path.realpath(video_path)
+        info = self._cache.get(real)
+        if info is not None and info.is_fresh(st):
+            return info
+        sidecar = self.sidecar_path(video_path)
+        if not sidecar.exists():
+            return None
+        try:
+            info = read_video_info(sidecar, video_path)
+        except Exception as e:  # noqa: BLE001
+            print(f"Ignoring unreadable video index {sidecar}: {e}")
+            return None
+        if not info.is_fresh(st):
+            return None
+        self._cache[real] = info
+        return info
+
+    def get_or_probe(self, video_path: str) -> VideoInfo:
+        """Metadata for ``video_path``, probing it and writing its sidecar on a miss."""
+        info = self.get(video_path)
+        if info is not None:
+            return info
+        with self._lock:
+            # Another thread may have probed it while this one waited
+            info = self.get(video_path)
+            if info is not None:
+                return info
+            info = probe_video(video_path)
+            write_video_info(self.sidecar_path(video_path), info)
+            self._cache[os.path.realpath(video_path)] = info
+            return info
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Probe source videos once and write their keyframe/metadata index")
+    parser.add_argument("--video-dir", default=DEFAULT_VIDEO_DIR, help=f"Videos to index (default: {DEFAULT_VIDEO_DIR})")
+    parser.add_argument(
+        "--index-dir",
+        default=os.getenv("VIDEO_INDEX_DIR", DEFAULT_VIDEO_INDEX_DIR),
+        help=f"Where sidecar files are written (default: $VIDEO_INDEX_DIR or {DEFAULT_VIDEO_INDEX_DIR})",
+    )
+    parser.add_argument("--force", action="store_true", help="Re-probe videos whose sidecar is still fresh")
+    args = parser.parse_args()
+
+    index = VideoIndex(args.index_dir)
+    videos = sorted(p for p in Path(args.video_dir).rglob("*") if p.suffix.lower() in {".mp4", ".mov", ".m4v", ".mkv"})
+    for video in videos:
+        if not args.force and index.get(str(video)) is not None:
+            print(f"{video.name}: up to date")
+            continue
+        try:
+            info = probe_video(str(video))
+        except Exception as e:  # noqa: BLE001
+            print(f"{video.name}: could not probe: {e}")
+            continue
+        size = write_video_info(index.sidecar_path(str(video)), info)
+        print(
+            f"{video.name}: {info.duration:.0f}s {info.codec} {info.width}x{info.height} "
+            f"{info.bit_rate / 1000:.0f} kb/s, {len(info.keyframes)} keyframes ({size} bytes)"
+        )
+    print(f"Indexed {len(videos)} videos into {args.index_dir}")
+
+
+if __name__ == "__main__":
+    main()
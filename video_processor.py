@@ -3,6 +3,14 @@ import re
 from datetime import datetime, timedelta
 import tempfile
 import subprocess
+import threading
+import time
+from typing import Optional
+
+from clip_cache import DEFAULT_MAX_BYTES, ClipCache, clip_key
+from clip_extract import EXTRACTION_MODES, extract_copy, extract_exact, ffmpeg_available
+from video_index import VideoIndex
+from video_resolver import shared_teaching_index
 
 # Try to import moviepy, fall back to placeholder if not available
 try:
@@ -13,24 +21,135 @@ except ImportError as e:
     MOVIEPY_AVAILABLE = False
     print(f"MoviePy not available. Video processing will be disabled. Error: {e}")
 
+# Encoding settings are part of each clip's cache key; change this when they change
+CLIP_PROFILE = "h264-crf23-aac128"
+
+# "copy" cuts at the keyframe before the timestamp without re-encoding,
+# "exact" re-encodes only up to the next keyframe, "reencode" encodes the whole clip
+CLIP_EXTRACTION = os.getenv("CLIP_EXTRACTION", "copy").strip().lower()
+if CLIP_EXTRACTION not in EXTRACTION_MODES:
+    CLIP_EXTRACTION = "copy"
+
+# Disk budget for generated clips, evicted least recently used first
+CLIP_CACHE_MAX_MB = float(os.getenv("CLIP_CACHE_MAX_MB", str(DEFAULT_MAX_BYTES // (1024 * 1024))))
+
+_video_index = None
+
+def shared_video_index():
+    """This process's VideoIndex (clip job workers each have their own)"""
+    global _video_index
+    if _video_index is None:
+        _video_index = VideoIndex()
+    return _video_index
+
+def clip_tools_available():
+    return MOVIEPY_AVAILABLE or ffmpeg_available()
+
+def clip_profile():
+    """Cache-key profile of the extraction that will be used"""
+    if ffmpeg_available() and CLIP_EXTRACTION != "reencode":
+        return CLIP_EXTRACTION
+    return CLIP_PROFILE
+
+def render_clip(video_path, start_seconds, duration_seconds, out_path):
+    """Cut [start, start + duration) of a video into out_path.
+
+    Returns {"start": actual start second, "mode": extraction used}, or None
+    when the start lies past the end of the video; raises if every method
+    fails. Touches no shared state, so it can run in clip job worker processes.
+    """
+    # Stream copy first: cut on keyframes, re-encoding at most the leading GOP
+    if ffmpeg_available() and CLIP_EXTRACTION != "reencode":
+        try:
+            started = time.perf_counter()
+            # Bounds and keyframes come from the video index, not the container
+            info = shared_video_index().get_or_probe(video_path)
+            if info.duration and start_seconds >= info.duration:
+                return None
+            end_seconds = start_seconds + duration_seconds
+            if info.duration:
+                end_seconds = min(end_seconds, info.duration)
+            if CLIP_EXTRACTION == "exact" and info.codec == "h264":
+                actual_start = extract_exact(video_path, start_seconds, end_seconds, out_path, info)
+            else:
+                actual_start = extract_copy(video_path, start_seconds, end_seconds, out_path, info.keyframes)
+            print(
+                f"Video clip created ({CLIP_EXTRACTION}, from {actual_start:.2f}s) "
+                f"in {(time.perf_counter() - started) * 1000:.0f}ms"
+            )
+            return {"start": actual_start, "mode": CLIP_EXTRACTION}
+        except Exception as e_fast:
+            print(f"Stream-copy extraction failed, re-encoding instead: {e_fast}")
+            if os.path.exists(out_path):
+                os.remove(out_path)
+
+    # Then MoviePy (using alternative method when subclip is unavailable)
+    try:
+        if not MOVIEPY_AVAILABLE:
+            raise RuntimeError("MoviePy not available")
+        with VideoFileClip(video_path) as video:
+            video_duration = float(video.duration)
+            if start_seconds >= video_duration:
+                return None
+            end_seconds = min(start_seconds + duration_seconds, video_duration)
+            if hasattr(VideoFileClip, "subclip"):
+                clip = video.subclip(start_seconds, end_seconds)
+            else:
+                # Fallback: cut by setting start and end on the clip
+                clip = video.set_start(start_seconds).set_end(end_seconds)
+            clip.write_videofile(out_path, codec='libx264', audio_codec='aac')
+            clip.close()
+        print("Video clip created (MoviePy)")
+        return {"start": start_seconds, "mode": "moviepy"}
+    except Exception as e_mp:
+        print(f"MoviePy failed, falling back to ffmpeg: {e_mp}")
+        if os.path.exists(out_path):
+            os.remove(out_path)
+
+    # Fallback to ffmpeg CLI
+    try:
+        cmd = [
+            "ffmpeg", "-hide_banner", "-loglevel", "error", "-y",
+            "-ss", str(start_seconds),
+            "-t", str(duration_seconds),
+            "-i", video_path,
+            "-c:v", "libx264", "-preset", "veryfast", "-crf", "23",
+            "-c:a", "aac", "-b:a", "128k",
+            out_path,
+        ]
+        subprocess.run(cmd, check=True)
+        if not os.path.exists(out_path):
+            raise RuntimeError("ffmpeg produced no output")
+        print("Video clip created (ffmpeg)")
+        return {"start": start_seconds, "mode": "reencode"}
+    except Exception as e_ff:
+        if os.path.exists(out_path):
+            os.remove(out_path)
+        raise RuntimeError(f"FFmpeg fallback failed: {e_ff}") from e_ff
+
 class VideoProcessor:
+    """Clip API shared by all requests.
+
+    Nothing here changes per request: the source video is always an argument,
+    so one instance is safe to use from many threads. Concurrent requests for
+    the same clip are serialized on a per-clip-key lock, and clips are written
+    to a temporary file and renamed into place, so other processes never see a
+    partial clip either.
+    """
+
     def __init__(self):
-        # Default to any available MP4 under Video/Video; will be refined per response
-        self.video_path = self._find_default_video()
+        # Teaching name -> local video, rebuilt when video_mapping.json or Video/Video changes
+        self.videos = shared_teaching_index()
         self.clips_dir = "static/video_clips"
-        # Create clips directory if it doesn't exist
-        os.makedirs(self.clips_dir, exist_ok=True)
+        # Creates the clips directory if it doesn't exist
+        self.clip_cache = ClipCache(self.clips_dir, max_bytes=int(CLIP_CACHE_MAX_MB * 1024 * 1024))
+        # Duration, codec and keyframes per source video, probed once
+        self.video_index = shared_video_index()
 
-    def _find_default_video(self):
-        try:
-            base_dir = "Video/Video"
-            if os.path.isdir(base_dir):
-                for name in os.listdir(base_dir):
-                    if name.lower().endswith(".mp4"):
-                        return os.path.join(base_dir, name)
-        except Exception:
-            pass
-        return ""
+    @property
+    def default_video_path(self):
+        """Any available local video, for requests that name no teaching"""
+        return self.videos.default_video()
     
     def parse_timestamp(self, timestamp_str):
         """Convert timestamp string to seconds (supports MM:SS, HH:MM:SS, and fractional seconds)."""
@@ -107,99 +226,102 @@ class VideoProcessor:
             return f"{hours:02d}:{minutes:02d}:{seconds:02d}"
         return f"{minutes:02d}:{seconds:02d}"
 
-    def _choose_video_by_teaching(self, response_text: str) -> str:
-        """Try to pick a video file that best matches the Teaching name in the response."""
+    @property
+    def video_path(self):
+        """The default video (kept for callers of the old stateful API)"""
+        return self.default_video_path
+
+    def choose_video(self, response_text: str) -> Optional[str]:
+        """Pick the local video of the Teaching named in the response (exact, else fuzzy match).
+
+        The default video is used only when the response names no teaching.
+        A named teaching that cannot be resolved, or whose video is not stored
+        locally, gives None: cutting the default video instead would show an
+        unrelated teaching.
+        """
+        m = re.search(r"Teaching:\s*(.+)", response_text or "")
+        teaching = m.group(1).strip() if m else ""
+        if not teaching:
+            return self.default_video_path
         try:
-            m = re.search(r"Teaching:\s*(.+)", response_text)
-            teaching = m.group(1).strip() if m else ""
-            base_dir = "Video/Video"
-            if not os.path.isdir(base_dir):
-                return self.video_path
-            # Simple fuzzy match by token overlap
-            tokens = set(re.findall(r"[a-z0-9]+", teaching.lower()))
-            best = None
-            best_score = -1
-            for name in os.listdir(base_dir):
-                if not name.lower().endswith(".mp4"):
-                    continue
-                v_tokens = set(re.findall(r"[a-z0-9]+", name.lower()))
-                score = len(tokens & v_tokens)
-                if score > best_score:
-                    best = os.path.join(base_dir, name)
-                    best_score = score
-            return best or self.video_path
-        except Exception:
-            return self.video_path
-    
-    def create_video_clip(self, timestamp_str, duration_minutes=2):
-        """Create a video clip starting from the given timestamp"""
+            entry = self.videos.resolve(teaching)
+        except Exception as e:
+            print(f"Could not resolve video for teaching {teaching!r}: {e}")
+            return None
+        return entry["path"] if entry is not None else None
+
+    def prepare_clip(self, video_path, timestamp_str, duration_minutes=2):
+        """Validate a clip request for a source video and compute its cache key; None if no clip can be made"""
+        if not clip_tools_available():
+            print(f"Neither MoviePy nor ffmpeg is available. Cannot create video clip for timestamp {timestamp_str}")
+            return None
+
+        if not video_path or not os.path.exists(video_path):
+            # choose_video already picked the default where one is appropriate
+            print(f"Video file not found: {video_path}")
+            return None
+
+        start_seconds = self.parse_timestamp(timestamp_str)
+        if start_seconds is None:
+            return None
+        duration_seconds = float(duration_minutes) * 60
+
+        # An already indexed video is bounds-checked without opening it
+        known = shared_video_index().get(video_path)
+        if known is not None and known.duration and float(start_seconds) >= known.duration:
+            print(f"Timestamp {timestamp_str} exceeds video duration")
+            return None
+
+        profile = clip_profile()
+        return {
+            # Clips are keyed by source video, range and encoding profile
+            "key": clip_key(video_path, start_seconds, float(start_seconds) + duration_seconds, profile),
+            "video_path": video_path,
+            "start": float(start_seconds),
+            "duration": duration_seconds,
+            "profile": profile,
+        }
+
+    def clip_url(self, clip_path):
+        return f"/static/video_clips/{os.path.basename(str(clip_path))}"
+
+    def store_clip(self, clip, tmp_path, rendered):
+        """Publish a rendered clip into the cache; returns its URL"""
+        info = {
+            "source": os.path.basename(clip["video_path"]),
+            "start": rendered["start"],
+            "duration": clip["duration"],
+            "profile": clip["profile"],
+        }
+        return self.clip_url(self.clip_cache.put(clip["key"], tmp_path, info))
+
+    def create_video_clip(self, video_path, timestamp_str, duration_minutes=2):
+        """Create a clip of the given video starting from the given timestamp; returns its URL"""
         try:
-            if not MOVIEPY_AVAILABLE:
-                print(f"MoviePy not available. Cannot create video clip for timestamp {timestamp_str}")
+            clip = self.prepare_clip(video_path, timestamp_str, duration_minutes)
+            if clip is None:
                 return None
-                
-            if not os.path.exists(self.video_path):
-                # Try to find any default video now
-                self.video_path = self._find_default_video()
-                if not self.video_path or not os.path.exists(self.video_path):
-                    print(f"Video file not found: {self.video_path}")
+
+            cached = self.clip_cache.get(clip["key"])
+            if cached is not None:
+                print(f"Using cached clip: {cached.name}")
+                return self.clip_url(cached)
+
+            # One thread cuts a given clip; the others wait and then find it cached
+            with self.clip_cache.locked(clip["key"]):
+                cached = self.clip_cache.peek(clip["key"])
+                if cached is not None:
+                    return self.clip_url(cached)
+
+                # Written under a temporary name and moved into the cache when complete,
+                # so a half-written clip is never served
+                tmp_path = str(self.clip_cache.temp_path_for(clip["key"]))
+                print(f"Creating video clip from {timestamp_str} for {duration_minutes} minutes...")
+                rendered = render_clip(clip["video_path"], clip["start"], clip["duration"], tmp_path)
+                if rendered is None:
+                    print(f"Timestamp {timestamp_str} exceeds video duration")
                     return None
-            
-            start_seconds = self.parse_timestamp(timestamp_str)
-            if start_seconds is None:
-                return None
-            
-            duration_seconds = duration_minutes * 60
-            
-            # Create a unique filename for the clip
-            clip_filename = f"clip_{timestamp_str.replace(':', '-')}_{duration_minutes}min.mp4"
-            clip_path = os.path.join(self.clips_dir, clip_filename)
-            
-            # Check if clip already exists
-            if os.path.exists(clip_path):
-                print(f"Using existing clip: {clip_filename}")
-                return f"/static/video_clips/{clip_filename}"
-            
-            print(f"Creating video clip from {timestamp_str} for {duration_minutes} minutes...")
-
-            # Try MoviePy first (using alternative method when subclip is unavailable)
-            try:
-                with VideoFileClip(self.video_path) as video:
-                    video_duration = float(video.duration)
-                    end_seconds = min(float(start_seconds) + float(duration_seconds), video_duration)
-                    if float(start_seconds) >= video_duration:
-                        print(f"Timestamp {timestamp_str} exceeds video duration")
-                        return None
-                    if hasattr(VideoFileClip, "subclip"):
-                        clip = video.subclip(float(start_seconds), float(end_seconds))
-                    else:
-                        # Fallback: cut by setting start and end on the clip
-                        clip = video.set_start(float(start_seconds)).set_end(float(end_seconds))
-                    clip.write_videofile(clip_path, codec='libx264', audio_codec='aac')
-                    clip.close()
-                print(f"Video clip created: {clip_filename}")
-                return f"/static/video_clips/{clip_filename}"
-            except Exception as e_mp:
-                print(f"MoviePy failed, falling back to ffmpeg: {e_mp}")
-
-            # Fallback to ffmpeg CLI
-            try:
-                cmd = [
-                    "ffmpeg", "-hide_banner", "-loglevel", "error", "-y",
-                    "-ss", str(float(start_seconds)),
-                    "-t", str(float(duration_seconds)),
-                    "-i", self.video_path,
-                    "-c:v", "libx264", "-preset", "veryfast", "-crf", "23",
-                    "-c:a", "aac", "-b:a", "128k",
-                    clip_path,
-                ]
-                subprocess.run(cmd, check=True)
-                if os.path.exists(clip_path):
-                    print(f"Video clip created (ffmpeg): {clip_filename}")
-                    return f"/static/video_clips/{clip_filename}"
-            except Exception as e_ff:
-                print(f"FFmpeg fallback failed: {e_ff}")
-                return None
+                return self.store_clip(clip, tmp_path, rendered)
 
         except Exception as e:
             print(f"Error creating video clip: {e}")
@@ -208,52 +330,32 @@ class VideoProcessor:
     def get_video_clip_url(self, response_text, duration_minutes=2):
         """Extract timestamp from response and create video clip"""
         # Choose the most relevant video for this response if possible
-        chosen = self._choose_video_by_teaching(response_text)
-        if chosen:
-            self.video_path = chosen
-
+        video_path = self.choose_video(response_text)
         timestamp = self.extract_timestamp_from_response(response_text)
         if timestamp:
-            return self.create_video_clip(timestamp, duration_minutes)
+            return self.create_video_clip(video_path, timestamp, duration_minutes)
         return None
     
-    def cleanup_old_clips(self, max_clips=20):
-        """Remove old clips to prevent disk space issues"""
+    def cleanup_old_clips(self):
+        """Evict least recently used clips until the clip cache is within its disk budget"""
         try:
-            if not os.path.exists(self.clips_dir):
-                return
-            
-            clips = []
-            for filename in os.listdir(self.clips_dir):
-                if filename.endswith('.mp4'):
-                    filepath = os.path.join(self.clips_dir, filename)
-                    clips.append((filepath, os.path.getctime(filepath)))
-            
-            # Sort by creation time (oldest first)
-            clips.sort(key=lambda x: x[1])
-            
-            # Remove oldest clips if we exceed max_clips
-            while len(clips) > max_clips:
-                old_clip_path, _ = clips.pop(0)
-                try:
-                    os.remove(old_clip_path)
-                    print(f"Removed old clip: {os.path.basename(old_clip_path)}")
-                except Exception as e:
-                    print(f"Error removing old clip: {e}")
-                    
+            self.clip_cache.evict()
         except Exception as e:
             print(f"Error during cleanup: {e}")
 
 # Create a global instance only when needed
 video_processor = None
+_video_processor_lock = threading.Lock()
 
 def get_video_processor():
     """Get or create the video processor instance"""
     global video_processor
     if video_processor is None:
-        try:
-            video_processor = VideoProcessor()
-        except Exception as e:
-            print(f"Failed to create video processor: {e}")
-            video_processor = False  # Mark as failed
+        with _video_processor_lock:
+            if video_processor is None:
+                try:
+                    video_processor = VideoProcessor()
+                except Exception as e:
+                    print(f"Failed to create video processor: {e}")
+                    video_processor = False  # Mark as failed
     return video_processor if video_processor is not False else None
\ No newline at end of file
@@ -0,0 +1,244 @@
+"""
+Teaching name -> source video resolution.
+
+Answers name their teaching ("DC Retreat Day 1"), while videos have their
+own file names ("Oct 2024 DC Retreat Day 1.mp4"). Resolution used to list
+``Video/Video`` and tokenize every file name on each request. This index is
+built once instead, from ``video_mapping.json`` (teaching -> file name, public
+URL) plus the files actually present in the local video directory, and is
+rebuilt only when either one's mtime changes.
+
+Lookups normalize the name (case, punctuation, "Transcription" suffixes,
+extensions) and are a dict hit for known teachings or file names. Anything
+else falls back to a fuzzy match over a token inverted index: only entries
+sharing a token with the query are scored, by the IDF weight of the tokens
+they share, so the cost depends on the query's postings rather than on the
+number of videos. A fuzzy match is refused rather than guessed when the top
+score is tied or the two names differ in a distinguishing token (a number,
+or a word only one video has): "Original Love One-Year Session" names no
+single session, so it resolves to no video instead of Session 1.
+"""
+
+import json
+import math
+import os
+import re
+import threading
+import time
+from typing import Dict, List, Optional, Set
+
+
+DEFAULT_MAPPING_PATH = "video_mapping.json"
+DEFAULT_VIDEO_DIR = "Video/Video"
+VIDEO_SUFFIXES = (".mp4", ".mov", ".m4v", ".mkv")
+
+# Minimum share of the query's token weight a fuzzy match must cover
+MIN_FUZZY_SCORE = 0.5
+
+# Re-check the mapping and directory mtimes at most this often
+_CHECK_SECONDS = 2.0
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_DIGIT_RE = re.compile(r"\d")
+_YEAR_RE = re.compile(r"(19|20)\d\d$")
+
+
+def normalize_teaching(name: str) -> str:
+    """Comparable form of a teaching or video file name."""
+    name = re.sub(r"\.(csv|txt|mp4|mov|m4v|mkv)$", "", name.strip(), flags=re.IGNORECASE)
+    name = re.sub(r"\s*\(\s*\d+\s*\)\s*$", "", name)
+    name = re.sub(r"\s+(transcription|transcript)$", "", name, flags=re.IGNORECASE)
+    return " ".join(_TOKEN_RE.findall(name.lower()))
+
+
+def _mtime_ns(path: str) -> int:
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return 0
+
+
+class TeachingVideoIndex:
+    """Teaching -> {teaching, path, video_url, video_filename}, with fuzzy fallback."""
+
+    def __init__(self, mapping_path: str = DEFAULT_MAPPING_PATH, video_dir: str = DEFAULT_VIDEO_DIR):
+        self.mapping_path = mapping_path
+        self.video_dir = video_dir
+        self._lock = threading.Lock()
+        self._checked_at = 0.0
+        self._signature = None
+        self._entries: List[dict] = []
+        self._exact: Dict[str, int] = {}
+        self._postings: Dict[str, List[int]] = {}
+        self._idf: Dict[str, float] = {}
+        self._refresh()
+
+    # ------------------------------------------------------------------
+    # Building
+    # ------------------------------------------------------------------
+    def _refresh(self) -> None:
+        """Rebuild if the mapping file or the video directory changed since the last build."""
+        now = time.monotonic()
+        if now - self._checked_at < _CHECK_SECONDS and self._signature is not None:
+            return
+        with self._lock:
+            if now - self._checked_at < _CHECK_SECONDS and self._signature is not None:
+                return
+            self._checked_at = now
+            signature = (_mtime_ns(self.mapping_path), _mtime_ns(self.video_dir))
+            if signature == self._signature:
+                return
+            self._build()
+            self._signature = signature
+
+    def _build(self) -> None:
+        entries: List[dict] = []
+        exact: Dict[str, int] = {}
+        by_filename: Dict[str, int] = {}
+
+        mapping = {}
+        try:
+            with open(self.mapping_path, "r", encoding="utf-8") as f:
+                mapping = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Could not load {self.mapping_path}: {e}")
+        for teaching, info in mapping.items():
+            info = info or {}
+            filename = info.get("video_filename") or ""
+            eid = by_filename.get(filename.lower()) if filename else None
+            if eid is None:
+                eid = len(entries)
+                entries.append({
+                    "teaching": teaching,
+                    "video_filename": filename or None,
+                    "video_url": info.get("video_url") or None,
+                    "path": None,
+                })
+            # else: another name for a video already listed ("... Transcription"),
+            # so it only adds exact keys and cannot tie with itself in fuzzy matching
+            for name in (teaching, info.get("normalized_name") or "", filename):
+                key = normalize_teaching(name)
+                if key:
+                    exact.setdefault(key, eid)
+            if filename:
+                by_filename[filename.lower()] = eid
+
+        try:
+            names = sorted(os.listdir(self.video_dir)) if os.path.isdir(self.video_dir) else []
+        except OSError as e:
+            print(f"Could not list {self.video_dir}: {e}")
+            names = []
+        for name in names:
+            if not name.lower().endswith(VIDEO_SUFFIXES):
+                continue
+            path = os.path.join(self.video_dir, name)
+            eid = by_filename.get(name.lower())
+            if eid is None:
+                eid = exact.get(normalize_teaching(name))
+            if eid is None or entries[eid]["path"] is not None:
+                # A local video the mapping does not know about
+                eid = len(entries)
+                entries.append({"teaching": os.path.splitext(name)[0], "video_filename": name, "video_url": None, "path": None})
+            entries[eid]["path"] = path
+            exact.setdefault(normalize_teaching(name), eid)
+
+        postings: Dict[str, List[int]] = {}
+        for eid, entry in enumerate(entries):
+            tokens: Set[str] = set()
+            for name in (entry["teaching"], entry["video_filename"] or ""):
+                tokens.update(normalize_teaching(name).split())
+            for token in tokens:
+                postings.setdefault(token, []).append(eid)
+        n = max(1, len(entries))
+        idf = {token: math.log(1 + n / len(ids)) for token, ids in postings.items()}
+
+        # Swapped in whole, so concurrent lookups see one build or the other
+        self._entries, self._exact, self._postings, self._idf = entries, exact, postings, idf
+        print(
+            f"Teaching video index: {len(entries)} teachings, "
+            f"{sum(1 for e in entries if e['path'])} local videos, {len(postings)} tokens"
+        )
+
+    # ------------------------------------------------------------------
+    # Lookup
+    # ------------------------------------------------------------------
+    def resolve(self, teaching: str, fuzzy: bool = True) -> Optional[dict]:
+        """The entry for a teaching name: exact (normalized) match, else best fuzzy match."""
+        self._refresh()
+        entries, exact, postings, idf = self._entries, self._exact, self._postings, self._idf
+        key = normalize_teaching(teaching or "")
+        if not key:
+            return None
+        eid = exact.get(key)
+        if eid is not None:
+            return entries[eid]
+        if not fuzzy:
+            return None
+
+        tokens = set(key.split())
+        # Words no video has count like the commonest indexed word, so filler
+        # in the query dilutes a match without ruling it out
+        unknown_weight = min(idf.values(), default=1.0)
+        total = sum(idf.get(t, unknown_weight) for t in tokens)
+        scores: Dict[int, float] = {}
+        for token in tokens:
+            weight = idf.get(token)
+            if weight is None:
+                continue
+            for candidate in postings[token]:
+                scores[candidate] = scores.get(candidate, 0.0) + weight
+        if not scores or total <= 0:
+            return None
+        ranked = sorted(scores, key=lambda c: (-scores[c], c))
+        best = ranked[0]
+        if scores[best] / total < MIN_FUZZY_SCORE:
+            return None
+        if len(ranked) > 1 and scores[ranked[1]] >= scores[best] - 1e-9:
+            # Several videos fit equally well; picking one would be a guess
+            return None
+        entry = entries[best]
+        candidate = set(normalize_teaching(entry["teaching"]).split())
+        candidate.update(normalize_teaching(entry["video_filename"] or "").split())
+        for token in tokens - candidate:
+            # The query names a number or a word that only some other video has
+            if _DIGIT_RE.search(token) or len(postings.get(token, ())) == 1:
+                return None
+        for token in set(normalize_teaching(entry["teaching"]).split()) - tokens:
+            # The candidate is one numbered part (session, day) the query did not
+            # name; a year only dates the teaching
+            if _DIGIT_RE.search(token) and not _YEAR_RE.match(token):
+                return None
+        return entry
+
+    def video_path(self, teaching: str) -> Optional[str]:
+        entry = self.resolve(teaching)
+        return entry["path"] if entry else None
+
+    def video_url(self, teaching: str, fuzzy: bool = True) -> Optional[str]:
+        entry = self.resolve(teaching, fuzzy=fuzzy)
+        return entry["video_url"] if entry else None
+
+    def default_video(self) -> str:
+        """Some local video, for requests that name no teaching; '' if there is none."""
+        self._refresh()
+        return next((e["path"] for e in self._entries if e["path"]), "")
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def shared_teaching_index(mapping_path: Optional[str] = None, video_dir: Optional[str] = None) -> TeachingVideoIndex:
+    """The process-wide index, built on first use."""
+    global _shared
+    if _shared is None:
+        with _shared_lock:
+            if _shared is None:
+                _shared = TeachingVideoIndex(
+                    mapping_path or os.getenv("VIDEO_MAPPING_PATH", DEFAULT_MAPPING_PATH),
+                    video_dir or os.getenv("VIDEO_DIR", DEFAULT_VIDEO_DIR),
+                )
+    return _shared